@@ -6,6 +6,8 @@ import ANIL_Robot_LHC_Auto_Config as test_cofig
 str_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 sys.path.append('.')
 from ethspylib import *
+from common.log_queue import QueuedLogWriter
+from devices.common.module_info_cache import module_info_cache
 import socket
 import os, shutil
 from subprocess import call
@@ -54,11 +56,28 @@ logger2 = logging.getLogger('EA_log')
 if test_cofig.EthAgent_command == 'Enable':
     logger2.addHandler(logging.FileHandler(EA_log_file_path))
 
+# The log files and the console are written by a background thread, so the test
+# threads never wait on the output share
+log_writer = QueuedLogWriter(test_cofig.Log_queue_size)
+log_writer.install(logging.getLogger(), logger2)
+
 logger.info('----------------------------------------')
 logger.info('BER Testing result save to - {}'.format(SAVE_PATH))
 logger.info('----------------------------------------')
 
 
+if test_cofig.EthAgent_replay:
+    start_replay(test_cofig.EthAgent_replay, test_cofig.EthAgent_replay_timing == 'Original')
+    logger.info('Replaying the EthAgent responses recorded in {}'.format(test_cofig.EthAgent_replay))
+elif test_cofig.EthAgent_record == 'Enable':
+    start_recording(
+        os.path.join(SAVE_PATH, 'EthAgent_commands.log.gz'),
+        {'speed': test_cofig.speed, 'started': str_time}
+    )
+
+if test_cofig.Module_info_cache:
+    module_info_cache.load(test_cofig.Module_info_cache)
+
 logger.info('----------------------------------------')
 logger.info('Initializing all devices ...')
 logger.info('----------------------------------------')
@@ -158,6 +177,7 @@ if __builtin__._ETHSPY_VARS['dut7_enable'] == 'Enable':
 
 """This module provides functionality to control the robot to perform Base-T testing."""
 # Standard library imports
+import asyncio
 import json
 import os
 import threading
@@ -169,6 +189,7 @@ from devices.common.device_init import DeviceInit
 import ANILRobotController
 import LHC
 import anil_robot_config
+import ethspylib
 
 
 class RobotLHCWrapper:
@@ -200,6 +221,8 @@ class RobotLHCWrapper:
         self.es_vars['BER_ERROR_THRESHOLD'] = 20
         self.es_vars['BER_PACKET_SIZE'] = 1518
         self.es_vars['BER_THRESHOLD'] = -1000000
+        self.es_vars['BER_POLL_MIN'] = 0.25  # Seconds between BER samples near the confidence target
+        self.es_vars['BER_POLL_MAX'] = 1  # Seconds between BER samples far from it
         self.es_vars['DUT_SNR_CONTROL'] = 'Enable'
         self.es_vars['LP_DATA'] = 'Enable'
         self.es_vars['LP_SNR_CONTROL'] = 'Enable'
@@ -208,6 +231,12 @@ class RobotLHCWrapper:
         self.es_vars['DROPPED_PACKETS'] = 'Enable'
         self.es_vars['DUT_EEPROM_DUMP'] = 'Disable'
         self.es_vars['LP_EEPROM_DUMP'] = 'Disable'
+        self.es_vars['CONCURRENT_COLLECTION'] = 'Enable'  # Collect DUT and LP (and lanes) data at the same time
+        self.es_vars['JOURNAL'] = 'Enable'  # Stream the data to an NDJSON journal next to the JSON file
+        self.es_vars['JOURNAL_SYNC_RECORDS'] = 100  # Journal lines written at most between two fsyncs
+        self.es_vars['JOURNAL_SYNC_SECONDS'] = 5  # Seconds at most between two fsyncs of the journal
+        self.es_vars['RESUME'] = 'Disable'  # Continue each DUT/LP pair after the last step in its journal
+        self.es_vars['COLUMNAR_EXPORT'] = 'Enable'  # Also write the measured columns to an .npz file
 
         self.logger = logger
         if test_cofig.bypass_robot == 'Disable':
@@ -359,6 +388,8 @@ class RobotLHCWrapper:
             position (dict): The desired postions to test.
             cable_type (str): The type of cable being tested, either Cat5e or Cat6a.
         """		
+        self.async_tests = []
+        self.test_threads = []
         for dut_port, dut_name, lp_port, lp_name, in zip(
                 self.dut_ports, self.dut_names, self.lp_ports, self.lp_names, 
         ):
@@ -378,7 +409,7 @@ class RobotLHCWrapper:
                 self.es_vars['BER_TARGET'] = 1e-10
                 dut.set_base_t_auto_neg([self.speed])
                 link_partner.set_base_t_auto_neg([self.speed])
-                time.sleep(5)
+                ethspylib.clock.sleep(5)
 
 
             if self.speed not in ['1GBASET', '2.5GBASET', '5GBASET', '10GBASET']:
@@ -393,12 +424,21 @@ class RobotLHCWrapper:
                 cable_type
             )
 
-        #count = threading.activeCount()
-        count = threading.active_count()
-        while count > 1:
-            #count = threading.activeCount()
-            count = threading.active_count()
-            time.sleep(1)
+        if self.async_tests:
+            asyncio.run(self.run_async_tests())
+
+        # Wait for the test threads only: the log writer and the EthAgent connection
+        # readers keep running until the end of the run
+        try:
+            while any(test_thread.is_alive() for test_thread in self.test_threads):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            # Abandon the EthAgent commands in flight, so the tests write their results
+            for port in self.dut_ports + self.lp_ports:
+                port.cancel()
+            for test_thread in self.test_threads:
+                test_thread.join()
+            raise
 
     def prep_to_run(self, dut_prt, link_partner_prt, dut_name, lp_name, cable):
         """Sets up the logger and starts the test.
@@ -426,7 +466,7 @@ class RobotLHCWrapper:
                 'DUT_slot{}__LP_slot{}.log'.format(dut_prt.slot, link_partner_prt.slot)
             )
         )
-        log_obj.addHandler(file_handle)
+        log_obj.addHandler(log_writer.wrap(file_handle))
 
         self.es_vars['DUT_NAME'] = dut_name
 
@@ -437,8 +477,11 @@ class RobotLHCWrapper:
                 target=self.start_test, args=test_args
             )
             test_thread.start()
+            self.test_threads.append(test_thread)
+        elif self.es_vars['parallel'] == 'Async':
+            self.async_tests.append(test_args)
         else:
-            time.sleep(1)
+            ethspylib.clock.sleep(1)
             self.start_test(*test_args)
 
     def start_test(self, dut, link_partner, channel, dut_name, lp_name, l_obj):
@@ -460,12 +503,16 @@ class RobotLHCWrapper:
                 dut, link_partner, self.link_iterations, self.ber_iterations, channel,
                 dut_name, lp_name, self.ttl_delay, self.retry_ttl, l_obj
             )
+            if self.es_vars['RESUME'] == 'Enable':
+                test.resume()
 
             results = test.main_test()
 
             test.write_json_file(results)
+            test.write_columnar_file()
+            test.write_command_timing_file()
 
-        except Exception as err:
+        except Exception:
             self.logger.info('Error: An error occurred during test execution!\n')
             #self.logger.info(err.message)
             #self.logger.info(traceback.format_exc())
@@ -477,18 +524,83 @@ class RobotLHCWrapper:
             #self.logger.info('Computing results and writing output files...')
 
             try:
-                test.statistics(test.data)
-                test.write_json_file(test.data)
-                test.write_csv_file(test.data)
+                self.write_partial_results(test)
             except NameError:
                 self.logger.info('Cannot create output files due to the above error!')
 
-            if str(err) == 'Aborted by user.':
-                raise StandardError('Aborted by user.')
-            else:
-                self.logger.info('\nContinuing to any other ports left to test...\n\n')
+            self.logger.info('\nContinuing to any other ports left to test...\n\n')
+
+    @staticmethod
+    def write_partial_results(test):
+        """Computes the results of a test that failed and writes its output files.
+
+        Args:
+            test (LHC): The failed test
+        """
+        test.statistics()
+        test.store_command_timing()
+        # test.data builds the nested dictionary from the store on every access
+        view = test.data
+        test.write_json_file(view)
+        test.write_columnar_file()
+        test.write_csv_file(view)
+        test.write_command_timing_file()
+
+    async def run_async_tests(self):
+        """Runs all queued DUT/LP pairs concurrently on one event loop.
+
+        A pair that fails does not cancel the others, its error is logged once all
+        pairs are done.
+        """
+        results = await asyncio.gather(
+            *[self.start_test_async(*test_args) for test_args in self.async_tests],
+            return_exceptions=True
+        )
+        for (dut, link_partner, *_), result in zip(self.async_tests, results):
+            if isinstance(result, BaseException):
+                self.logger.info(
+                    'Error: The test of DUT slot {} and LP slot {} failed: {!r}'.format(
+                        dut.slot, link_partner.slot, result
+                    )
+                )
+        self.async_tests = []
+
+    async def start_test_async(self, dut, link_partner, channel, dut_name, lp_name, l_obj):
+        """asyncio variant of start_test, used when parallel is set to 'Async'.
+
+        Args:
+            Same as start_test.
+        """
+        try:
+            test = await asyncio.to_thread(
+                LHC.LHC,
+                dut, link_partner, self.link_iterations, self.ber_iterations, channel,
+                dut_name, lp_name, self.ttl_delay, self.retry_ttl, l_obj
+            )
+            if self.es_vars['RESUME'] == 'Enable':
+                await asyncio.to_thread(test.resume)
+
+            results = await test.main_test_async()
+
+            await asyncio.to_thread(test.write_json_file, results)
+            await asyncio.to_thread(test.write_columnar_file)
+            await asyncio.to_thread(test.write_command_timing_file)
+
+        except Exception:
+            self.logger.info('Error: An error occurred during test execution!\n')
+
+            try:
+                await asyncio.to_thread(self.write_partial_results, test)
+            except NameError:
+                self.logger.info('Cannot create output files due to the above error!')
+
+            self.logger.info('\nContinuing to any other ports left to test...\n\n')
 
 
 if __name__ == '__main__':
     nb = RobotLHCWrapper(logger)
-    nb.main()
\ No newline at end of file
+    try:
+        nb.main()
+    finally:
+        ethspylib.stop_recording()
+        log_writer.stop()
\ No newline at end of file
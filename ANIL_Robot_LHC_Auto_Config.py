@@ -6,9 +6,64 @@ If 'Enable' robot log, the related command will be saved into the file directly.
 You can't see them in command prompt during the testing.
 '''
 
+'''
+Number of log lines that may wait for the background log writer, lines are dropped (and counted)
+instead of slowing the test down when the output share cannot keep up.
+'''
+Log_queue_size = 10000
+
+'''
+'Enable' records every EthAgent command and its response to EthAgent_commands.log.gz in the
+output folder. Set EthAgent_replay to the path of such a log to run the test from it instead of
+the hardware; EthAgent_replay_timing 'Fast' skips all waits, 'Original' keeps the recorded timing.
+'''
+EthAgent_record = 'Disable'
+EthAgent_replay = ''
+EthAgent_replay_timing = 'Fast'
+
+'''
+'Pooled' connects to the EthAgent of every dut/lp IP:Port, one socket per command in flight.
+'Multiplex' sends the commands of every slot of an EthAgent over one shared connection, each slot
+is ADDed on it once. EthAgent_multiplex_agents routes all ports of an IP to one agent, e.g.
+{'10.89.83.149': '10.89.83.149:8081'}; then only that one ethagentIL64E has to run on the host.
+'''
+EthAgent_transport = 'Pooled'
+EthAgent_multiplex_agents = {}
+'''
+Commands that take seconds to answer would stall the other slots behind them on the shared
+'Multiplex' connection. These command types (or their first words) are sent over a pooled
+connection of their own instead.
+'''
+EthAgent_multiplex_exclude = (
+    'ETHSPY LINK GET-TTL', 'TTL', 'ETHSPY RX GET-EHM', 'ETHSPY RX GET-VOM',
+    'ETHSPY RX GET-TRAINING-COEFF-LOGS', 'ETHSPY MODULE-INFO GET-ALL', 'REEP', 'RESET',
+)
+
+'''
+Seconds EthAgent may take to answer a command before the port is given up with a CommandTimeout,
+by command type (e.g. 'ETHSPY RX GET-EHM', 'QR') or its first words, 'DEFAULT' for all others.
+The T:<ms> argument of a command (GET-TTL ... T:60000) is added to its deadline.
+'''
+EthAgent_deadlines = {
+    'DEFAULT': 60,
+    'ADD': 30, 'DEL': 30,
+    'ETHSPY LINK GET-STATUS': 15, 'ETHSPY LINK GET-STATS': 15, 'ETHSPY LINK GET-BANDWIDTH': 15,
+    'ETHSPY RX GET-STATUS': 15, 'ETHSPY TX GET-STATUS': 15, 'ETHSPY LANE GET-STATUS': 15,
+    'ETHSPY SUMMARY GET-STATUS': 15,
+    'QR': 15, 'QT': 15, 'GETSTATS': 15, 'GETRXSTATUS': 15, 'STATUS': 15,
+    'ETHSPY LINK GET-TTL': 120, 'TTL': 120,
+    'ETHSPY RX GET-EHM': 600, 'ETHSPY RX GET-VOM': 600, 'ETHSPY RX GET-TRAINING-COEFF-LOGS': 600,
+    'ETHSPY MODULE-INFO GET-ALL': 120, 'REEP': 300, 'RESET': 120,
+}
+
 ''' Output File '''
 Output_path='C:/BER/'
 Output_folder_Prefix = 'BER_'
+'''
+Connector modules (cables) seen before, by serial number. Only a module that is not in this file
+gets the 10 second settle time after its module info is read. '' keeps them for this run only.
+'''
+Module_info_cache = 'C:/BER/module_info_cache.json'
 
 ''' Robot Config '''
 speed = '5GBASET'
@@ -22,9 +77,13 @@ reset_side = 'DUT'
 ttl_delay = '5'
 ber_iterations = '1'
 
+# 'Disable' runs the ports one after another, 'Enable' runs one thread per port and
+# 'Async' runs all ports on one asyncio event loop.
 parallel = 'Disable'
 
 ''' DUT & Link Partner Config '''
+# To run without hardware, start 'python ethagent_sim.py --port 8080 3=Columbiaville 1=Columbiaville'
+# and point the ip of the ports at '127.0.0.1:8080'.
 dut0_enable = 'Enable'
 dut0_ip = '10.89.83.215:8080'
 dut0_slot = '3'
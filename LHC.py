@@ -26,7 +26,8 @@
 # rpdb2.start_embedded_debugger('314159')
 
 # Standard library imports
-from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import setuptools, sys
 sys.modules['distutils'] = setuptools._distutils
 #from distutils import file_util
@@ -38,21 +39,142 @@ import errno
 import json
 import math
 import os
+import re
 import subprocess
+import threading
 import time
 
 # Local project imports
+from common import ber_stats, columnar
+from common.capture import CaptureFile, LineFilter
 from common.helpers import round2
+from common.journal import Journal
+from common.log_queue import LazyMessage
+from common.measurements import MeasurementStore
+from common.stats import Histogram, StreamingStatistics, summarize, summarize_store
+import ethspy_async
 import ethspylib
 
 es_vars = _ETHSPY_VARS  # _ETHSPY_VARS is created by Ethernet Inspector and passed into the script
 
+
+class CollectionPlan(object):
+    """The data LHC collects from a device in every iteration, see LHC.collection_plan().
+
+    Attributes:
+        link (bool): Get the link status.
+        lanes (range): The lanes to collect.
+        training_logs (bool): Get the training coeff logs of every lane.
+        snr (bool): Get the SNR of every lane.
+        vbcm (bool): The SNR is measured with the VBCM tools.
+        rx_status (bool): Get the RX status of every lane.
+        tx_status (bool): Get the TX status of every lane.
+        lane_status (bool): Get the lane status of every lane.
+        ehm (bool): Get the EHM of every lane.
+    """
+
+    def __init__(self, link, lanes, training_logs, snr, vbcm, rx_status, tx_status,
+                 lane_status, ehm):
+        self.link = link
+        self.lanes = lanes
+        self.training_logs = training_logs
+        self.snr = snr
+        self.vbcm = vbcm
+        self.rx_status = rx_status
+        self.tx_status = tx_status
+        self.lane_status = lane_status
+        self.ehm = ehm
+
+    @property
+    def status_queries(self):
+        """tuple: The device methods of the planned RX, TX and lane status."""
+        return tuple(
+            method for method, planned in (
+                ('ethspy_rx_get_status', self.rx_status),
+                ('ethspy_tx_get_status', self.tx_status),
+                ('ethspy_lane_get_status', self.lane_status),
+            ) if planned
+        )
+
+
+class BerMeasurement(object):
+    """The running values of a BER measurement, see LHC.ber_update().
+
+    Attributes:
+        start (float): ethspylib.clock time the traffic was started.
+        time (float): Time of the last sample.
+        last_time (float): Time of the sample before, the start for the first one.
+        last_bits (int): Bits received by the DUT until the sample before.
+        stats (dict): The last LINK GET-STATS of the DUT.
+        stats_lp (dict): The last LINK GET-STATS of the link partner.
+        bandwidth (dict): The last GET-BANDWIDTH of the DUT.
+        dut_errors (int): Receive errors of the DUT.
+        lp_errors (int): Receive errors of the link partner.
+        drop_errors (int): Packets dropped, see LHC.dropped_packet_check().
+        symbol_error (bool): The DUT had a symbol error.
+        symbol_error_lp (bool): The link partner had a symbol error.
+        bits_received (int): Bits received by the DUT.
+        bits_received_lp (int): Bits received by the link partner.
+        confidence (float): Confidence level of the DUT BER.
+    """
+
+    def __init__(self, start):
+        self.start = start
+        self.time = start
+        self.last_time = start
+        self.last_bits = 0
+        self.stats = None
+        self.stats_lp = None
+        self.bandwidth = None
+        self.dut_errors = 0
+        self.lp_errors = 0
+        self.drop_errors = 0
+        self.symbol_error = False
+        self.symbol_error_lp = False
+        self.bits_received = 0
+        self.bits_received_lp = 0
+        self.confidence = 0
+
+    @property
+    def errors(self):
+        """int: The errors the confidence level of the DUT is computed with."""
+        return self.dut_errors + self.drop_errors
+
+
 class LHC:
     """This class provides the core functionality for the LHC test.
 
     Attributes:
 
     """
+    # SNR above the first value is a low risk, below the second one a high risk
+    SNR_DISTRIBUTION = {
+        'Broadwell': [27, 16],
+        'Carlsville': [0, 0],
+        'Columbiaville': [40, 20],
+        'Coppervale': [4, 2],
+        'Denverton': [36, 25],
+        'Fortville': [40, 20],
+        'Fortville25': [40, 20],
+        'Foxville': [4, 2],
+        'Lewisberg': [36, 25],
+        'Niantic': [17, 16],
+        'Parkvale': [40, 20],
+        'Powerville': [0, 0],
+        'RedRockCanyon': [40, 20],
+        'Sageville': [4, 2],
+        'Twinville': [0, 0]
+    }
+
+    # The VBCM tools work in fixed folders, so only one VBCM measurement runs at a time
+    vbcm_lock = threading.Lock()
+
+    TTL_KEYS = ('MAC-TTL(ms)', 'EXT-PHY-TTL(ms)', 'LINK TTL(MS)')
+
+    # The stages of an iteration, in order, that end with a journal checkpoint.
+    # RESULTS ends the last iteration of a complete test.
+    STAGES = ('STATUS', 'BER', 'RESULTS')
+
     def __init__(self, dut, lp, link_attempts, ber_iterations, channel,
                  dut_name, lp_name, ttl_delay, retry_ttl, logger):
         """
@@ -68,8 +190,10 @@ class LHC:
             ttl_delay (int):
             retry_ttl (int):
         """
-        self.start = time.time()
+        self.start = ethspylib.clock.time()
         self.test_complete = False
+        for dev in (dut, lp):
+            ethspylib.metrics.reset(dev.port.host_name, dev.port.slot_number)
         self.output_dir = es_vars['OUTPUT_DIR']
         self.reset_side = es_vars['RESET_SIDE']
         self.ber_target = es_vars['BER_TARGET']
@@ -119,12 +243,19 @@ class LHC:
         self.disable_ehm_dnv()
 
         # Create the data container and add the static information to it
-        self.data = {'TestName': 'LHC'}
+        self.store = MeasurementStore()
+        # The store_data() calls held back per thread, see collect_status()
+        self.deferred_calls = threading.local()
+        # Crash-safe record of the samples, see resume()
+        self.journal = None
+        self.store.update({'TestName': 'LHC'})
+        self.live = StreamingStatistics(self.store)
+        self.ttl_timing = None
 
         if self.channel.lower() == 'auto':
             self.module_info = self.dut.ethspy_module_info_get_all()
-            self.data = self.store_static_data(
-                self.module_info, self.data, ('MODULE-INFO',)
+            self.store_static_data(
+                self.module_info, ('MODULE-INFO',)
             )
         else:
             self.module_info = self.channel
@@ -140,103 +271,533 @@ class LHC:
 
         self.check_max_filename_length()
 
+        # Lane status commands per device and lane, see prefetch_lane_status()
+        self.lane_status_commands = {}
+        # What is collected from each device in every iteration
+        self.plans = {dev.id: self.collection_plan(dev) for dev in (self.dut, self.link_partner)}
+        self.ttl_percentiles = (50, 95, 99)
+
+        if es_vars.get('JOURNAL', 'Enable') == 'Enable':
+            self.journal = Journal(
+                self.create_filename_check_path('ndjson'),
+                {'DUT': dut_name, 'LP': lp_name, 'CHANNEL': channel},
+                sync_records=es_vars.get('JOURNAL_SYNC_RECORDS', 100),
+                sync_seconds=es_vars.get('JOURNAL_SYNC_SECONDS', 5)
+            )
+            self.journal.record_static(self.data, ())
+        # The last (iteration, stage) found in the journal by resume()
+        self.resume_point = None
+
     def main_test(self):
         """Runs the LHC test and controls the main loop.
 
         Only the TTL, EHM, and BER tests are allowed run if the device is Lewisberg.
         """
         for iteration in range(1, self.link_attempts + 1):
-            self.iteration_info(iteration)
-            if self.bypass_ttl == 0:
-                self.run_ttl()
-
-            time.sleep(10)
-            for device in [self.dut, self.link_partner]:
-                if device.test_enabled == 'Enable':
-
-                    if device.codename != 'Lewisberg':
-                        self.run_link_get_status(device)
+            if self.completed(iteration, 'BER'):
+                continue
 
-                    for lane in range(0, 4):
-                        if device.codename != 'Lewisberg':
-                            self.run_training_coeff_log(device, lane, iteration)
-
-                        self.run_snr(device, lane, iteration)
+            if self.completed(iteration, 'STATUS'):
+                self.store.iteration = iteration
+            else:
+                self.iteration_info(iteration)
+                if self.bypass_ttl == 0:
+                    self.run_ttl()
 
-                        if device.codename != 'Lewisberg':
-                            self.run_rx_get_status(device, lane)
-                            self.run_tx_get_status(device, lane)
-                            self.run_lane_get_status(device, lane)
-                            self.run_rx_get_ehm(device, lane)  # Snowridge only!
+                self.wait_state(*self.link_up_wait(self.wait_limit('link_up')))
+                self.collect_status(iteration)
+                self.checkpoint(iteration, 'STATUS')
 
-                    #self.logger.info('\n')
-                    
             ber_data = self.ber_run(iteration)
             for k in ber_data:
-                self.store_data(ber_data[k], self.data, (k, 'BER'))
+                self.store_data(ber_data[k], (k, 'BER'))
+            self.checkpoint(iteration, 'BER')
 
-        self.data = self.statistics(self.data)
+            self.update_live_statistics()
+
+        self.statistics()
+        self.store_command_timing()
+        self.checkpoint(self.link_attempts, 'RESULTS')
         self.test_complete = True
 
         return self.data
 
-    def add_static_data(self, data, dictionary):
-        """Adds static data to the data dictionary.
+    def resume(self):
+        """Continues an interrupted run of the same DUT, LP and channel from its journal.
 
-        Static data needs to be handled differently from dynamic data.
+        The samples of the completed stages are read back into the store and
+        main_test() then starts with the first stage that was not completed: the
+        status collection or the BER run of an iteration.
 
-        Note: This is a recursive method!
+        Returns:
+            bool: True if there was something to resume.
+        """
+        if self.journal is None:
+            return False
+
+        checkpoint = self.journal.resume(self.store)
+        if checkpoint is None:
+            self.logger.info('No journal to resume, starting from the first iteration')
+            return False
+
+        self.resume_point = (checkpoint['CHECKPOINT'], checkpoint['STAGE'])
+        self.ber_iterations = checkpoint['BER_ITERATIONS']
+        self.update_live_statistics()
+        self.logger.info('Resuming after the {} stage of iteration {}'.format(
+            checkpoint['STAGE'], checkpoint['CHECKPOINT']
+        ))
+
+        return True
+
+    def completed(self, iteration, stage):
+        """Returns True if stage of iteration was completed before the run was resumed."""
+        if self.resume_point is None:
+            return False
+
+        last_iteration, last_stage = self.resume_point
+        return (iteration, self.STAGES.index(stage)) <= \
+            (last_iteration, self.STAGES.index(last_stage))
+
+    def checkpoint(self, iteration, stage):
+        """Commits stage of iteration in the journal, the samples stored so far are
+        then durable. The journal is closed after the RESULTS."""
+        if self.journal is not None:
+            self.journal.checkpoint(iteration, stage, BER_ITERATIONS=self.ber_iterations)
+            if stage == 'RESULTS':
+                self.journal.close()
+
+    def collect_status(self, iteration):
+        """Collects the link and lane data of the DUT and LP and stores it.
+
+        The two sides sit on different EthAgent hosts and are collected at the same
+        time, each in its own thread. The store_data() calls of every side are held
+        back and made afterwards in the order of a sequential collection (DUT before
+        LP, lane by lane), so the stored data is the same as if the sides had been
+        collected one after the other.
 
         Args:
-            data (dict): The data to add.
-            dictionary (dict): The dictionary to store the data into.
+            iteration (int): The current LHC iteration.
         """
-        for key in data:
-            if isinstance(data[key], dict):
-                try:
-                    dictionary[key].update(
-                        self.add_static_data(data[key], dictionary[key])
-                    )
-                except KeyError:
-                    # this is where a new key gets added
-                    dictionary[key] = {}
-                    dictionary[key].update(
-                        self.add_static_data(data[key], dictionary[key])
-                    )
-            else:
-                dictionary[key] = data[key]
+        devices = [dev for dev in (self.dut, self.link_partner) if dev.test_enabled == 'Enable']
+        if len(devices) < 2 or es_vars.get('CONCURRENT_COLLECTION', 'Enable') != 'Enable':
+            for device in devices:
+                self.collect_device_status(device, iteration)
+            return
+
+        with ThreadPoolExecutor(max_workers=len(devices)) as executor:
+            sides = [
+                executor.submit(self.collect_deferred, self.collect_device_status, device, iteration)
+                for device in devices
+            ]
+            results = [side.result() for side in sides]
+        self.replay_deferred(results)
+
+    def collect_device_status(self, device, iteration):
+        """Collects and stores the link data and the data of every lane of device.
+
+        What is collected comes from the collection plan of the device, see
+        collection_plan(). The lanes are collected concurrently if the device class
+        allows it, see LegacyCommands.concurrent_lanes.
 
-        return dictionary
+        Args:
+            device (obj): The device to collect the data from.
+            iteration (int): The current LHC iteration.
+        """
+        plan = self.plans[device.id]
+        if plan.link:
+            self.run_link_get_status(device)
 
-    def append_data(self, data, dictionary):
-        for key in data:
-            if isinstance(data[key], dict):
-                try:
-                    dictionary[key].update(
-                        self.append_data(data[key], dictionary[key])
-                    )
-                except KeyError:
-                    dictionary[key] = {}
-                    dictionary[key].update(
-                        self.append_data(data[key], dictionary[key])
+        if device.concurrent_lanes and es_vars.get('CONCURRENT_COLLECTION', 'Enable') == 'Enable':
+            self.collect_lanes_concurrently(device, iteration)
+        else:
+            for lane in plan.lanes:
+                self.collect_lane_status(device, lane, iteration)
+
+    def collect_lane_status(self, device, lane, iteration, training_logs=True):
+        """Collects and stores the data of one lane of device.
+
+        Args:
+            device (obj): The device to collect the data from.
+            lane (int): The lane to collect.
+            iteration (int): The current LHC iteration.
+            training_logs (bool): Also get the training coeff logs of the lane.
+        """
+        plan = self.plans[device.id]
+        if training_logs and plan.training_logs:
+            self.run_training_coeff_log(device, lane, iteration)
+        if plan.snr:
+            self.run_snr(device, lane, iteration)
+        commands = self.prefetch_lane_status(device, lane)
+        try:
+            if plan.rx_status:
+                self.run_rx_get_status(device, lane)
+            if plan.tx_status:
+                self.run_tx_get_status(device, lane)
+            if plan.lane_status:
+                self.run_lane_get_status(device, lane)
+        finally:
+            device.port.drop_prefetched(commands)
+        if plan.ehm:
+            self.run_rx_get_ehm(device, lane)
+
+    def collect_lanes_concurrently(self, device, iteration):
+        """Collects the lanes of device at the same time, one thread per lane.
+
+        The training coeff logs of all lanes go to the same file, so they are still
+        fetched lane by lane, while the other lane queries run.
+
+        Args:
+            device (obj): The device to collect the data from.
+            iteration (int): The current LHC iteration.
+        """
+        plan = self.plans[device.id]
+        with ThreadPoolExecutor(max_workers=len(plan.lanes) or 1) as executor:
+            lanes = [
+                executor.submit(
+                    self.collect_deferred, self.collect_lane_status, device, lane, iteration, False
+                )
+                for lane in plan.lanes
+            ]
+            results = []
+            for lane, future in zip(plan.lanes, lanes):
+                if plan.training_logs:
+                    results.append(
+                        self.collect_deferred(self.run_training_coeff_log, device, lane, iteration)
                     )
-            else:
-                if isinstance(data[key], list):
-                    try:
-                        dictionary[key].extend(data[key])
-                    except (KeyError, AttributeError, TypeError):
-                        dictionary[key] = data[key]
+                results.append(future.result())
+        self.replay_deferred(results)
+
+    def collection_plan(self, device):
+        """Works out once which data is collected from device in every iteration.
+
+        The lanes are those of the link, see link_lanes(). Queries the device class
+        does not support (see LegacyCommands.supports()) are left out, so their
+        placeholder results are neither collected nor stored. Without SNR control
+        no SNR is collected.
+
+        Args:
+            device (obj): The device to plan the collection for.
+
+        Returns:
+            CollectionPlan: What to collect from device.
+        """
+        snr = device.snr_control == 'Enable'
+        vbcm = bool(snr and device.codename in ['Lewisberg', 'Denverton'] and self.winpy)
+        return CollectionPlan(
+            link=device.supports('ethspy_link_get_status'),
+            lanes=range(0, self.link_lanes(device)),
+            training_logs=device.supports('ethspy_rx_get_training_coeff_logs'),
+            snr=vbcm or (snr and device.supports('ethspy_rx_get_snr')),
+            vbcm=vbcm,
+            rx_status=device.supports('ethspy_rx_get_status'),
+            tx_status=device.supports('ethspy_tx_get_status'),
+            lane_status=device.supports('ethspy_lane_get_status'),
+            ehm=device.supports('ethspy_rx_get_ehm'),
+        )
+
+    @staticmethod
+    def link_lanes(device):
+        """Return the number of lanes of the link under test.
+
+        That is the n of a configured CRn link mode, e.g. 2 for '50GBASET-CR2', and
+        device.lanes for the other link modes.
+        """
+        match = re.search(r'-CR(\d)$', es_vars['speed'])
+        if match:
+            return int(match.group(1))
+
+        return device.lanes
+
+    def defer(self, func, *args):
+        """Calls func(*args), or holds the call back if the current thread collects
+        data for collect_status(). Used for the store and the displays reading it."""
+        calls = getattr(self.deferred_calls, 'calls', None)
+        if calls is None:
+            func(*args)
+        else:
+            calls.append((func, args))
+
+    def collect_deferred(self, func, *args):
+        """Runs func(*args) with the calls passed to defer() held back.
+
+        Returns:
+            tuple: The held back calls and the exception raised by func, None if it
+                returned.
+        """
+        calls = []
+        outer = getattr(self.deferred_calls, 'calls', None)
+        self.deferred_calls.calls = calls
+        try:
+            func(*args)
+        except Exception as err:
+            return calls, err
+        finally:
+            self.deferred_calls.calls = outer
+
+        return calls, None
+
+    def replay_deferred(self, results):
+        """Makes the calls held back by collect_deferred() in the order of results.
+
+        The exception of the first failed collection is raised after its calls, the
+        results after it are dropped, like the data a sequential collection never
+        got to.
+        """
+        for calls, error in results:
+            for func, args in calls:
+                self.defer(func, *args)
+            if error is not None:
+                raise error
+
+    async def main_test_async(self):
+        """asyncio variant of main_test.
+
+        Device queries go over one ethspy_async.AsyncPort per side and all waits are
+        awaited, so the LHC runs of several DUT/LP pairs can share one event loop.
+        The stored data is the same as for main_test.
+        """
+        self.async_ports = {
+            dev.id: ethspy_async.AsyncPort.from_port(dev.port)
+            for dev in (self.dut, self.link_partner)
+        }
+
+        try:
+            for iteration in range(1, self.link_attempts + 1):
+                if self.completed(iteration, 'BER'):
+                    continue
+
+                if self.completed(iteration, 'STATUS'):
+                    self.store.iteration = iteration
                 else:
-                    try:
-                        dictionary[key].append(data[key])
-                    except (KeyError, AttributeError, TypeError):
-                        dictionary[key] = []
-                        dictionary[key].append(data[key])
+                    self.iteration_info(iteration)
+                    if self.bypass_ttl == 0:
+                        await self.run_ttl_async()
+
+                    await self.wait_state_async(*self.link_up_wait(self.wait_limit('link_up')))
+                    for device in [self.dut, self.link_partner]:
+                        if device.test_enabled == 'Enable':
+                            await self.collect_status_async(device, iteration)
+                    await asyncio.to_thread(self.checkpoint, iteration, 'STATUS')
+
+                ber_data = await self.ber_run_async(iteration)
+                for k in ber_data:
+                    self.store_data(ber_data[k], (k, 'BER'))
+                await asyncio.to_thread(self.checkpoint, iteration, 'BER')
+
+                self.update_live_statistics()
+        finally:
+            for aport in self.async_ports.values():
+                await aport.disconnect()
+
+        self.statistics()
+        self.store_command_timing()
+        self.checkpoint(self.link_attempts, 'RESULTS')
+        self.test_complete = True
+
+        return self.data
+
+    async def acall(self, dev, method, *args):
+        """Runs a device query with its EthAgent traffic on the device's AsyncPort."""
+        return await ethspy_async.call_device(dev, self.async_ports[dev.id], method, *args)
+
+    async def collect_status_async(self, device, iteration):
+        """Fetches one device's link and lane data and stores it.
+
+        The queries of a lane are sent in one burst right after the SNR of the lane,
+        in the order of collect_lane_status(). The VBCM based SNR measurement runs
+        external tools and the training coeff logs are streamed to a file, both are
+        therefore run in a worker thread.
+        """
+        plan = self.plans[device.id]
+        aport = self.async_ports[device.id]
+
+        if plan.link:
+            commands, responses = await ethspy_async.fetch_responses(
+                device, aport, [(device.ethspy_link_get_status, ())]
+            )
+            with device.port.serve_responses(commands, responses):
+                self.run_link_get_status(device)
+
+        for lane in plan.lanes:
+            if plan.training_logs:
+                self.store_data(
+                    await asyncio.to_thread(self.training_coeff_log, device, lane, iteration, device.id),
+                    (device.id, 'TRAINING_LOGS')
+                )
+            if plan.vbcm:
+                self.store_data(
+                    await asyncio.to_thread(self.snr, device, lane, iteration), (device.id, 'SNR', lane)
+                )
+
+            calls = []
+            if plan.snr and not plan.vbcm:
+                calls.append((device.ethspy_rx_get_snr, (5, lane)))
+            for method in plan.status_queries:
+                calls.append((getattr(device, method), (lane,)))
+            if plan.ehm:
+                calls.append((device.ethspy_rx_get_ehm, (lane,)))
+            commands, responses = await ethspy_async.fetch_responses(device, aport, calls)
+
+            with device.port.serve_responses(commands, responses):
+                if plan.snr and not plan.vbcm:
+                    self.run_snr(device, lane, iteration)
+                if plan.rx_status:
+                    self.run_rx_get_status(device, lane)
+                if plan.tx_status:
+                    self.run_tx_get_status(device, lane)
+                if plan.lane_status:
+                    self.run_lane_get_status(device, lane)
+                if plan.ehm:
+                    self.run_rx_get_ehm(device, lane)
+
+    async def run_ttl_async(self):
+        """asyncio variant of run_ttl."""
+        try:
+            self.store_data(await self.ttl_async(self.retry_ttl), (self.reset_side, 'TTL'))
+            self.display_ttl()
+            self.logger.info('Waiting up to {} seconds for the link to settle...'.format(self.ttl_delay))
+            await self.wait_state_async(*self.link_up_wait(self.ttl_delay))
+        except AttributeError:
+            pass
+
+    async def ttl_async(self, retry_ttl):
+        """asyncio variant of ttl."""
+        side = self.dut if self.reset_side == 'DUT' else self.link_partner
+
+        while retry_ttl:
+            ttl_dict = self.ttl_result(await self.acall(side, side.ethspy_link_get_ttl), retry_ttl)
+            if ttl_dict is not None:
+                return ttl_dict
+            await self.wait_state_async(*self.link_up_wait(self.ttl_delay))
+            retry_ttl -= 1
+
+        raise self.ttl_retry_error()
+
+    async def ber_run_async(self, iteration):
+        """asyncio variant of ber_run."""
+        self.ber_snr_check()
+        await self.wait_state_async(*self.link_up_wait(self.wait_limit('ber_start')))
+
+        if self.ber_iterations > 0:
+            ber_info = await self.ber_test_async(iteration)
+            for k in ber_info:
+                self.backfill_ber_data(ber_info[k], iteration, k)
+
+            self.ber_iterations -= 1   # Keep BER from continuing to run
+        else:
+            ber_info = {}
+            for side in [self.dut, self.link_partner]:
+                if side.test_enabled == 'Enable':
+                    for k in self.store.keys((side.id, 'BER')):
+                        try:
+                            ber_info[side.id].update({k: 'N/A'})
+                        except KeyError:
+                            ber_info[side.id] = {k: 'N/A'}
 
-        return dictionary
+        return ber_info
+
+    async def ber_test_async(self, iteration):
+        """asyncio variant of ber_test."""
+        self.display_ber_start()
+        await self.start_traffic_async()
+
+        ber = BerMeasurement(ethspylib.clock.time())
+        while True:
+            stats, stats_lp, bandwidth, lp_bandwidth = await asyncio.gather(
+                self.acall(self.dut, self.dut.ethspy_link_get_stats),
+                self.acall(self.link_partner, self.link_partner.ethspy_link_get_stats),
+                self.acall(self.dut, self.dut.bandwidth),
+                self.acall(self.link_partner, self.link_partner.bandwidth)
+            )
+            end = self.ber_update(ber, iteration, stats, bandwidth, stats_lp, lp_bandwidth)
+            if end == 'STOP':
+                await self.stop_traffic_async()
+            elif end == 'DROPPED':
+                ber.drop_errors, _ = await self.dropped_packet_check_async(ber.drop_errors)
+            if end is not None:
+                break
+            await asyncio.sleep(self.ber_pause(ber))
+
+        lp_stats = None
+        if self.link_partner.test_enabled == 'Enable':
+            lp_stats = await self.acall(self.link_partner, self.link_partner.ethspy_link_get_stats)
+
+        return self.ber_results(ber, lp_stats)
+
+    def start_traffic(self):
+        """Clears the counters and starts the DUT and then the link partner transmitter."""
+        self.dut.clear_counters()
+        self.link_partner.clear_counters()
+        self.wait_state(*self.counters_cleared_wait())
+        self.control_traffic(self.traffic_steps(start=True))
+
+    async def start_traffic_async(self):
+        """asyncio variant of start_traffic."""
+        await self.acall(self.dut, self.dut.clear_counters)
+        await self.acall(self.link_partner, self.link_partner.clear_counters)
+        await self.wait_state_async(*self.counters_cleared_wait())
+        await self.control_traffic_async(self.traffic_steps(start=True))
+
+    def stop_traffic(self, drain=False):
+        """Stops the link partner and then the DUT transmitter.
+
+        Args:
+            drain (bool): Wait until the DUT received every packet the link partner
+                sent, see rx_drained_wait().
+        """
+        self.control_traffic(self.traffic_steps(drain=drain))
+
+    async def stop_traffic_async(self, drain=False):
+        """asyncio variant of stop_traffic."""
+        await self.control_traffic_async(self.traffic_steps(drain=drain))
+
+    def control_traffic(self, steps):
+        """Runs the tx_rx_control() calls and waits of traffic_steps()."""
+        for dev, command, wait in steps:
+            dev.tx_rx_control(command)
+            self.wait_state(*wait)
+
+    async def control_traffic_async(self, steps):
+        """asyncio variant of control_traffic."""
+        for dev, command, wait in steps:
+            await self.acall(dev, dev.tx_rx_control, command)
+            await self.wait_state_async(*wait)
+
+    def traffic_steps(self, start=False, drain=False):
+        """Returns how the traffic of the BER test is started or stopped.
+
+        Args:
+            start (bool): Start the DUT and then the link partner, else stop the link
+                partner and then the DUT.
+            drain (bool): When stopping, wait until the DUT received every packet the
+                link partner sent.
+
+        Returns:
+            list: (device, tx_rx_control() command, wait spec) of every step.
+        """
+        if start:
+            return [
+                (self.dut, 'START', self.tx_started_wait(self.dut)),
+                (self.link_partner, 'START', self.tx_started_wait(self.link_partner)),
+            ]
+        return [
+            (self.link_partner, 'STOP',
+             self.rx_drained_wait() if drain else self.tx_stopped_wait(self.link_partner)),
+            (self.dut, 'STOP', self.tx_stopped_wait(self.dut)),
+        ]
+
+    async def dropped_packet_check_async(self, previously_dropped):
+        """asyncio variant of dropped_packet_check."""
+        self.logger.info('Checking for dropped packets...')
+        await self.stop_traffic_async(drain=True)
+
+        rx_packets, _ = await self.acall(self.dut, self.dut.get_qr_counter)
+        tx_packets, _ = await self.acall(self.link_partner, self.link_partner.get_qt_counter)
+
+        return self.dropped_packets(tx_packets - rx_packets, previously_dropped)
 
     def backfill_ber_data(self, ber_data, i, side):
-        if 'BER' not in self.data[side] or not self.data[side]['BER']:
+        if not self.store.keys((side, 'BER')):
             for key in ber_data:
                 ber_data[key] = [ber_data[key]]
                 for _ in range(1, i):
@@ -246,7 +807,7 @@ class LHC:
 
     def ber_run(self, iteration):
         self.ber_snr_check()
-        time.sleep(5)
+        self.wait_state(*self.link_up_wait(self.wait_limit('ber_start')))
         
         if self.ber_iterations > 0:
             ber_info = self.ber_test(iteration)
@@ -258,22 +819,21 @@ class LHC:
             ber_info = {}
             for side in [self.dut, self.link_partner]:
                 if side.test_enabled == 'Enable':
-                    if 'BER' in self.data[side.id]:
-                        for k in self.data[side.id]['BER']:
-                            try:
-                                ber_info[side.id].update({k: 'N/A'})
-                            except KeyError:
-                                ber_info[side.id] = {k: 'N/A'}
+                    for k in self.store.keys((side.id, 'BER')):
+                        try:
+                            ber_info[side.id].update({k: 'N/A'})
+                        except KeyError:
+                            ber_info[side.id] = {k: 'N/A'}
 
         return ber_info
 
     def ber_snr_check(self):
-        for lane in range(0, self.dut.lanes):
+        for lane in self.plans['DUT'].lanes:
             stored_ber_iterations = self.ber_iterations
 
             for snr_string in self.dut.snr_type:
                 try:
-                    lst = self.data['DUT']['SNR'][lane][snr_string]
+                    lst = self.store.values(('DUT', 'SNR', lane, snr_string))
                     if lst[-1] < es_vars['BER_THRESHOLD'] \
                             and self.ber_iterations == 0:
                         # Increment ber_iterations to force it to run
@@ -286,173 +846,245 @@ class LHC:
                 break
 
     def ber_test(self, iteration):
-        # dut_ber_confidence, dut_errors, bits_received, dut_gprc = 0, 0, 0, 0
+        self.display_ber_start()
+        self.start_traffic()
 
-        self.logger.info('-------------------------------------------')
-        self.logger.info('Running BER measurement')
-        self.logger.info('-------------------------------------------')
+        ber = BerMeasurement(ethspylib.clock.time())
+        sampler = ThreadPoolExecutor(max_workers=2)
+        try:
+            while True:
+                # Get the packets received, errors and bandwidth of both sides at once
+                (stats, bandwidth), (stats_lp, lp_bandwidth) = self.ber_sample(sampler)
+                end = self.ber_update(ber, iteration, stats, bandwidth, stats_lp, lp_bandwidth)
+                if end == 'STOP':
+                    self.stop_traffic()
+                elif end == 'DROPPED':
+                    ber.drop_errors, _ = self.dropped_packet_check(ber.drop_errors)
+                if end is not None:
+                    break
+                ethspylib.clock.sleep(self.ber_pause(ber))
+        finally:
+            sampler.shutdown()
 
-        drop_errors = 0
-        symbol_error = False
-        symbol_error_lp = False
+        lp_stats = None
+        if self.link_partner.test_enabled == 'Enable':
+            lp_stats = self.link_partner.ethspy_link_get_stats()
 
-        # Start transmit and receive
-        self.dut.clear_counters()
-        self.link_partner.clear_counters()
-        time.sleep(1)
-        self.dut.tx_rx_control('START')
-        time.sleep(1)
-        self.link_partner.tx_rx_control('START')
-        time.sleep(1)
+        return self.ber_results(ber, lp_stats)
 
+    def ber_update(self, ber, iteration, stats, bandwidth, stats_lp, lp_bandwidth):
+        """Adds a sample of both sides to the BER measurement and displays it.
 
+        The samples are read by ber_test() and ber_test_async().
 
-        t_initial = time.time()
-        while True:
-            # Get the packets received and errors etc.
-            stats = self.dut.ethspy_link_get_stats()
-            dut_errors, symbol_error = self.sum_rcv_errors(stats, symbol_error)
-            
-            stats_lp = self.link_partner.ethspy_link_get_stats()
-            lp_errors, symbol_error_lp = self.sum_rcv_errors(stats_lp, symbol_error_lp)
-
-            # Run a QR to get the current RX packet count...
-            # dut_gprc, dut_errors = self.dut.get_qr_counter()
-
-            bits_received = (
-                stats['QR-GOOD-RECEIVES']
-                * es_vars['BER_PACKET_SIZE']
-                * 8
-            )
-            
-            bits_received_lp = (
-                stats_lp['QR-GOOD-RECEIVES']
-                * es_vars['BER_PACKET_SIZE']
-                * 8
-            )
+        Args:
+            ber (BerMeasurement): The running measurement.
+            iteration (int): The current LHC iteration.
+            stats (dict): LINK GET-STATS of the DUT.
+            bandwidth (dict): GET-BANDWIDTH of the DUT.
+            stats_lp (dict): LINK GET-STATS of the link partner.
+            lp_bandwidth (dict): GET-BANDWIDTH of the link partner.
 
-            # Compute the confidence level
-            dut_ber_confidence = self.ber_compute_confidence_level(
-                dut_errors+drop_errors, bits_received
-            )
+        Returns:
+            str: None to take another sample. 'STOP' to stop the traffic and end the
+            test, when the timeout or the error threshold was hit. 'DROPPED' to end it
+            with dropped_packet_check() and 'DONE' to end it, when the confidence level
+            was reached.
+        """
+        ber.stats, ber.stats_lp, ber.bandwidth = stats, stats_lp, bandwidth
+        ber.dut_errors, ber.symbol_error = self.sum_rcv_errors(stats, ber.symbol_error)
+        ber.lp_errors, ber.symbol_error_lp = self.sum_rcv_errors(stats_lp, ber.symbol_error_lp)
 
-            t_secondary = time.time()
-            t_delta = t_secondary - t_initial
+        ber.bits_received = stats['QR-GOOD-RECEIVES'] * es_vars['BER_PACKET_SIZE'] * 8
+        ber.bits_received_lp = stats_lp['QR-GOOD-RECEIVES'] * es_vars['BER_PACKET_SIZE'] * 8
 
-            # Get the bit rate
-            bit_rate_gbps = self.dut.bandwidth()['RX-MBPS'] / 1000.0
-            bit_tx_rate_gbps = self.dut.bandwidth()['TX-MBPS'] / 1000.0
-			
-            lp_bit_rate_gbps = self.link_partner.bandwidth()['RX-MBPS'] / 1000.0
-            lp_bit_tx_rate_gbps = self.link_partner.bandwidth()['TX-MBPS'] / 1000.0
+        # Compute the confidence level
+        ber.confidence = self.ber_compute_confidence_level(ber.errors, ber.bits_received)
 
-            self.display_ber(
-                t_delta, iteration, bit_rate_gbps, bit_tx_rate_gbps, lp_bit_rate_gbps, lp_bit_tx_rate_gbps, stats['QR-GOOD-RECEIVES'],
-                dut_errors+drop_errors, dut_ber_confidence
-            )
+        ber.time = ethspylib.clock.time()
+        t_delta = ber.time - ber.start
 
-            if t_delta > es_vars['BER_TIMEOUT']:
-                self.logger.info(
-                    'The {} second timeout for the BER test has been reached!'.format(
-                        es_vars['BER_TIMEOUT']
-                    )
+        self.display_ber(
+            t_delta, iteration,
+            bandwidth['RX-MBPS'] / 1000.0, bandwidth['TX-MBPS'] / 1000.0,
+            lp_bandwidth['RX-MBPS'] / 1000.0, lp_bandwidth['TX-MBPS'] / 1000.0,
+            stats['QR-GOOD-RECEIVES'], ber.errors, ber.confidence
+        )
+
+        if t_delta > es_vars['BER_TIMEOUT']:
+            self.logger.info(
+                'The {} second timeout for the BER test has been reached!'.format(
+                    es_vars['BER_TIMEOUT']
                 )
-                self.logger.info('Ending BER test now!')
-                self.link_partner.tx_rx_control('STOP')
-                time.sleep(10)
-                self.dut.tx_rx_control('STOP')
-                time.sleep(10)
-                break
+            )
+            self.logger.info('Ending BER test now!')
+            return 'STOP'
 
-            if dut_errors+drop_errors > es_vars['BER_ERROR_THRESHOLD']:
-                self.logger.info(
-                    'Error threshold of {} has been exceeded!'.format(
-                        es_vars['BER_ERROR_THRESHOLD']
-                    )
+        if ber.errors > es_vars['BER_ERROR_THRESHOLD']:
+            self.logger.info(
+                'Error threshold of {} has been exceeded!'.format(
+                    es_vars['BER_ERROR_THRESHOLD']
                 )
-                self.logger.info('Ending BER test now!')
-                self.link_partner.tx_rx_control('STOP')
-                time.sleep(10)
-                self.dut.tx_rx_control('STOP')
-                time.sleep(10)
-                break
+            )
+            self.logger.info('Ending BER test now!')
+            return 'STOP'
 
-            if dut_ber_confidence >= es_vars['BER_CONFIDENCE']: 
-                if (self.link_partner.test_enabled == 'Enable'
-                        and es_vars['DROPPED_PACKETS'] == 'Enable'):
-                    drop_errors, delta = self.dropped_packet_check(drop_errors)
-                    '''if delta == 0:'''
-                    break
-                else:
-                    break
+        if ber.confidence >= es_vars['BER_CONFIDENCE']:
+            if (self.link_partner.test_enabled == 'Enable'
+                    and es_vars['DROPPED_PACKETS'] == 'Enable'):
+                return 'DROPPED'
+            return 'DONE'
 
-            time.sleep(1)  # Poll the number of packets once a second
+        return None
+
+    def ber_pause(self, ber):
+        """Returns the seconds to wait for the next sample, see ber_poll_interval()."""
+        bit_rate = self.ber_bit_rate(
+            ber.bits_received - ber.last_bits, ber.time - ber.last_time, ber.bandwidth
+        )
+        ber.last_time, ber.last_bits = ber.time, ber.bits_received
+        return self.ber_poll_interval(ber.errors, ber.bits_received, bit_rate, ber.time - ber.start)
 
-        # Stop transmit and receive
-        #self.dut.tx_rx_control('STOP')
-        #self.link_partner.tx_rx_control('STOP')
+    def ber_results(self, ber, lp_stats):
+        """Returns the BER data of the DUT and the link partner at the end of the test.
 
+        Args:
+            ber (BerMeasurement): The finished measurement.
+            lp_stats (dict): LINK GET-STATS of the link partner read after the test,
+                None if the link partner is not tested.
+        """
         try:
-            dut_measured_ber = float(dut_errors) / float(bits_received)
-            lp_measured_ber = float(lp_errors) / float(bits_received_lp)
-            self.logger.info('DUT error is {}'.format(dut_errors))
+            dut_measured_ber = float(ber.dut_errors) / float(ber.bits_received)
+            lp_measured_ber = float(ber.lp_errors) / float(ber.bits_received_lp)
+            self.logger.info('DUT error is {}'.format(ber.dut_errors))
             self.logger.info('Measured DUT BER is {:.29f}\n'.format(dut_measured_ber))
-            
-            self.logger.info('LP error is {}'.format(lp_errors))
+
+            self.logger.info('LP error is {}'.format(ber.lp_errors))
             self.logger.info('Measured LP BER is {:.29f}\n'.format(lp_measured_ber))
-            
+
         except ZeroDivisionError:
             dut_measured_ber = 'Error'
+            lp_measured_ber = 'Error'
 
-        ber_pf = self.ber_pass_fail(dut_ber_confidence)
+        ber_pf = self.ber_pass_fail(ber.confidence)
 
         return_data = {
             'DUT': {
-                'CONFIDENCE': dut_ber_confidence,
-                'ERRORS': dut_errors,
-                'GPRC': stats['QR-GOOD-RECEIVES'],
+                'CONFIDENCE': ber.confidence,
+                'ERRORS': ber.dut_errors,
+                'GPRC': ber.stats['QR-GOOD-RECEIVES'],
                 'MEASURED_BER': dut_measured_ber,
                 'PACKET_SIZE': es_vars['BER_PACKET_SIZE'],
                 'PASS_FAIL': ber_pf
             }
         }
-        
-        return_data['DUT'].update(stats)
-        return_data['DUT']['ERROR-SYMBOL-RECEIVED'] = symbol_error
 
-        if self.link_partner.test_enabled == 'Enable':
-            return_data['LP'] = self.link_partner.ethspy_link_get_stats()
-            return_data['LP']['ERRORS'] = lp_errors
-            return_data['LP']['GPRC'] = stats_lp['QR-GOOD-RECEIVES']
+        return_data['DUT'].update(ber.stats)
+        return_data['DUT']['ERROR-SYMBOL-RECEIVED'] = ber.symbol_error
+
+        if lp_stats is not None:
+            return_data['LP'] = lp_stats
+            return_data['LP']['ERRORS'] = ber.lp_errors
+            return_data['LP']['GPRC'] = ber.stats_lp['QR-GOOD-RECEIVES']
             return_data['LP']['MEASURED_BER'] = lp_measured_ber
 
         return return_data
 
-    def compute_statistics(self, lst):
-        """Compute the min, mean, max, mode, and mode frequency of lst and
-        return the values as a dictionary.
+    def ber_sample(self, executor):
+        """Reads the stats and the bandwidth of the DUT and the link partner concurrently.
 
-        If lst does not have a min, mean, max, or unique mode, it will
-        have None as the value for that particular statistic.
+        Args:
+            executor (obj): A ThreadPoolExecutor with at least two workers.
 
-        :param list lst: A list containing values to compute statistics on
-        :return: The statistics of lst
-        :rtype: dict
+        Returns:
+            tuple: (stats, bandwidth) of the DUT and (stats, bandwidth) of the link partner.
         """
-        output = {}
-        clean_list = [
-            x for x in lst if isinstance(x, int) or isinstance(x, float)
+        futures = [
+            executor.submit(self.ber_side_sample, side)
+            for side in (self.dut, self.link_partner)
         ]
 
-        if clean_list:
-            output.update(self.stats_min(clean_list))
-            output.update(self.stats_mean(clean_list))
-            output.update(self.stats_max(clean_list))
-            output.update(self.stats_stddev(clean_list))
+        return tuple(future.result() for future in futures)
 
-        output.update(self.stats_mode(lst))
+    @staticmethod
+    def ber_side_sample(dev):
+        """Reads the stats and one GET-BANDWIDTH response from a device."""
+        return dev.ethspy_link_get_stats(), dev.bandwidth()
 
-        return output
+    @staticmethod
+    def ber_bit_rate(bits, seconds, bandwidth):
+        """Returns the received bits per second between two samples.
+
+        Falls back to the RX rate reported by GET-BANDWIDTH for the first sample.
+        """
+        if bits > 0 and seconds > 0:
+            return bits / seconds
+
+        return bandwidth.get('RX-MBPS', 0) * 1e6
+
+    def ber_poll_interval(self, errors, bits, bit_rate, t_delta):
+        """Returns how long to wait before the next BER sample.
+
+        The wait is the predicted time until the confidence level reaches
+        BER_CONFIDENCE at the current bit rate, so the test ends right at the
+        crossing. Once errors are counted, it is also capped by the predicted time
+        until they exceed BER_ERROR_THRESHOLD at the error rate so far, so a
+        failing link is stopped in time. It is clamped to [BER_POLL_MIN,
+        BER_POLL_MAX] seconds so new errors are still noticed, and never runs past
+        the BER timeout.
+
+        Args:
+            errors (int): Errors counted so far.
+            bits (int): Bits received so far.
+            bit_rate (float): Current received bits per second.
+            t_delta (float): Seconds since the BER test started.
+
+        Returns:
+            float: Seconds to wait.
+        """
+        poll_min = float(es_vars.get('BER_POLL_MIN', 0.25))
+        poll_max = float(es_vars.get('BER_POLL_MAX', 1))
+
+        if bit_rate > 0:
+            bits_needed = self.ber_bits_to_confidence(errors, es_vars['BER_CONFIDENCE'])
+            remaining = (bits_needed - bits) / bit_rate
+        else:
+            remaining = poll_max
+
+        if errors > 0 and t_delta > 0:
+            error_rate = errors / t_delta
+            remaining = min(remaining, (es_vars['BER_ERROR_THRESHOLD'] + 1 - errors) / error_rate)
+
+        remaining = min(remaining, es_vars['BER_TIMEOUT'] - t_delta + poll_min)
+
+        return min(max(remaining, poll_min), poll_max)
+
+    def ber_bits_to_confidence(self, errors, confidence):
+        """Returns the number of bits needed to reach a confidence level with errors errors.
+
+        Args:
+            errors (int): Number of errors.
+            confidence (float): Target confidence level in percent.
+
+        Returns:
+            float: The number of bits.
+        """
+        return ber_stats.bits_for_confidence(errors, confidence, self.ber_target)
+
+    def compute_statistics(self, lst, percentiles=()):
+        """Compute the min, mean, max, stddev, mode, and mode frequency of lst and
+        return the values as a dictionary.
+
+        Non-numeric entries ('N/A', 'ERROR', ...) are left out of everything but the
+        mode. If lst has no numeric entries or no unique mode, those statistics are
+        missing or 'None'.
+
+        :param list lst: A list containing values to compute statistics on
+        :param tuple percentiles: Percentiles to add, e.g. (50, 95, 99) for 'P50'...
+        :return: The statistics of lst
+        :rtype: dict
+        """
+        return summarize(lst, percentiles)
 
     def create_filename_check_path(self, ext):
         """Create the output file name from the DUT_NAME, the CHANNEL_NAME,
@@ -589,7 +1221,24 @@ class LHC:
             'LP SNR measurement {}d!\n'.format(self.link_partner.snr_control.lower())
         )
 
+    def display_ber_start(self):
+        """Logs the header of the BER test."""
+        self.logger.info('-------------------------------------------')
+        self.logger.info('Running BER measurement')
+        self.logger.info('-------------------------------------------')
+
     def display_ber(self, delta_t, i, bit_rate, bit_tx_rate, lp_bit_rate, lp_bit_tx_rate, gprc, errors, ber_confidence):
+        """Logs one BER progress line, see ber_line().
+
+        The line is only built when the log writer formats it, not in the BER loop.
+        """
+        self.logger.info('%s', LazyMessage(
+            self.ber_line, delta_t, i, bit_rate, bit_tx_rate, lp_bit_rate, lp_bit_tx_rate,
+            gprc, errors, ber_confidence
+        ))
+
+    def ber_line(self, delta_t, i, bit_rate, bit_tx_rate, lp_bit_rate, lp_bit_tx_rate, gprc, errors, ber_confidence):
+        """Returns the BER progress line of the table shown during the BER test."""
         t_min, t_sec = divmod(delta_t, 60)
 
         timestamp = self.field_width(
@@ -629,10 +1278,8 @@ class LHC:
             '{} CL = {}%'.format(self.ber_target, ber_confidence), 18
         )
 
-        self.logger.info(
-            '{}|{}| {} | {} | {} | {} | {} |{}|{}|{}|'.format(
-                timestamp, iteration, dut_slot, tx_rate, rate, lp_tx_rate, lp_rate, good_rx, rx_errors, confidence_level
-            )
+        return '{}|{}| {} | {} | {} | {} | {} |{}|{}|{}|'.format(
+            timestamp, iteration, dut_slot, tx_rate, rate, lp_tx_rate, lp_rate, good_rx, rx_errors, confidence_level
         )
 
     def display_iteration(self, iteration):
@@ -657,8 +1304,8 @@ class LHC:
         # Output the EHM data to the screen
         # key - [list] all keys in dict
         # lst - [list] associated value of the key
-        for key in self.data[device.id]['LANE'][lane].keys():
-            lst = self.data[device.id]['LANE'][lane][key]
+        for key in self.store.keys((device.id, 'LANE', lane)):
+            lst = self.store.values((device.id, 'LANE', lane, key))
             try:
                 self.logger.info(
                     '{} {} Lane{}: {} ( Min:{} | Mean:{} | Max:{} )\n'.format(
@@ -678,8 +1325,8 @@ class LHC:
         # Output the SNR data to the screen
         # key - [list] all keys in dict
         # lst - [list] associated value of the key
-        for key in self.data[device.id]['SNR'][lane].keys():
-            lst = self.data[device.id]['SNR'][lane][key]
+        for key in self.store.keys((device.id, 'SNR', lane)):
+            lst = self.store.values((device.id, 'SNR', lane, key))
             try:
                 self.logger.info(
                     '{} {} Lane{}: {} ( Min:{} | Mean:{} | Max:{} )\n'.format(
@@ -698,8 +1345,8 @@ class LHC:
     def display_ttl(self):
         # Output the TTL data to the screen
         try:
-            for key in self.data[self.reset_side]['TTL'].keys():
-                lst = self.data[self.reset_side]['TTL'][key]
+            for key in self.store.keys((self.reset_side, 'TTL')):
+                lst = self.store.values((self.reset_side, 'TTL', key))
                 self.logger.info(
                     '{} {}: {} ( Min:{} | Mean:{} | Max:{} )'.format(
                         self.dut.id,
@@ -717,29 +1364,29 @@ class LHC:
 
     def dropped_packet_check(self, previously_dropped):
         self.logger.info('Checking for dropped packets...')
-        if self.dut.codename == 'Linkville':
-            time.sleep(200)
-        time.sleep(10)
-        self.link_partner.tx_rx_control('STOP')
-        time.sleep(10)
-        self.dut.tx_rx_control('STOP')
-        time.sleep(10)
+        self.stop_traffic(drain=True)
 
         rx_packets, _ = self.dut.get_qr_counter()
         tx_packets, _ = self.link_partner.get_qt_counter()
 
-        dropped_packets = tx_packets - rx_packets
+        return self.dropped_packets(tx_packets - rx_packets, previously_dropped)
+
+    def dropped_packets(self, dropped_packets, previously_dropped):
+        """Logs the packets dropped at the end of the BER test.
+
+        Args:
+            dropped_packets (int): Packets sent by the link partner and not received
+                by the DUT.
+            previously_dropped (int): The dropped packets counted before.
 
+        Returns:
+            tuple: The dropped packets counted so far and the change.
+        """
         if dropped_packets > 0 and dropped_packets != previously_dropped:
             self.logger.info(
                 '{} packets were dropped!'.format(dropped_packets)
             )
-            
             self.logger.info('Ending the BER test!')
-            '''self.logger.info('Continuing the BER test!')
-
-            self.dut.tx_rx_control('START')
-            self.link_partner.tx_rx_control('START')'''
         else:
             dropped_packets = 0
             self.logger.info('No dropped packets detected!')
@@ -768,7 +1415,41 @@ class LHC:
             itr (int): The current LHC iteration.
         """
         self.display_iteration(itr)
-        self.store_data(self.get_date_and_time(itr), self.data, ('ITERATION',))
+        self.store.iteration = itr
+        self.store_data(self.get_date_and_time(itr), ('ITERATION',))
+
+    def prefetch_lane_status(self, dev, lane):
+        """Collects the RX/TX/LANE status of a lane in one pipelined burst.
+
+        The commands issued by the status methods of the collection plan are recorded
+        once per device and lane. Each iteration they are sent back-to-back on one
+        connection, right before the status of the lane is stored, and the responses
+        are served to run_rx_get_status, run_tx_get_status and run_lane_get_status.
+
+        Args:
+            dev (obj): A device to run the commands on.
+            lane (int): The lane to get the status of.
+
+        Returns:
+            list: The prefetched commands, to pass to the drop_prefetched() of the port.
+        """
+        commands = self.lane_status_commands.get((dev.id, lane))
+        if commands is None:
+            with dev.port.record_commands() as commands:
+                for method in self.plans[dev.id].status_queries:
+                    try:
+                        getattr(dev, method)(lane)
+                    except (ValueError, KeyError, IndexError, TypeError) as err:
+                        # Parsing the empty responses of the recording may fail, the
+                        # commands sent after that are then not prefetched
+                        self.logger.debug(
+                            'Recording the commands of %s(%s) stopped: %r', method, lane, err
+                        )
+            self.lane_status_commands[(dev.id, lane)] = commands
+
+        if commands:
+            dev.port.prefetch(commands)
+        return commands
 
     def run_lane_get_status(self, dev, lane):
         """Gets the lane status info from the provided device, stores the data and displays it.
@@ -776,47 +1457,29 @@ class LHC:
         Args:
             dev (obj): A device to run the command on.
             lane (int): The lane to get the lane info from.
-
-        Raises:
-            AttributeError: The provided device is missing the required method.
         """
-        try:
-            self.store_data(dev.ethspy_lane_get_status(lane), self.data, (dev.id, 'LANE'))
-        except AttributeError:
-            pass
+        self.store_data(dev.ethspy_lane_get_status(lane), (dev.id, 'LANE'))
 
     def run_link_get_status(self, dev):
         """Gets the link status from the provided device and stores the data.
 
         Args:
             dev (obj): A device to run the command on.
-
-        Raises:
-            AttributeError: The provided device is missing the required method.
         """
-        try:
-            self.store_data(dev.ethspy_link_get_status(), self.data, (dev.id, 'LINK'))
-        except AttributeError:
-            pass
+        self.store_data(dev.ethspy_link_get_status(), (dev.id, 'LINK'))
 
     def run_rx_get_ehm(self, dev, lane):
         """Gets the EHM info from the provided device, stores the data and displays it.
 
-        TODO: This should only run on Snowridge devices. Snowridge should be refactored to include
-          a rx_get_snr method.
+        Only devices with a per lane EHM (Snowridge, Granite Rapids-D) have it in their
+        collection plan.
 
         Args:
             dev (obj): A device to run the command on.
             lane (int): The lane to get the EHM info from.
-
-        Raises:
-            AttributeError: The provided device is missing the required method.
         """
-        try:
-            self.store_data(dev.ethspy_rx_get_ehm(lane), self.data, (dev.id, 'LANE', lane))
-            self.display_ehm(dev, lane)
-        except AttributeError:
-            pass
+        self.store_data(dev.ethspy_rx_get_ehm(lane), (dev.id, 'LANE', lane))
+        self.defer(self.display_ehm, dev, lane)
 
     def run_rx_get_status(self, dev, lane):
         """Gets the Rx status info from the provided device, stores the data and displays it.
@@ -824,14 +1487,8 @@ class LHC:
         Args:
             dev (obj): A device to run the command on.
             lane (int): The lane to get the Rx info from.
-
-        Raises:
-            AttributeError: The provided device is missing the required method.
         """
-        try:
-            self.store_data(dev.ethspy_rx_get_status(lane), self.data, (dev.id, 'RX', lane))
-        except AttributeError:
-            pass
+        self.store_data(dev.ethspy_rx_get_status(lane), (dev.id, 'RX', lane))
 
     def run_snr(self, dev, lane, itr):
         """Gets the SNR information from the provided device, stores the data and displays it.
@@ -841,7 +1498,7 @@ class LHC:
             lane (int): The lane to get the SNR info from.
             itr (int): The current LHC iteration.
         """
-        self.store_data(self.snr(dev, lane, itr), self.data, (dev.id, 'SNR', lane))
+        self.store_data(self.snr(dev, lane, itr), (dev.id, 'SNR', lane))
         #self.display_snr(dev, lane)
 
     def run_training_coeff_log(self, dev, lane, itr):
@@ -851,18 +1508,11 @@ class LHC:
             dev (obj): A device to run the command on.
             lane (int): The lane to get the logs on.
             itr (int): The current LHC iteration.
-
-        Raises:
-            AttributeError: The provided device is missing the required method.
         """
-        try:
-            self.store_data(
-                self.training_coeff_log(dev.ethspy_rx_get_training_coeff_logs(lane), itr, dev.id),
-                self.data,
-                (dev.id, 'TRAINING_LOGS')
-            )
-        except AttributeError:
-            pass
+        self.store_data(
+            self.training_coeff_log(dev, lane, itr, dev.id),
+            (dev.id, 'TRAINING_LOGS')
+        )
 
     def run_ttl(self):
         """Runs the TTL command and stores the data.
@@ -871,10 +1521,10 @@ class LHC:
             AttributeError: The provided device is missing the required method.
         """
         try:
-            self.store_data(self.ttl(self.retry_ttl), self.data, (self.reset_side, 'TTL'))
+            self.store_data(self.ttl(self.retry_ttl), (self.reset_side, 'TTL'))
             self.display_ttl()
-            self.logger.info('Waiting {} seconds for the link to settle...'.format(self.ttl_delay))
-            time.sleep(self.ttl_delay)
+            self.logger.info('Waiting up to {} seconds for the link to settle...'.format(self.ttl_delay))
+            self.wait_state(*self.link_up_wait(self.ttl_delay))
         except AttributeError:
             pass
 
@@ -884,14 +1534,8 @@ class LHC:
         Args:
             dev (obj): A device to run the command on.
             lane (int): The lane to get the Tx info from.
-
-        Raises:
-            AttributeError: The provided device is missing the required method.
         """
-        try:
-            self.store_data(dev.ethspy_tx_get_status(lane), self.data, (dev.id, 'TX', lane))
-        except AttributeError:
-            pass
+        self.store_data(dev.ethspy_tx_get_status(lane), (dev.id, 'TX', lane))
 
     def run_vbcm(self, device, iteration):
         # Get the calibration data
@@ -923,46 +1567,22 @@ class LHC:
         with open(cal_file, 'w') as cal_file_handle:
             cal_file_handle.write('{}'.format(cal_data))
 
-        # Get the VBCM data
-        csv_output = device.ethspy_rx_get_vbcm()
-
-        # Need to create a temp file to store the data so we can process it
-        temp_file = os.path.join(self.output_dir, 'temp.csv')
-        with open(temp_file, 'w') as temp_fh:
-            temp_fh.write('{}'.format(csv_output))
-
-        # Now we strip out the inconsitent \r\n
-        with open(os.path.join(self.output_dir, 'temp.csv'), 'r') as file_handle:
-            cln_out = [cln_out for cln_out in file_handle.readlines() if cln_out.strip()]
-            cln_out = [x.rstrip() for x in cln_out]
-
-        # Create the final, clean, output file, in the location
-        # expected by the EXE (c:/kerem_vbcm/vbcm.csv)
+        # Get the VBCM data. It goes straight into the final output file, in the
+        # location expected by the EXE (c:/kerem_vbcm/vbcm.csv), without the
+        # inconsistent \r\n and blank lines. The raw data is also stored into a
+        # different file since the above file gets overwritten each time.
         exe_file = os.path.join('c:', '/', 'kerem_vbcm', 'vbcm.csv')
-
-        with open(exe_file, 'w') as final_file:
-            for line in cln_out:
-                final_file.write('{}\n'.format(line))
-
-        time.sleep(2)
-
-        # Store the data from the vbcm output into a different file
-        # since the above file gets overwritten each time
         vbcm_file_name = os.path.join(
             self.output_dir,
             'vbcm_raw_data',
             'raw_{}_vbcm_data_iteration_{}.csv'.format(device.id, iteration)
         )
 
-        if not os.path.exists(os.path.dirname(vbcm_file_name)):
-            try:
-                os.makedirs(os.path.dirname(vbcm_file_name))
-            except OSError:  # Guard against race condition
-                print('Error creating directory! Ending script!')
-                raise ethspylib.EthSpyError('Error creating directory! Ending script!')
+        with open(exe_file, 'w') as final_file, LineFilter(final_file) as clean_file, \
+                CaptureFile(vbcm_file_name) as raw_file:
+            device.ethspy_rx_get_vbcm(outputs=[clean_file, raw_file])
 
-        with open(vbcm_file_name, 'w') as file_handle:
-            file_handle.write('{}'.format(csv_output))
+        ethspylib.clock.sleep(2)
 
         # Run the VBCM post-processor
         self.logger.info('Running the VBCM post-processor...')
@@ -1001,12 +1621,6 @@ class LHC:
             print('Warning: Problem copying VBCM PNG file.')
 
         # Delete temporary files
-        try:
-            os.remove(temp_file)
-        except OSError:
-            self.logger.info('Warning: Could not delete {}.'.format(temp_file))
-            print('Warning: Could not delete {}.'.format(temp_file))
-
         try:
             os.remove(exe_file)
         except OSError:
@@ -1075,8 +1689,18 @@ class LHC:
         with open(cal_archive, 'w') as archive_file:
             archive_file.write('{}'.format(cal_data))
 
-        # Get the VBCM data
-        csv_output = device.ethspy_rx_get_vbcm()
+        # Get the VBCM data into a temp file to process it (it will be deleted
+        # at the end of the method) and into a different file that stores it,
+        # since the temp file gets overwritten each time. The files are only
+        # created once the data arrives.
+        vbcm_file = os.path.join(
+            self.output_dir,
+            'vbcm_raw_data',
+            'raw_{}_vbcm_data_iteration_{}.csv'.format(device.id, iteration)
+        )
+        with CaptureFile(os.path.join(data_folder, 'vbcm.csv')) as temp_file, \
+                CaptureFile(vbcm_file) as raw_file:
+            csv_output = device.ethspy_rx_get_vbcm(outputs=[temp_file, raw_file])
 
         if csv_output is None:
             return {
@@ -1087,33 +1711,7 @@ class LHC:
                 'isResultValid': 'Error'
             }
 
-        # Create a temp file to store the data so we can
-        # process it (it will be deleted at the end of the method)
-        vbcm_file = os.path.join(data_folder, 'vbcm.csv')
-        with open(vbcm_file, 'w') as vbcm_fh:
-            vbcm_fh.write('{}'.format(csv_output))
-
-        time.sleep(2)
-
-        # Store the data from the vbcm output into a different
-        # file since the above file gets overwritten each time
-        vbcm_file = os.path.join(
-            self.output_dir,
-            'vbcm_raw_data',
-            'raw_{}_vbcm_data_iteration_{}.csv'.format(device.id, iteration)
-        )
-
-        if not os.path.exists(os.path.dirname(vbcm_file)):
-            try:
-                os.makedirs(os.path.dirname(vbcm_file))
-            except OSError:  # Guard against race condition
-                print('Error creating directory! Ending script!')
-                raise ethspylib.EthSpyError(
-                    'Error creating directory! Ending script!'
-                )
-
-        with open(vbcm_file, 'w') as file_handle:
-            file_handle.write('{}'.format(csv_output))
+        ethspylib.clock.sleep(2)
 
         self.logger.info('Running the VBCM pyc post-processor...')
         args = [
@@ -1220,7 +1818,8 @@ class LHC:
     def snr(self, device, lane, iteration):
         if device.snr_control == 'Enable':
             if device.codename in ['Lewisberg', 'Denverton'] and self.winpy:
-                snr = self.run_vbcm_pyc(device, iteration)
+                with self.vbcm_lock:
+                    snr = self.run_vbcm_pyc(device, iteration)
             else:
                 snr = device.ethspy_rx_get_snr(5, lane=lane)
         else:
@@ -1231,170 +1830,233 @@ class LHC:
     def static_device_info(self, device):
         # Store the output of the ETHSPY SUMMARY GET-STATUS command
         self.store_static_data(
-            device.ethspy_summary_get_status(), self.data, (device.id, 'INFO')
+            device.ethspy_summary_get_status(), (device.id, 'INFO')
         )
         self.store_static_data(
-            device.version(), self.data, (device.id, 'INFO')
+            device.version(), (device.id, 'INFO')
         )
         self.store_static_data(
-            {'NAME': device.name}, self.data, (device.id, 'INFO')
+            {'NAME': device.name}, (device.id, 'INFO')
         )
         self.store_static_data(
-            {'CODENAME': device.codename}, self.data, (device.id, 'INFO')
+            {'CODENAME': device.codename}, (device.id, 'INFO')
         )
 
         # Store the output of the HOSTINFO command
         #if self.collect_hostinfo == 'Enable':
         #    self.store_static_data(
-        #        device.hostinfo(), self.data, (device.id, 'HOSTINFO')
+        #        device.hostinfo(), (device.id, 'HOSTINFO')
         #    )
 
-    def statistics(self, dictionary, trail=()):
+    def statistics(self, dictionary=None, trail=()):
+        """Computes the statistics of every list and stores them under RESULTS.
 
-        # create a static list of the current dict keys
-        # iterating directly over dict.keys() is bad bc
-        # we are adding keys and the keys method returns
-        # an iterator that will freak out if it gets bigger
-        # during execution
-        key_list = [i for i in dictionary.keys()]
+        TTL results also get the P50, P95 and P99 percentiles.
 
-        for key in key_list:
-            if isinstance(dictionary[key], dict):
-                self.statistics(dictionary[key], trail=trail + (key,))
-            elif isinstance(dictionary[key], list):
-                data = self.compute_statistics(dictionary[key])
+        Args:
+            dictionary (dict): The data to compute statistics on, the measurement
+                store if None.
+            trail (tuple): Keys leading to dictionary.
+
+        Returns:
+            dict: The data including the RESULTS.
+        """
+        if dictionary is None:
+            for path, data in summarize_store(self.store, self.ttl_percentiles):
+                self.store_static_data(data, path)
+
+            return self.data
+
+        for key, value in dictionary.items():
+            if isinstance(value, dict):
+                self.statistics(value, trail=trail + (key,))
+            elif isinstance(value, list):
+                percentiles = self.ttl_percentiles if 'TTL' in trail else ()
+                data = self.compute_statistics(value, percentiles)
                 crumbs = ('RESULTS',) + trail + (key,)
-                self.store_static_data(data, self.data, crumbs)
+                self.store_static_data(data, crumbs)
 
-        return dictionary
+        return self.data
 
-        # temp_data = copy.copy(dictionary)
-        # for key in dictionary.keys():
-        #     if isinstance(dictionary[key], dict):
-        #         dictionary[key] = self.statistics(dictionary[key], trail=trail + (key,))
-        #     elif isinstance(dictionary[key], list):
-        #         data = self.compute_statistics(dictionary[key])
-        #         crumbs = ('RESULTS',) + trail + (key,)
-        #         temp_data[key] = self.store_static_data(data, temp_data, crumbs)
+    def update_live_statistics(self):
+        """Feeds the samples of the last iteration to the running statistics.
 
+        The TTL and SNR columns also get the histograms of ttl_post_processor and
+        snr_post_processor the first time they show up.
+        """
+        self.live.update()
+
+        for path, _ in self.store.columns():
+            if path in self.live.histograms or len(path) < 3:
+                continue
+
+            if path[1] == 'TTL' and path[2] in self.TTL_KEYS:
+                if self.ttl_timing is None:
+                    self.ttl_timing = self.ttl_criteria()[0]
+                timing = self.ttl_timing
+                histogram = Histogram(len(timing), lambda item: self.ttl_bucket(item, timing))
+            elif path[1] == 'SNR' and len(path) == 4:
+                device = self.dut if path[0] == 'DUT' else self.link_partner
+                distribution = self.SNR_DISTRIBUTION.get(device.codename)
+                if distribution is None:
+                    continue
+                histogram = Histogram(3, lambda result: self.snr_bucket(result, distribution))
+            else:
+                continue
 
-        # self.data = copy.copy(temp_data)
-        # import pprint
-        # pp = pprint.PrettyPrinter(indent=4)
-        # print('temp_data = ')
-        # pp.pprint(temp_data)
-        # print('\n\n')
-        # print('self.data = ')
-        # print(self.data)
-        # print('\n\n')
+            self.live.add_histogram(path, histogram)
 
+    def live_statistics(self):
+        """Returns the statistics of the samples collected so far.
 
-        # return temp_data
+        Unlike statistics(), nothing is recomputed and nothing is stored, so this can
+        be called at any time during the run. Percentiles are not included.
 
-    def store_data(self, new_data, container, nest):
-        """Store data into the given structure at the location provided by nest.
+        Returns:
+            dict: 'RESULTS' nested like the RESULTS of statistics() and 'HISTOGRAMS'
+                with the bucket percentages of the TTL and SNR columns.
+        """
+        histograms = {}
+        for path, histogram in self.live.histograms.items():
+            node = histograms
+            for key in path[:-1]:
+                node = node.setdefault(key, {})
+            node[path[-1]] = histogram.percentages()
 
-        This method searches container for the first item in nest.
+        return {'RESULTS': self.live.results(), 'HISTOGRAMS': histograms}
 
-        If it is found, store_data is recursively called passing the
-        sub-dictionary from container and trimming the first item from nest.
+    def command_timing(self):
+        """Returns the EthAgent command metrics of the DUT and LP collected so far.
 
-        If the first item in nest is not found in container, it is added and
-        store_data is called recursively as above.
+        Returns:
+            dict: 'BUCKETS(ms)' with the upper bounds of the latency histograms and per
+                side the device codename, host, slot and the ethspylib.metrics summary
+                of every command type, the slowest in total first.
+        """
+        output = {'BUCKETS(ms)': list(ethspylib.LATENCY_BUCKETS_MS)}
+        for dev in (self.dut, self.link_partner):
+            output[dev.id] = {
+                'DEVICE': dev.codename,
+                'HOST': dev.port.host_name,
+                'SLOT': dev.port.slot_number,
+                'COMMANDS': ethspylib.metrics.summary(dev.port.host_name, dev.port.slot_number)
+            }
+
+        return output
+
+    def store_command_timing(self):
+        """Stores the command_timing() under COMMAND-TIMING."""
+        self.store_static_data({'COMMAND-TIMING': self.command_timing()}, ())
 
-        If nest is empty, new_data is
+    @property
+    def data(self):
+        """dict: The measurements as the nested dictionary written to the JSON file."""
+        return self.store.view()
+
+    def store_data(self, new_data, nest):
+        """Appends the values in new_data to the columns at the location provided by nest.
+
+        Nested dictionaries in new_data add further keys below the location, lists
+        are appended value by value.
 
         Args:
             new_data (dict): The data to be stored
-            container (dict): The data structure that new_data is stored in
             nest (tuple): Keys to the location where new_data is stored
+        """
+        self.defer(self.append_sample, new_data, nest)
 
-        Returns:
+    def append_sample(self, new_data, nest):
+        self.store.append(new_data, nest)
+        if self.journal is not None:
+            self.journal.record(new_data, nest, self.store.iteration)
 
-        """
-        try:
-            container = self.store_data(new_data, container[nest[0]], nest[1:])
-        except KeyError:
-            container[nest[0]] = {}
-            container = self.store_data(new_data, container[nest[0]], nest[1:])
-        except IndexError:
-            container = self.append_data(new_data, container)
+    def store_static_data(self, new_data, nest):
+        """Stores static data (device info, results) at the location provided by nest.
 
-        return container
+        Static data replaces whatever was stored at the same keys before.
 
-    def store_static_data(self, new_data, container, nest):
-        try:
-            container = self.store_static_data(
-                new_data, container[nest[0]], nest[1:]
-            )
-        except KeyError:
-            container[nest[0]] = {}
-            container[nest[0]] = self.store_static_data(
-                new_data, container[nest[0]], nest[1:]
-            )
-        except IndexError:
-            container = self.add_static_data(new_data, container)
+        Args:
+            new_data (dict): The data to be stored
+            nest (tuple): Keys to the location where new_data is stored
+        """
+        self.store.update(new_data, nest)
+        if self.journal is not None:
+            self.journal.record_static(new_data, nest)
 
-        return container
+    def training_coeff_log(self, device, lane, iteration, dut_lp):
+        """Streams the training coeff logs of the lane of device into a file.
 
-    def training_coeff_log(self, log, iteration, dut_lp):
-        if log:
-            log_file = os.path.join(
-                self.output_dir,
-                'training_logs',
-                '{}_iteration_{}.json'.format(dut_lp, iteration)
-            )
+        The file is only created if there are logs to write.
+        """
+        log_file = os.path.join(
+            self.output_dir,
+            'training_logs',
+            '{}_iteration_{}.json'.format(dut_lp, iteration)
+        )
 
-            if not os.path.exists(os.path.dirname(log_file)):
-                try:
-                    os.makedirs(os.path.dirname(log_file))
-                except OSError as exc:  # Guard against race condition
-                    if exc.errno != errno.EEXIST:
-                        raise ethspylib.EthSpyError(
-                            'Error creating directory! Ending script!'
-                        )
+        with CaptureFile(log_file) as log_file_handle:
+            device.ethspy_rx_get_training_coeff_logs(lane, outputs=[log_file_handle])
 
-            with open(log_file, 'w') as log_file_handle:
-                log_file_handle.write(log)
-        else:
+        if not log_file_handle.written:
             log_file = 'N/A'
 
         return {'TRAINING_LOGS': log_file}
 
     def ttl(self, retry_ttl):
-        if retry_ttl:
-            if self.reset_side == 'DUT':
-                ttl_dict = self.dut.ethspy_link_get_ttl()
-            else:
-                ttl_dict = self.link_partner.ethspy_link_get_ttl()
+        side = self.dut if self.reset_side == 'DUT' else self.link_partner
 
-            ttl_dict['RETRY_ATTEMPTS'] = self.retry_ttl - retry_ttl
-            try:
-                if ttl_dict['ERROR'] != 'None':
-                    self.logger.info(
-                        ('Alert: LINK GET-TTL encountered an error: {}. '
-                         'Retrying up to {} more times.').format(
-                             ttl_dict['ERROR'], (retry_ttl - 1)
-                         )
-                    )
-                    self.logger.info(
-                        'Waiting {} seconds for the link to settle...'.format(
-                            self.ttl_delay
-                        )
-                    )
-                    time.sleep(self.ttl_delay)
-                    ttl_dict = self.ttl(retry_ttl=retry_ttl - 1)
-            except KeyError:
-                raise ethspylib.EthSpyError(
-                    'Could not find ERROR key in TTL output! '
-                    'Aborting current port!'
-                )
-        else:
+        while retry_ttl:
+            ttl_dict = self.ttl_result(side.ethspy_link_get_ttl(), retry_ttl)
+            if ttl_dict is not None:
+                return ttl_dict
+            self.wait_state(*self.link_up_wait(self.ttl_delay))
+            retry_ttl -= 1
+
+        raise self.ttl_retry_error()
+
+    def ttl_result(self, ttl_dict, retry_ttl):
+        """Checks a LINK GET-TTL response read by ttl() or ttl_async().
+
+        Args:
+            ttl_dict (dict): The parsed response.
+            retry_ttl (int): The reads left, this one included.
+
+        Returns:
+            dict: ttl_dict with its RETRY_ATTEMPTS, None if it reports an error and
+            the TTL is read again once the link settled.
+
+        Raises:
+            EthSpyError: The response has no ERROR key.
+        """
+        ttl_dict['RETRY_ATTEMPTS'] = self.retry_ttl - retry_ttl
+        try:
+            if ttl_dict['ERROR'] == 'None':
+                return ttl_dict
+        except KeyError:
             raise ethspylib.EthSpyError(
-                'LINK GET-TTL retry limit hit! Aborting current port!'
+                'Could not find ERROR key in TTL output! '
+                'Aborting current port!'
+            )
+
+        self.logger.info(
+            ('Alert: LINK GET-TTL encountered an error: {}. '
+             'Retrying up to {} more times.').format(
+                 ttl_dict['ERROR'], (retry_ttl - 1)
+             )
+        )
+        self.logger.info(
+            'Waiting up to {} seconds for the link to settle...'.format(
+                self.ttl_delay
             )
+        )
+        return None
 
-        return ttl_dict
+    @staticmethod
+    def ttl_retry_error():
+        """The error of ttl() and ttl_async() when every read reported an error."""
+        return ethspylib.EthSpyError(
+            'LINK GET-TTL retry limit hit! Aborting current port!'
+        )
 
     def write_comments_file(self, data):
         """Creates a comments file.
@@ -1443,12 +2105,58 @@ class LHC:
                     pass
             wtr.writerows(zip(*data_list))
 
+    def write_command_timing_file(self):
+        """Writes the EthAgent command metrics, one row per side and command type."""
+        timing = self.command_timing()
+        phases = ethspylib.COMMAND_PHASES
+        stats = ('COUNT', 'MEAN(ms)', 'P50(ms)', 'P95(ms)', 'P99(ms)', 'MAX(ms)')
+        totals = ('COUNT', 'RETRIES', 'FAILURES', 'BYTES-SENT', 'BYTES-RECEIVED', 'TIME(s)')
+        buckets = ['<={}ms'.format(bound) for bound in timing['BUCKETS(ms)']]
+        buckets.append('>{}ms'.format(timing['BUCKETS(ms)'][-1]))
+
+        with open(self.create_filename_check_path('command_timing.csv'), 'w', newline='') as file_handle:
+            wtr = csv.writer(file_handle)
+            wtr.writerow(
+                ['SIDE', 'DEVICE', 'HOST', 'SLOT', 'COMMAND'] + list(totals) +
+                ['{} {}'.format(phase, stat) for phase in phases for stat in stats] +
+                ['COMPLETE {}'.format(bucket) for bucket in buckets]
+            )
+            for side in (self.dut.id, self.link_partner.id):
+                info = timing[side]
+                for kind, entry in info['COMMANDS'].items():
+                    wtr.writerow(
+                        [side, info['DEVICE'], info['HOST'], info['SLOT'], kind] +
+                        [entry[key] for key in totals] +
+                        [entry[phase].get(stat, '') for phase in phases for stat in stats] +
+                        entry['COMPLETE'].get('HISTOGRAM', [0] * len(buckets))
+                    )
+
     def write_json_file(self, data):
         with open(self.create_filename_check_path('json'), 'w') as file_handle:
             json.dump(
                 data, file_handle, sort_keys=False, indent=4, separators=(',', ': ')
             )
 
+    def write_columnar_file(self):
+        """Writes the measured columns with the device INFO and MODULE-INFO to an .npz
+        file, see common.columnar."""
+        if es_vars.get('COLUMNAR_EXPORT', 'Enable') != 'Enable':
+            return
+
+        static = {}
+        for nest in [('TestName',), ('MODULE-INFO',), (self.dut.id, 'INFO'),
+                     (self.link_partner.id, 'INFO')]:
+            try:
+                value = self.store.values(nest)
+            except KeyError:
+                continue
+            node = static
+            for key in nest[:-1]:
+                node = node.setdefault(key, {})
+            node[nest[-1]] = value
+
+        columnar.write(self.create_filename_check_path('npz'), self.store, static)
+
     def write_plain_text_file(self, data):
         with open(self.create_filename_check_path('txt'), 'w') as ptf:
             ptf.write('----------------------------\n')
@@ -1576,34 +2284,7 @@ class LHC:
                 self.logger.info('Warning: Could not retrieve TTL data.')
                 print('Warning: Could not retrieve TTL data.')
 
-            # Timing for last bucket is irrelevant because it gets all items not in other buckets
-            # BASE-T uses pass/fail buckets with no distribution
-            if self.dut.interface == 'base_t':
-                limits = [100, 0]
-                speed = self.dut.get_speed()
-                if speed == '10G':
-                    timing = [30, 50]
-                elif speed == '5G':
-                    timing = [30, 50]
-                elif speed == '2.5G':
-                    timing = [30, 50]
-                elif speed == '1G':
-                    timing = [12, 50]
-                elif speed == '100M':
-                    timing = [10, 50]
-                else:
-                    self.logger.info('Warning: Could not process BASE-T Speed for TTL: ' + speed)
-                    print('Warning: Could not process BASE-T Speed: ' + speed)
-                    timing = [30, 50]
-            elif self.dut.interface == 'hss':
-                limits = [80, 10, 10, 0]
-                timing = [1, 2, 3, 4]
-            else:
-                self.logger.info('Warning: Could not process interface under test for TTL.')
-                print('Warning: Could not process interface under test for TTL.')
-                limits = [80, 10, 10, 0]
-                timing = [1, 2, 3, 4]
-
+            timing, limits = self.ttl_criteria()
             ttl_percentages, ttl_statuses = self.ttl_post_processor(data, timing, limits)
             last_num = len(timing) - 1
             ptf.write(
@@ -1630,26 +2311,11 @@ class LHC:
                     ptf.write(self.snr_post_processor(device, data))
 
     def ber_compute_confidence_level(self, errors, bits):
-        step1 = 0
-        for k in range(0, errors + 1):
-            try:
-                step1 += (
-                    pow((bits * float(self.ber_target)), k) / math.factorial(k)
-                )
-            except OverflowError:
-                self.logger.info(
-                    'Warning: OverflowError detected during '
-                    'BER confidence level calculation.'
-                )
-                print(
-                    'Warning: OverflowError detected during '
-                    'BER confidence level calculation.'
-                )
-                break
+        return float('{0:.1f}'.format(self.ber_confidence(errors, bits)))
 
-        step2 = (1 - (step1 * math.exp(-bits * float(self.ber_target)))) * 100
-
-        return float('{0:.1f}'.format(step2))
+    def ber_confidence(self, errors, bits):
+        """Returns the unrounded BER confidence level in percent."""
+        return ber_stats.confidence_level(errors, bits, self.ber_target)
 
     @staticmethod
     def ber_pass_fail(measurement):
@@ -1732,6 +2398,151 @@ class LHC:
             self.logger.info('Changing BER confidence level to 99.')
             es_vars['BER_CONFIDENCE'] = 99
 
+    def wait_state(self, what, limit, reads, state, window=None):
+        """Waits until the devices reach a state, for up to limit seconds.
+
+        The wait specs come from link_up_wait(), counters_cleared_wait(),
+        tx_started_wait(), tx_stopped_wait() and rx_drained_wait(). The device
+        methods in reads are polled with backoff (see ethspylib.wait_until()) and
+        state() is given their results. Without window the state is reached when
+        state() returns a true value, with window when its value did not change
+        for window seconds (a False value never counts). A read whose response can
+        not be parsed (ValueError) is logged and counts as not reached yet, see
+        polled_state(). The time waited is logged.
+
+        Args:
+            what (str): The awaited state for the log, e.g. 'LP TX stopped'.
+            limit (float): Seconds to wait at most, the whole limit without reads.
+            reads (list): (device, method) pairs to poll.
+            state (callable): Makes the watched value from the list of results.
+            window (float): Seconds the value must not change.
+
+        Returns:
+            bool: True if the state was reached before the limit.
+        """
+        settled = ethspylib.Settled(window=window)
+
+        def condition():
+            return self.polled_state(what, [self.poll(method) for _, method in reads], state, settled)
+
+        reached, waited = ethspylib.wait_until(condition if reads else None, limit)
+        return self.log_wait(what, reads, reached, waited, limit)
+
+    async def wait_state_async(self, what, limit, reads, state, window=None):
+        """asyncio variant of wait_state."""
+        settled = ethspylib.Settled(window=window)
+
+        async def condition():
+            results = await asyncio.gather(
+                *(self.acall(dev, method) for dev, method in reads), return_exceptions=True
+            )
+            return self.polled_state(what, list(results), state, settled)
+
+        reached, waited = await ethspy_async.wait_until(condition if reads else None, limit)
+        return self.log_wait(what, reads, reached, waited, limit)
+
+    @staticmethod
+    def poll(method):
+        """Returns the result of a wait_state() read, or its ValueError."""
+        try:
+            return method()
+        except ValueError as err:
+            return err
+
+    def polled_state(self, what, results, state, settled):
+        """Returns if the results of the reads of a wait spec reach its state.
+
+        A read that failed to parse its response (a ValueError in results) does not
+        end the wait, the state is not reached yet and the devices are polled again.
+        Any other exception in results is raised.
+        """
+        for result in results:
+            if isinstance(result, ValueError):
+                self.logger.info('Alert: {}: {}. Polling again.'.format(what, result))
+                return False
+            if isinstance(result, BaseException):
+                raise result
+        return self.state_reached(state(results), settled)
+
+    @staticmethod
+    def state_reached(value, settled):
+        if settled.window is None:
+            return bool(value)
+        return settled.observe(value) and value is not False
+
+    def log_wait(self, what, reads, reached, waited, limit):
+        if not reads:
+            self.logger.info('{}: waited {:.1f} seconds'.format(what, waited))
+        elif reached:
+            self.logger.info('{} after {:.1f} seconds'.format(what, waited))
+        else:
+            self.logger.info('{}: not seen within {} seconds, continuing'.format(what, limit))
+
+        return bool(reached)
+
+    def wait_limit(self, key):
+        """Return the wait limit key of the slower of the DUT and LP (see
+        LegacyCommands.wait_limits)."""
+        return max(dev.wait_limits[key] for dev in (self.dut, self.link_partner))
+
+    def link_up_wait(self, limit):
+        """The link is up on both sides for their link_settle_time. Without link
+        status the whole limit is waited."""
+        sides = [
+            dev for dev in (self.dut, self.link_partner) if dev.supports('ethspy_link_get_status')
+        ]
+        return (
+            'Link up', limit,
+            [(dev, dev.ethspy_link_get_status) for dev in sides],
+            lambda statuses: all(self.link_up(status) for status in statuses),
+            max([dev.link_settle_time for dev in sides], default=None)
+        )
+
+    def counters_cleared_wait(self):
+        """The good packet counters of both sides read 0."""
+        return (
+            'Counters cleared', self.wait_limit('counters_cleared'),
+            [
+                (dev, read) for dev in (self.dut, self.link_partner)
+                for read in (dev.get_qr_counter, dev.get_qt_counter)
+            ],
+            lambda counters: all(good == 0 for good, _ in counters)
+        )
+
+    def tx_started_wait(self, dev):
+        """dev has transmitted packets."""
+        return (
+            '{} TX started'.format(dev.id), dev.wait_limits['tx_started'],
+            [(dev, dev.get_qt_counter)],
+            lambda counters: counters[0][0] > 0
+        )
+
+    def tx_stopped_wait(self, dev):
+        """The QT counter of dev is settled."""
+        return (
+            '{} TX stopped'.format(dev.id), dev.wait_limits['tx_stopped'],
+            [(dev, dev.get_qt_counter)],
+            lambda counters: counters[0][0],
+            dev.settle_time
+        )
+
+    def rx_drained_wait(self):
+        """The QT counter of the LP and the QR counter of the DUT are settled, so
+        every packet sent by the LP was received or lost."""
+        return (
+            'DUT RX drained', self.wait_limit('rx_drained'),
+            [(self.dut, self.dut.get_qr_counter),
+             (self.link_partner, self.link_partner.get_qt_counter)],
+            lambda counters: tuple(good for good, _ in counters),
+            max(self.dut.settle_time, self.link_partner.settle_time)
+        )
+
+    @staticmethod
+    def link_up(status):
+        """Return True if the LINK-UP value of a link status means the link is up."""
+        link = status.get('LINK-UP')
+        return link is True or str(link).upper() in ('UP', 'TRUE')
+
     def check_link(self, link_status):
         """Checks if the link is down.
 
@@ -1923,82 +2734,8 @@ class LHC:
 
         return error_sum, sym_err
 
-    def stats_max(self, lst):
-        return {'MAX': self.maximum(lst)}
-
-    @staticmethod
-    def stats_mean(lst):
-        """Mean of the resulting list.
-
-        Args:
-            lst (list): The list to compute the mean of.
-
-        Returns:
-            dict: Mapping the key MEAN to the mean value of the list.
-        """
-        return {'MEAN': float(sum(lst)) / max(len(lst), 1)}
-
-    def stats_min(self, lst):
-        """Gets the minimum value in the list.
-        """
-        return {'MIN': self.minimum(lst)}
-
-    @staticmethod
-    def stats_mode(lst):
-        try:
-            data = Counter(lst)
-            results = data.most_common()
-
-            try:
-                if results[0][1] == results[1][1]:
-                    r_val = {'MODE': 'None', 'MODE_OCCURRENCES': 'None'}
-                else:
-                    r_val = {
-                        'MODE': results[0][0],
-                        'MODE_OCCURRENCES': results[0][1]
-                    }
-            except IndexError:
-                try:
-                    r_val = {
-                        'MODE': results[0][0],
-                        'MODE_OCCURRENCES': results[0][1]
-                    }
-                except IndexError:
-                    r_val = {
-                        'MODE': 'Could not calculate',
-                        'MODE_OCCURENCES': 'Could not calculate'
-                    }
-        except TypeError:
-            r_val = {'MODE': 'None', 'MODE_OCCURRENCES': 'None'}
-
-        return r_val
-
-    @staticmethod
-    def stats_stddev(lst):
-        mean = float(sum(lst)) / len(lst)
-        variance = sum([(x - mean)**2 for x in lst]) / float(len(lst))
-        output = {'STDDEV': math.sqrt(variance)}
-
-        return output
-
     def snr_post_processor(self, device, data):
-        distribution = {
-            'Broadwell': [27, 16],
-            'Carlsville': [0, 0],
-            'Columbiaville': [40, 20],
-            'Coppervale': [4, 2],
-            'Denverton': [36, 25],
-            'Fortville': [40, 20],
-            'Fortville25': [40, 20],
-            'Foxville': [4, 2],
-            'Lewisberg': [36, 25],
-            'Niantic': [17, 16],
-            'Parkvale': [40, 20],
-            'Powerville': [0, 0],
-            'RedRockCanyon': [40, 20],
-            'Sageville': [4, 2],
-            'Twinville': [0, 0]
-        }
+        distribution = self.SNR_DISTRIBUTION
         testids = [
             'results over {}'.format(distribution[device.codename][0]),
             'results between {} and {}'.format(
@@ -2061,13 +2798,9 @@ class LHC:
                 else:
                     for result in data[device.id]['SNR'][lane][snr_type]:
                         # These are being pulled from the raw data, not the RESULTS
-                        if result not in ('DISABLED', 'ERROR', 'NA', 'N/A'):
-                            if result >= distribution[device.codename][0]:
-                                buckets[0].append(result)
-                            elif result <= distribution[device.codename][1]:
-                                buckets[1].append(result)
-                            else:
-                                buckets[2].append(result)
+                        bucket = self.snr_bucket(result, distribution[device.codename])
+                        if bucket is not None:
+                            buckets[bucket].append(result)
 
                     if device.snr_control == 'Enable':
                         for val in range(0, 3):
@@ -2084,6 +2817,38 @@ class LHC:
 
         return output_string
 
+    def ttl_criteria(self):
+        """Returns the TTL bucket timing (s) and the pass limits (%) of the DUT interface."""
+        # Timing for last bucket is irrelevant because it gets all items not in other buckets
+        # BASE-T uses pass/fail buckets with no distribution
+        if self.dut.interface == 'base_t':
+            limits = [100, 0]
+            speed = self.dut.get_speed()
+            if speed == '10G':
+                timing = [30, 50]
+            elif speed == '5G':
+                timing = [30, 50]
+            elif speed == '2.5G':
+                timing = [30, 50]
+            elif speed == '1G':
+                timing = [12, 50]
+            elif speed == '100M':
+                timing = [10, 50]
+            else:
+                self.logger.info('Warning: Could not process BASE-T Speed for TTL: ' + speed)
+                print('Warning: Could not process BASE-T Speed: ' + speed)
+                timing = [30, 50]
+        elif self.dut.interface == 'hss':
+            limits = [80, 10, 10, 0]
+            timing = [1, 2, 3, 4]
+        else:
+            self.logger.info('Warning: Could not process interface under test for TTL.')
+            print('Warning: Could not process interface under test for TTL.')
+            limits = [80, 10, 10, 0]
+            timing = [1, 2, 3, 4]
+
+        return timing, limits
+
     def ttl_post_processor(self, dict_data, timing, limits):
         # TTL PASS/FAIL Criteria:
         # 80% <= 1s
@@ -2115,16 +2880,7 @@ class LHC:
             ttl_data = dict_data[side]['TTL']['LINK TTL(MS)']
 
         for item in ttl_data:
-            flag = False
-            for i in range(len(timing)-1):
-                if item <= timing[i] * 1000:
-                    buckets[i].append(item)
-                    flag = True
-                    break
-
-            # Handle out of range case
-            if not flag:
-                buckets[len(timing)-1].append(item)
+            buckets[self.ttl_bucket(item, timing)].append(item)
 
         for val in range(0, len(timing)):
             percentages[val] = 100 * ((len(buckets[val]) * 1.0) / len(ttl_data))
@@ -2136,13 +2892,45 @@ class LHC:
 
         return percentages, statuses
 
+    @staticmethod
+    def ttl_bucket(item, timing):
+        """Returns the index of the TTL bucket of item (ms), None if it is not a number.
+
+        Args:
+            item: A measured TTL.
+            timing (list): The bucket timing in seconds, see ttl_criteria().
+        """
+        if type(item) not in (int, float):
+            return None
+
+        for i in range(len(timing) - 1):
+            if item <= timing[i] * 1000:
+                return i
+
+        # Handle out of range case
+        return len(timing) - 1
+
+    @staticmethod
+    def snr_bucket(result, distribution):
+        """Returns the index of the SNR bucket of result, None for 'N/A', 'ERROR', ...
+
+        The buckets are over, below and between the two SNR_DISTRIBUTION values.
+        """
+        if result in ('DISABLED', 'ERROR', 'NA', 'N/A'):
+            return None
+
+        if result >= distribution[0]:
+            return 0
+        if result <= distribution[1]:
+            return 1
+
+        return 2
+
     def save_eeprom(self, device):
         file_and_path = os.path.join(
             self.output_dir,
             '{}_EEPROM_CONTENTS_{}.txt'.format(device.name, time.strftime('%Y%m%d_%H%M%S'))
         )
-        with open(file_and_path, 'w') as file_handle:
-            data = device.reep().split('\n')
-            for line in data:
-                file_handle.write(line.strip())
-                file_handle.write('\n')
+        with open(file_and_path, 'w') as file_handle, \
+                LineFilter(file_handle, skip_blank=False, strip=str.strip) as eeprom_file:
+            device.reep(outputs=[eeprom_file])
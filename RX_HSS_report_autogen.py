@@ -49,6 +49,7 @@ from openpyxl.drawing.image import Image
 from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
 from tkinter import filedialog
 import ANIL_Robot_LHC_Auto_Config as test_cofig
+from common import journal
 test_speed_selection = test_cofig.speed[:-5]
 
 # Function
@@ -213,7 +214,8 @@ print("Finding the .json file...(3/6)\n=============================")
 count = 0
 for root, dirs, files in walk(raw_data_path):
     for f in files:
-        if f.endswith('.json'):
+        # A test that is still running only has its .ndjson journal yet
+        if f.endswith('.json') or (f.endswith('.ndjson') and f[:-7] + '.json' not in files):
             count+=1
             for i in len_cable:
                 if i in f:
@@ -231,6 +233,9 @@ files = os.listdir(copy_dir_path)
 all_data = []
 
 for file_num in range(0,len(files)):
+    if files[file_num].endswith('.ndjson'):
+        all_data.append(journal.load(copy_dir_path+"/"+files[file_num]))
+        continue
     with open(copy_dir_path+"/"+files[file_num]) as f:
         data1 = json.load(f)
         all_data.append(data1)
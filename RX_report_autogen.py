@@ -49,6 +49,7 @@ from openpyxl.drawing.image import Image
 from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
 from tkinter import filedialog
 import ANIL_Robot_LHC_Auto_Config as test_cofig
+from common import journal
 test_speed_selection = test_cofig.speed[:-5]
 
 # Function
@@ -215,7 +216,8 @@ print("Finding the .json file...(3/6)\n=============================")
 count = 0
 for root, dirs, files in walk(raw_data_path):
     for f in files:
-        if f.endswith('.json'):
+        # A test that is still running only has its .ndjson journal yet
+        if f.endswith('.json') or (f.endswith('.ndjson') and f[:-7] + '.json' not in files):
             count+=1
             for i in len_cable:
                 if i in f:
@@ -238,11 +240,14 @@ count = 0
 files = os.listdir(copy_dir_path)
 
 for i in files:
-    if i.endswith('.json'):
+    if i.endswith('.json') or i.endswith('.ndjson'):
         ttl_config.append(i.split("_SP")[0].replace(title + "_", ""))
         filename = copy_dir_path + "/" + i
-        with open(filename) as f:
-            data = json.load(f)
+        if i.endswith('.ndjson'):
+            data = journal.load(filename)
+        else:
+            with open(filename) as f:
+                data = json.load(f)
         count+=1
 
         # INFO data
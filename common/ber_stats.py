@@ -0,0 +1,148 @@
+"""This module provides the BER confidence level math.
+
+The confidence that the true BER is below the target, after receiving some bits
+with some errors, is one minus the Poisson CDF of the error count at the expected
+number of errors (bits * BER target). That equals the regularized lower incomplete
+gamma function P(errors + 1, bits * BER target), which is evaluated here in log
+space so it never overflows, whatever the error count.
+"""
+# Standard library imports
+import math
+from statistics import NormalDist
+
+EPSILON = 1e-15
+MAX_ITERATIONS = 100000
+
+
+def regularized_gamma_p(a, x):
+    """Regularized lower incomplete gamma function P(a, x).
+
+    Uses the power series below a + 1 and the continued fraction for Q(a, x) above.
+
+    Args:
+        a (float): Shape parameter, > 0.
+        x (float): Upper integration limit, >= 0.
+
+    Returns:
+        float: P(a, x) in [0, 1].
+    """
+    if x <= 0:
+        return 0.0
+    if a == 1:
+        # No errors, P(1, x) = 1 - exp(-x)
+        return -math.expm1(-x)
+
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+
+    if x < a + 1:
+        term = total = 1.0 / a
+        n = a
+        for _ in range(MAX_ITERATIONS):
+            n += 1
+            term *= x / n
+            total += term
+            if term < total * EPSILON:
+                break
+        return min(1.0, math.exp(log_prefix + math.log(total)))
+
+    # Modified Lentz's method for the continued fraction of Q(a, x)
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1.0 / tiny
+    d = 1.0 / b
+    h = d
+    for i in range(1, MAX_ITERATIONS):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        if abs(d) < tiny:
+            d = tiny
+        c = b + an / c
+        if abs(c) < tiny:
+            c = tiny
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < EPSILON:
+            break
+
+    return max(0.0, 1.0 - math.exp(log_prefix + math.log(h)))
+
+
+def confidence_level(errors, bits, ber_target):
+    """Return the confidence in percent that the BER is below ber_target.
+
+    Args:
+        errors (int): Number of bit errors counted.
+        bits (float): Number of bits received.
+        ber_target (float): The BER target, e.g. 1e-12.
+
+    Returns:
+        float: The unrounded confidence level in percent.
+    """
+    return regularized_gamma_p(int(errors) + 1, bits * float(ber_target)) * 100
+
+
+def confidence_levels(errors, bits, ber_target):
+    """Return the confidence levels of whole series of (errors, bits) samples.
+
+    Args:
+        errors (iterable): Error counts.
+        bits (iterable): Bit counts, same length as errors.
+        ber_target (float): The BER target, e.g. 1e-12.
+
+    Returns:
+        list: The unrounded confidence levels in percent.
+    """
+    ber_target = float(ber_target)
+
+    return [
+        regularized_gamma_p(int(n) + 1, b * ber_target) * 100
+        for n, b in zip(errors, bits)
+    ]
+
+
+def bits_for_confidence(errors, confidence, ber_target):
+    """Return how many bits must be received with errors errors to reach confidence.
+
+    Inverts confidence_level() with Newton's method, safeguarded by bisection.
+
+    Args:
+        errors (int): Number of bit errors.
+        confidence (float): Target confidence level in percent.
+        ber_target (float): The BER target, e.g. 1e-12.
+
+    Returns:
+        float: The number of bits, inf if confidence is 100% or more.
+    """
+    p = float(confidence) / 100
+    if p <= 0:
+        return 0.0
+    if p >= 1:
+        return math.inf
+
+    a = int(errors) + 1
+
+    # Wilson-Hilferty starting point
+    z = NormalDist().inv_cdf(p)
+    x = max(a * (1 - 1 / (9.0 * a) + z / (3 * math.sqrt(a))) ** 3, EPSILON)
+
+    low, high = 0.0, math.inf
+    for _ in range(200):
+        f = regularized_gamma_p(a, x) - p
+        if f < 0:
+            low = x
+        else:
+            high = x
+
+        slope = math.exp((a - 1) * math.log(x) - x - math.lgamma(a))
+        step = f / slope if slope > 0 else math.inf
+        new_x = x - step
+        if not low < new_x < high:
+            new_x = (low + high) / 2 if high < math.inf else x * 2
+        if abs(new_x - x) <= x * 1e-12:
+            x = new_x
+            break
+        x = new_x
+
+    return x / float(ber_target)
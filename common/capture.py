@@ -0,0 +1,111 @@
+"""This module provides the outputs for large EthAgent responses streamed to disk.
+
+Port.execute_to() writes a response piece by piece, as it arrives from the socket,
+to any number of outputs with a write() method. The classes here sit between the
+response and the destination files:
+
+    with CaptureFile(raw_path) as raw, open(exe_path, 'w') as exe, LineFilter(exe) as clean:
+        device.ethspy_rx_get_vbcm(outputs=[raw, clean])
+
+writes the raw VBCM data to raw_path and the data without blank lines to exe_path,
+without ever holding the whole response in memory.
+"""
+# Standard library imports
+import os
+import re
+
+# Local project imports.
+import ethspylib
+
+_NEWLINE = re.compile(r'\r\n|\r|\n')
+
+
+class CaptureFile(object):
+    """A text file that is only created, with its folder, when text is written to it.
+
+    Attributes:
+        path (str): The file to write
+        written (int): Number of characters written so far
+    """
+
+    def __init__(self, path, mode='w'):
+        self.path = path
+        self.mode = mode
+        self.written = 0
+        self._file = None
+
+    def write(self, text):
+        if self._file is None:
+            folder = os.path.dirname(self.path)
+            try:
+                if folder:
+                    os.makedirs(folder, exist_ok=True)
+                self._file = open(self.path, self.mode)
+            except OSError:
+                print('Error creating directory! Ending script!')
+                raise ethspylib.EthSpyError('Error creating directory! Ending script!')
+        self._file.write(text)
+        self.written += len(text)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LineFilter(object):
+    """Passes the text written to it on to output line by line.
+
+    Lines end at '\\r\\n', '\\n' or '\\r', like in a file read in text mode. Each line
+    is stripped with strip and written with a '\\n' ending, blank lines are dropped
+    if skip_blank is set.
+    A line split over two writes is held back until its end arrived; the last line
+    is passed on by close() or by leaving the with block.
+
+    Args:
+        output: Object with a write() method, e.g. a file
+        skip_blank (bool): Drop the lines that are blank after stripping
+        strip (callable): Applied to every line, str.rstrip by default
+    """
+
+    def __init__(self, output, skip_blank=True, strip=str.rstrip):
+        self.output = output
+        self.skip_blank = skip_blank
+        self.strip = strip
+        self._partial = ''
+
+    def write(self, text):
+        text = self._partial + text
+        # A '\r' at the end may be the first half of a '\r\n'
+        end = len(text) - 1 if text.endswith('\r') else len(text)
+        lines = _NEWLINE.split(text[:end])
+        self._partial = lines.pop() + text[end:]
+        self._write_lines(lines)
+
+    def close(self):
+        """Writes the last line if it has no line ending. The output stays open."""
+        if self._partial:
+            self._write_lines(_NEWLINE.split(self._partial)[:1])
+            self._partial = ''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write_lines(self, lines):
+        output = []
+        for line in lines:
+            line = self.strip(line)
+            if line or not self.skip_blank:
+                output.append(line)
+                output.append('\n')
+        if output:
+            self.output.write(''.join(output))
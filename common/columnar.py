@@ -0,0 +1,182 @@
+"""This module exports the LHC measurements as columns in a NumPy .npz file.
+
+Every column of the measurement store becomes one typed array, named by its key
+path, with the iteration of every value next to it:
+
+    DUT/TTL/MAC-TTL(ms)             float64
+    DUT/TTL/MAC-TTL(ms)#ITERATION   uint32
+    DUT/LINK/FEC-MODE               unicode
+    DUT/SNR/0/EYE-HEIGHT-THLE       float64
+
+A column that mixes numbers with text (e.g. 'N/A' for the iterations without a
+BER test) has NaN in the number array and the text in a '#TEXT' array, '' where
+the value is a number. METADATA is a JSON string with the static data (device
+INFO, MODULE-INFO, ...) and the key path and type of every column.
+
+The file is written without NumPy (an uncompressed zip of .npy arrays), and read
+with it, one column at a time:
+
+    with numpy.load('dut_1m_Cat6a_lp.npz') as columns:
+        ttl = columns['DUT/TTL/MAC-TTL(ms)']
+        info = json.loads(columns['METADATA'].item())['STATIC']['DUT']['INFO']
+
+load() reads the columns without NumPy.
+"""
+# Standard library imports
+from array import array
+import ast
+import json
+import math
+import os
+import sys
+import zipfile
+
+from .measurements import BOOL, FLOAT, INT, OBJECT
+
+MAGIC = b'\x93NUMPY\x01\x00'
+SEPARATOR = '/'
+METADATA = 'METADATA'
+
+# array typecode and NumPy dtype of the numeric arrays
+TYPES = {'d': '<f8', 'q': '<i8', 'I': '<u4', 'B': '|b1'}
+TYPECODES = {dtype: typecode for typecode, dtype in TYPES.items()}
+
+
+def column_name(path):
+    """Return the array name of the column at path, e.g. 'DUT/SNR/0/EYE-HEIGHT-THLE'."""
+    return SEPARATOR.join(str(key) for key in path)
+
+
+def column_arrays(column):
+    """Return the typed arrays of a measurements.Column.
+
+    Returns:
+        tuple: The values, as an array.array or a list of str, and the text of the
+            non-numeric values (None if all values are numbers)
+    """
+    kinds = set(column.kinds)
+    if kinds == {OBJECT} and all(type(value) is str for value in column.objects):
+        return list(column.objects), None
+    if kinds <= {FLOAT, INT}:
+        if kinds == {INT}:
+            return array('q', map(int, column.numbers)), None
+        return column.numbers, None
+    if kinds == {BOOL}:
+        return array('B', (number != 0 for number in column.numbers)), None
+
+    numbers = array('d', column.numbers)
+    text = []
+    objects = iter(column.objects)
+    for row, kind in enumerate(column.kinds):
+        if kind in (FLOAT, INT, BOOL):
+            text.append('')
+            continue
+        numbers[row] = math.nan
+        text.append(str(next(objects)) if kind == OBJECT else 'None')
+
+    return numbers, text
+
+
+def write(path, store, static=None):
+    """Writes the columns of a MeasurementStore to the .npz file at path.
+
+    The file is replaced at once, readers never see a partly written one.
+
+    Args:
+        path (str): The .npz file
+        store (MeasurementStore): The measurements
+        static (dict): Static data stored as METADATA, e.g. the device INFO
+    """
+    columns = {}
+    temp_path = path + '.tmp'
+    with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_STORED) as npz:
+        for key_path, column in store.columns():
+            name = column_name(key_path)
+            values, text = column_arrays(column)
+            columns[name] = {'PATH': list(key_path), 'DTYPE': _write_array(npz, name, values)}
+            _write_array(npz, name + '#ITERATION', column.iterations)
+            if text is not None:
+                _write_array(npz, name + '#TEXT', text)
+
+        metadata = json.dumps({'STATIC': static or {}, 'COLUMNS': columns})
+        _write_array(npz, METADATA, metadata)
+
+    os.replace(temp_path, path)
+
+
+def load(path, names=None):
+    """Reads columns of an .npz file without NumPy.
+
+    Args:
+        path (str): The .npz file
+        names (iterable): The arrays to read, all of them if None
+
+    Returns:
+        dict: The arrays by name, numbers as array.array, text as a list of str and
+            METADATA as a dict
+    """
+    output = {}
+    with zipfile.ZipFile(path) as npz:
+        for member in npz.namelist():
+            name = member[:-len('.npy')]
+            if names is not None and name not in names:
+                continue
+            output[name] = _read_array(npz.read(member))
+
+    if METADATA in output:
+        output[METADATA] = json.loads(output[METADATA])
+
+    return output
+
+
+def _write_array(npz, name, values):
+    """Writes values (array.array, list of str or str for a 0-d array) as name.npy."""
+    if isinstance(values, array):
+        dtype, shape = TYPES[values.typecode], (len(values),)
+        if sys.byteorder == 'big' and values.itemsize > 1:
+            values = array(values.typecode, values)
+            values.byteswap()
+        data = memoryview(values).cast('B')
+    else:
+        texts = [values] if isinstance(values, str) else values
+        width = max([len(text) for text in texts] + [1])
+        dtype = '<U{}'.format(width)
+        shape = () if isinstance(values, str) else (len(texts),)
+        data = b''.join(text.ljust(width, '\0').encode('utf-32-le') for text in texts)
+
+    header = "{{'descr': '{}', 'fortran_order': False, 'shape': {}, }}".format(dtype, shape)
+    # The data starts at a multiple of 64 bytes
+    padding = -(len(MAGIC) + 2 + len(header) + 1) % 64
+    header = (header + ' ' * padding + '\n').encode('latin1')
+
+    with npz.open(name + '.npy', 'w', force_zip64=True) as member:
+        member.write(MAGIC + len(header).to_bytes(2, 'little') + header)
+        member.write(data)
+
+    return dtype
+
+
+def _read_array(raw):
+    if not raw.startswith(MAGIC):
+        raise ValueError('Not a version 1.0 .npy array')
+    size = int.from_bytes(raw[8:10], 'little')
+    header = ast.literal_eval(raw[10:10 + size].decode('latin1'))
+    data = memoryview(raw)[10 + size:]
+
+    dtype = header['descr']
+    if dtype.startswith('<U'):
+        width = int(dtype[2:]) * 4
+        texts = [
+            bytes(data[start:start + width]).decode('utf-32-le').rstrip('\0')
+            for start in range(0, len(data), width)
+        ]
+        return texts[0] if header['shape'] == () else texts
+
+    values = array(TYPECODES[dtype])
+    values.frombytes(data)
+    if sys.byteorder == 'big' and values.itemsize > 1:
+        values.byteswap()
+    if dtype == '|b1':
+        return [value != 0 for value in values]
+
+    return values
@@ -0,0 +1,225 @@
+"""This module provides the crash-safe NDJSON journal of an LHC run.
+
+Everything stored during the run is appended to the journal as one JSON line,
+next to the JSON output file: the static data (device INFO, MODULE-INFO, and at
+the end RESULTS and COMMAND-TIMING) and every sample. The lines are written as the
+data is stored. When a stage of the run (the status collection or the BER run of
+an iteration, the results at the end) is complete, a checkpoint line commits it:
+
+    {"DUT": "dut", "LP": "lp", "CHANNEL": "1m_Cat6a", "JOURNAL": 1}
+    {"NEST": [], "DATA": {"TestName": "LHC", ...}, "STATIC": true}
+    {"NEST": ["DUT", "LINK"], "DATA": {"LINK-UP": true, ...}, "ITERATION": 1}
+    ...
+    {"BER_ITERATIONS": 1, "CHECKPOINT": 1, "STAGE": "STATUS"}
+
+The written lines are made durable with one fsync every sync_records lines or
+sync_seconds seconds, and at every checkpoint. A crash or reboot therefore loses
+at most the lines of the last few seconds. Lines after the last checkpoint (a
+stage that was cut short, or a line torn by a power loss) are not part of the run:
+they are ignored when the journal is read and cut off when it is resumed.
+
+load() rebuilds the data of the JSON output file from a journal, also from the
+journal of a test that is still running:
+
+    data = journal.load('dut_1m_Cat6a_lp.ndjson')
+"""
+# Standard library imports
+import json
+import os
+import time
+
+from .measurements import MeasurementStore
+from .stats import summarize_store
+
+VERSION = 1
+
+
+class Journal(object):
+    """Append-only journal of the data of one DUT/LP pair.
+
+    The journal file is opened by the first sample or checkpoint, resume() must be
+    called before that. Static data stored before is written then.
+
+    Attributes:
+        path (str): The journal file
+        header (dict): Identifies the run, a journal with another header is not
+            resumed
+        sync_records (int): Lines written at most between two fsyncs
+        sync_seconds (float): Seconds at most between two fsyncs
+    """
+
+    def __init__(self, path, header, sync_records=100, sync_seconds=5.0):
+        self.path = path
+        self.header = dict(header, JOURNAL=VERSION)
+        self.sync_records = sync_records
+        self.sync_seconds = sync_seconds
+        self._pending = []
+        self._started = False
+        self._file = None
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def record(self, data, nest, iteration):
+        """Writes the sample data stored at nest in iteration."""
+        # Serialized now, the caller may reuse data
+        self._pending.append(json.dumps(
+            {'NEST': list(nest), 'DATA': data, 'ITERATION': iteration}
+        ))
+        self._write()
+
+    def record_static(self, data, nest):
+        """Writes the static data stored at nest, once the journal file is open."""
+        self._pending.append(json.dumps({'NEST': list(nest), 'DATA': data, 'STATIC': True}))
+        if self._file is not None:
+            self._write()
+
+    def checkpoint(self, iteration, stage, **state):
+        """Writes a checkpoint of stage of iteration and fsyncs the journal.
+
+        Args:
+            iteration (int): The iteration the completed stage belongs to
+            stage (str): The completed stage, e.g. 'STATUS' or 'BER'
+            **state: Further values to restore on resume, e.g. BER_ITERATIONS=1
+        """
+        self._pending.append(json.dumps(dict(state, CHECKPOINT=iteration, STAGE=stage)))
+        self._write(sync=True)
+
+    def close(self):
+        """Closes the journal file, the next record or checkpoint opens it again."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, sync=False):
+        """Writes the pending lines, fsyncs them if sync or a sync bound is hit."""
+        if self._file is None:
+            self._file = open(self.path, 'a' if self._started else 'w')
+            if not self._started:
+                self._pending.insert(0, json.dumps(self.header))
+            self._started = True
+
+        self._file.write(''.join(line + '\n' for line in self._pending))
+        self._file.flush()
+        self._unsynced += len(self._pending)
+        self._pending = []
+
+        if sync or self._unsynced >= self.sync_records \
+                or time.monotonic() - self._synced_at >= self.sync_seconds:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._synced_at = time.monotonic()
+
+    def resume(self, store):
+        """Stores the data of the completed stages in store, in one pass over the journal.
+
+        The journal is then cut after the last checkpoint, so the run continues
+        from there.
+
+        Args:
+            store (MeasurementStore): The store of the resumed run
+
+        Returns:
+            dict: The last checkpoint, None if there is nothing to resume (no
+                journal, another run or no completed stage). The journal is then
+                started anew by the next checkpoint.
+        """
+        last = None
+        end = 0
+        try:
+            for number, (record, offset) in enumerate(read(self.path)):
+                if number == 0:
+                    if record != self.header:
+                        return None
+                elif 'CHECKPOINT' in record:
+                    last = record
+                    end = offset
+                else:
+                    apply(store, record)
+        except OSError:
+            return None
+
+        if last is not None:
+            self.close()
+            os.truncate(self.path, end)
+            self._started = True
+
+        return last
+
+
+def read(path):
+    """Yields the records of the completed stages of the journal at path.
+
+    The records of a stage are only yielded once its checkpoint was read, followed
+    by the checkpoint itself. The first record is the header.
+
+    Yields:
+        tuple: The record and the offset in bytes of the end of its stage
+
+    Raises:
+        OSError: if the journal cannot be read
+    """
+    offset = 0
+    batch = []
+    with open(path, 'rb') as file_handle:
+        for number, line in enumerate(file_handle):
+            offset += len(line)
+            if not line.endswith(b'\n'):
+                # Torn by a crash while the line was written
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+
+            if number == 0:
+                yield record, offset
+            elif 'CHECKPOINT' in record:
+                batch.append(record)
+                for item in batch:
+                    yield item, offset
+                batch = []
+            else:
+                batch.append(record)
+
+
+def apply(store, record):
+    """Stores the data of a sample or static record of the journal in store."""
+    nest = tuple(record['NEST'])
+    if record.get('STATIC'):
+        store.update(record['DATA'], nest)
+    else:
+        store.iteration = record['ITERATION']
+        store.append(record['DATA'], nest)
+
+
+def load(path, ttl_percentiles=(50, 95, 99)):
+    """Rebuilds the data written to the JSON output file from the journal at path.
+
+    The journal of a test that is still running (or was interrupted) gives the data
+    of its completed stages, with RESULTS computed from them like LHC.statistics()
+    does, so a report can be made before the test is complete.
+
+    Args:
+        path (str): The journal file
+        ttl_percentiles (tuple): Percentiles added to the TTL RESULTS of an
+            incomplete test, as LHC.ttl_percentiles
+
+    Returns:
+        dict: The nested LHC data dictionary
+
+    Raises:
+        OSError: if the journal cannot be read
+    """
+    store = MeasurementStore()
+    complete = False
+    for record, _ in read(path):
+        if 'NEST' in record:
+            apply(store, record)
+        elif 'CHECKPOINT' in record:
+            complete = record['STAGE'] == 'RESULTS'
+
+    if not complete:
+        for nest, data in summarize_store(store, ttl_percentiles):
+            store.update(data, nest)
+
+    return store.view()
@@ -0,0 +1,202 @@
+"""This module moves the log output off the test threads.
+
+QueuedLogWriter wraps the handlers of a logger (file handlers on the BER share, the
+console) in QueuedHandlers. Those only put the record on a bounded queue, and one
+background thread formats and writes them in order. A thread logging a line never
+waits on the disk, the network share or the console. If the writer falls behind
+and the queue is full, DEBUG and INFO records are dropped and counted instead. A
+WARNING or worse takes the place of a queued DEBUG/INFO record, or waits for room
+if there is none, so errors are not lost.
+
+Messages are formatted by the writer thread, so pass the values as logging
+arguments ('%s', value) or wrap an expensive message in a LazyMessage instead of
+formatting it before the call.
+"""
+# Standard library imports
+import logging
+import queue
+import threading
+import time
+
+
+class LazyMessage(object):
+    """A log message that is only built when a handler formats it.
+
+    Args:
+        build (callable): Returns the message text.
+        *args: Arguments passed to build.
+    """
+    __slots__ = ('build', 'args')
+
+    def __init__(self, build, *args):
+        self.build = build
+        self.args = args
+
+    def __str__(self):
+        return self.build(*self.args)
+
+
+class QueuedHandler(logging.Handler):
+    """Passes the records for handler to the queue of a QueuedLogWriter.
+
+    Attributes:
+        handler (logging.Handler): The handler that writes the records.
+    """
+
+    def __init__(self, handler, writer):
+        super(QueuedHandler, self).__init__(handler.level)
+        self.handler = handler
+        self.writer = writer
+
+    def emit(self, record):
+        self.writer.put(self.handler, record)
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.handler.close()
+        super(QueuedHandler, self).close()
+
+
+class QueuedLogWriter(object):
+    """Writes the records of QueuedHandlers from a background thread.
+
+    Attributes:
+        dropped (int): Number of records dropped because the queue was full.
+        put_timeout (float): Seconds a WARNING or worse waits for room in a full
+            queue before it is dropped too.
+    """
+    _STOP = object()
+
+    def __init__(self, maxsize=10000, put_timeout=1.0):
+        """
+        Args:
+            maxsize (int): Maximum number of records waiting to be written.
+            put_timeout (float): Seconds a WARNING or worse waits for room in a
+                full queue.
+        """
+        self.dropped = 0
+        self.put_timeout = put_timeout
+        self._reported = 0
+        self._queue = queue.Queue(maxsize)
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def wrap(self, handler):
+        """Return a QueuedHandler that writes to handler from the writer thread."""
+        if isinstance(handler, QueuedHandler):
+            return handler
+        return QueuedHandler(handler, self)
+
+    def install(self, *loggers):
+        """Replace the handlers of loggers by QueuedHandlers."""
+        for logger in loggers:
+            for handler in list(logger.handlers):
+                if not isinstance(handler, QueuedHandler):
+                    logger.removeHandler(handler)
+                    logger.addHandler(self.wrap(handler))
+
+    def put(self, handler, record):
+        """Queue record for handler.
+
+        If the queue is full, a DEBUG or INFO record is dropped. A WARNING or worse
+        replaces the oldest queued DEBUG/INFO record, or waits up to put_timeout
+        seconds for room.
+        """
+        item = (handler, record)
+        try:
+            self._queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+
+        if record.levelno >= logging.WARNING:
+            if self._evict(item):
+                return
+            if threading.current_thread() is not self._thread:
+                try:
+                    self._queue.put(item, timeout=self.put_timeout)
+                    return
+                except queue.Full:
+                    pass
+        self.dropped += 1
+
+    def flush(self, timeout=10.0):
+        """Wait until the records queued so far are written.
+
+        Records queued by other threads meanwhile are not waited for, so this
+        returns while they keep logging.
+
+        Args:
+            timeout (float): Maximum seconds to wait.
+
+        Returns:
+            bool: False if the records were not written within timeout.
+        """
+        if not self._thread.is_alive() or threading.current_thread() is self._thread:
+            return True
+        deadline = time.monotonic() + timeout
+        marker = threading.Event()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.wait(max(0.0, deadline - time.monotonic()))
+
+    def stop(self):
+        """Write the queued records and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            handler, record = self._next()
+            if handler is None:
+                return
+            try:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+                    self._report_dropped(handler, record)
+            except Exception:
+                handler.handleError(record)
+            finally:
+                self._queue.task_done()
+
+    def _next(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                self._queue.task_done()
+                return None, None
+            if isinstance(item, threading.Event):
+                # Everything queued before the flush() is written
+                item.set()
+                self._queue.task_done()
+                continue
+            return item
+
+    def _evict(self, item):
+        """Replace the oldest queued DEBUG/INFO record by item, False if there is none."""
+        with self._queue.mutex:
+            pending = self._queue.queue
+            for index, queued in enumerate(pending):
+                if isinstance(queued, tuple) and queued[1].levelno < logging.WARNING:
+                    del pending[index]
+                    pending.append(item)
+                    self.dropped += 1
+                    return True
+        return False
+
+    def _report_dropped(self, handler, record):
+        dropped = self.dropped
+        if dropped != self._reported:
+            self._reported = dropped
+            handler.handle(logging.makeLogRecord({
+                'name': record.name,
+                'levelno': logging.WARNING,
+                'levelname': 'WARNING',
+                'msg': '%d log records dropped, the log writer could not keep up',
+                'args': (dropped,)
+            }))
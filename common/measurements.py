@@ -0,0 +1,258 @@
+"""This module provides a columnar store for the LHC measurements.
+
+Every measured value lives in the column of its key path, e.g.
+('DUT', 'SNR', 0, 'EYE-HEIGHT-THLE'). A column keeps its values in array.array
+buffers next to the iteration they were measured in, so appending a sample is
+one dictionary lookup plus a few array appends no matter how long the run is.
+
+Static information (device INFO, MODULE-INFO, RESULTS, ...) is kept as plain
+values. view() rebuilds the nested dictionary the JSON output and the report
+generators expect, with the keys in the same order as before.
+"""
+# Standard library imports
+from array import array
+from sys import intern
+
+FLOAT, INT, BOOL, NONE, OBJECT = range(5)
+KINDS = {float: FLOAT, int: INT, bool: BOOL, type(None): NONE}
+MAX_EXACT_INT = 2 ** 53
+
+
+class Column(object):
+    """The values measured for one key path, in measurement order.
+
+    Numbers, booleans and None are kept in the numbers array, anything else (e.g.
+    strings) in the objects list. kinds tells for every row where its value is.
+    """
+    __slots__ = ('iterations', 'numbers', 'kinds', 'objects')
+
+    def __init__(self):
+        self.iterations = array('I')
+        self.numbers = array('d')
+        self.kinds = array('B')
+        self.objects = []
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def append(self, value, iteration=0):
+        """Append one value measured in iteration."""
+        kind = KINDS.get(type(value), OBJECT)
+        if kind == INT and not -MAX_EXACT_INT <= value <= MAX_EXACT_INT:
+            kind = OBJECT
+
+        if kind == OBJECT:
+            # Status strings repeat every iteration, keep one copy of each
+            self.objects.append(intern(value) if type(value) is str else value)
+            self.numbers.append(0.0)
+        elif kind == NONE:
+            self.numbers.append(0.0)
+        else:
+            self.numbers.append(value)
+        self.kinds.append(kind)
+        self.iterations.append(iteration)
+
+    def extend(self, values, iteration=0):
+        """Append several values measured in iteration."""
+        for value in values:
+            self.append(value, iteration)
+
+    def values(self, start=0):
+        """Return the values as a list, from row start on."""
+        kinds = self.kinds[start:] if start else self.kinds
+        if kinds and kinds.count(kinds[0]) == len(kinds):
+            if kinds[0] == FLOAT:
+                return self.numbers[start:].tolist()
+            if kinds[0] == INT:
+                return list(map(int, self.numbers[start:]))
+            if kinds[0] == OBJECT:
+                return self.objects[len(self.objects) - len(kinds):]
+
+        output = []
+        objects = iter(self.objects[self.kinds[:start].count(OBJECT):] if start else self.objects)
+        for kind, number in zip(kinds, self.numbers[start:]):
+            if kind == FLOAT:
+                output.append(number)
+            elif kind == INT:
+                output.append(int(number))
+            elif kind == BOOL:
+                output.append(number != 0)
+            elif kind == NONE:
+                output.append(None)
+            else:
+                output.append(next(objects))
+
+        return output
+
+    def nbytes(self):
+        """Return the size of the array buffers and the object references in bytes."""
+        return sum(
+            len(buf) * buf.itemsize for buf in (self.iterations, self.numbers, self.kinds)
+        ) + 8 * len(self.objects)
+
+
+class MeasurementStore(object):
+    """Columnar replacement of the nested LHC data dictionary.
+
+    Attributes:
+        iteration (int): The iteration new samples are tagged with.
+    """
+
+    def __init__(self):
+        self.iteration = 0
+        self._tree = {}
+        self._columns = {}
+
+    def append(self, new_data, nest=()):
+        """Append the values of new_data below nest.
+
+        Dictionaries are followed, lists extend the column and any other value is
+        appended to it.
+
+        Args:
+            new_data (dict): The data to be stored.
+            nest (tuple): Keys to the location where new_data is stored.
+        """
+        columns = self._columns
+        for key, value in new_data.items():
+            path = nest + (key,)
+            column = columns.get(path)
+            if column is None:
+                if isinstance(value, dict):
+                    node = self._node(nest)
+                    previous = node.get(key)
+                    if not isinstance(previous, dict):
+                        self._drop(path, previous)
+                        node[key] = {}
+                    self.append(value, path)
+                    continue
+                column = self._new_column(self._node(nest), key, path)
+            elif isinstance(value, dict):
+                self._drop(path, column)
+                self._node(path)
+                self.append(value, path)
+                continue
+
+            if isinstance(value, list):
+                column.extend(value, self.iteration)
+            else:
+                column.append(value, self.iteration)
+
+    def update(self, new_data, nest=()):
+        """Set the values of new_data below nest, replacing what was there.
+
+        Args:
+            new_data (dict): The data to be stored.
+            nest (tuple): Keys to the location where new_data is stored.
+        """
+        node = self._node(nest)
+        for key, value in new_data.items():
+            path = nest + (key,)
+            previous = node.get(key)
+            if isinstance(value, dict):
+                if not isinstance(previous, dict):
+                    self._drop(path, previous)
+                    node[key] = {}
+                self.update(value, path)
+            else:
+                self._drop(path, previous)
+                node[key] = value
+
+    def keys(self, nest=()):
+        """Return the keys stored directly below nest, empty if there are none."""
+        node = self._tree
+        for key in nest:
+            node = node.get(key) if isinstance(node, dict) else None
+            if node is None:
+                return []
+
+        return list(node) if isinstance(node, dict) else []
+
+    def values(self, nest):
+        """Return the values stored at nest as a list.
+
+        Raises:
+            KeyError: if nothing is stored at nest.
+        """
+        node = self._tree
+        for key in nest:
+            if not isinstance(node, dict):
+                raise KeyError(key)
+            node = node[key]
+
+        if isinstance(node, Column):
+            return node.values()
+
+        return node
+
+    def lists(self):
+        """Yield (path, value) for every list, in key order.
+
+        value is a Column for measured values and a list for static ones.
+        """
+        stack = [((), iter(self._tree.items()))]
+        while stack:
+            trail, items = stack[-1]
+            for key, value in items:
+                if isinstance(value, dict):
+                    stack.append((trail + (key,), iter(value.items())))
+                    break
+                if isinstance(value, (Column, list)):
+                    yield trail + (key,), value
+            else:
+                stack.pop()
+
+    def columns(self):
+        """Return the (path, Column) pairs of all measured values."""
+        return list(self._columns.items())
+
+    def view(self):
+        """Return the data as the nested dictionary used for the JSON output."""
+        return self._view(self._tree)
+
+    def nbytes(self):
+        """Return the size of the column buffers in bytes."""
+        return sum(column.nbytes() for column in self._columns.values())
+
+    def _view(self, node):
+        output = {}
+        for key, value in node.items():
+            if isinstance(value, dict):
+                output[key] = self._view(value)
+            elif isinstance(value, Column):
+                output[key] = value.values()
+            else:
+                output[key] = value
+
+        return output
+
+    def _node(self, nest):
+        node = self._tree
+        for depth, key in enumerate(nest):
+            child = node.get(key)
+            if not isinstance(child, dict):
+                self._drop(nest[:depth + 1], child)
+                child = node[key] = {}
+            node = child
+
+        return node
+
+    def _new_column(self, node, key, path):
+        column = Column()
+        previous = node.get(key)
+        if isinstance(previous, list):
+            # A static list becomes the start of the column
+            column.extend(previous)
+        node[key] = column
+        self._columns[path] = column
+
+        return column
+
+    def _drop(self, path, node):
+        """Forget the columns at or below path, node is what is stored there now."""
+        if isinstance(node, Column):
+            del self._columns[path]
+        elif isinstance(node, dict):
+            size = len(path)
+            for column_path in [p for p in self._columns if p[:size] == path]:
+                del self._columns[column_path]
@@ -0,0 +1,325 @@
+"""This module computes the summary statistics stored under RESULTS.
+
+Non-numeric values such as the 'N/A', 'ERROR' and 'DISABLED' sentinels are
+masked out of MIN/MEAN/MAX/STDDEV and the percentiles, but still count for the
+MODE, as they always have. Columns of a single numeric type are summarized
+straight from their array buffers.
+
+RunningStats, Histogram and StreamingStatistics keep the same summary up to date
+while the test runs, so it is available after every iteration without going over
+all the values again.
+"""
+# Standard library imports
+from collections import Counter
+import math
+
+from .measurements import BOOL, FLOAT, INT
+
+NUMERIC_TYPES = (int, float, bool)
+CASTS = {FLOAT: float, INT: int, BOOL: bool}
+
+
+def summarize(values, percentiles=()):
+    """Compute the statistics of a list of measured values.
+
+    Args:
+        values (list): The measured values, may contain sentinels.
+        percentiles (tuple): Percentiles to add as 'P<n>' keys, e.g. (50, 95, 99).
+
+    Returns:
+        dict: MIN, MEAN, MAX, STDDEV (and the percentiles) of the numeric values,
+            MODE and MODE_OCCURRENCES of all values.
+    """
+    clean = [x for x in values if type(x) in NUMERIC_TYPES]
+
+    output = numeric_summary(clean, percentiles) if clean else {}
+    output.update(mode(values))
+
+    return output
+
+
+def summarize_column(column, percentiles=()):
+    """Compute the statistics of a measurements.Column, see summarize()."""
+    kinds = column.kinds
+    if kinds and kinds[0] in CASTS and kinds.count(kinds[0]) == len(kinds):
+        cast = CASTS[kinds[0]]
+        output = numeric_summary(column.numbers, percentiles, cast)
+        output.update(mode(column.numbers, cast))
+        return output
+
+    return summarize(column.values(), percentiles)
+
+
+def summarize_store(store, ttl_percentiles=()):
+    """Compute the statistics of every list in a measurements.MeasurementStore.
+
+    The lists are collected before the first result is yielded, so the results can
+    be stored in the same store while iterating.
+
+    Args:
+        store (MeasurementStore): The measurements.
+        ttl_percentiles (tuple): Percentiles to add to the TTL lists.
+
+    Yields:
+        tuple: The RESULTS path of the list, e.g. ('RESULTS', 'DUT', 'TTL',
+            'MAC-TTL(ms)'), and its statistics.
+    """
+    for path, value in list(store.lists()):
+        percentiles = ttl_percentiles if 'TTL' in path else ()
+        if isinstance(value, list):
+            yield ('RESULTS',) + path, summarize(value, percentiles)
+        else:
+            yield ('RESULTS',) + path, summarize_column(value, percentiles)
+
+
+def numeric_summary(data, percentiles=(), cast=None):
+    """MIN, MEAN, MAX, STDDEV and percentiles of a non-empty sequence of numbers.
+
+    The data is only sorted if percentiles are asked for (the TTL lists).
+
+    Args:
+        data (sequence): The numbers, a list or an array.array.
+        percentiles (tuple): Percentiles to add as 'P<n>' keys.
+        cast (type): Type to convert MIN and MAX to, for typed arrays.
+    """
+    # One pass for all of them, the mean and variance with Welford's algorithm
+    count = 0
+    mean = m2 = 0.0
+    low = high = data[0]
+    for value in data:
+        count += 1
+        delta = value - mean
+        mean += delta / count
+        m2 += delta * (value - mean)
+        if value < low:
+            low = value
+        elif value > high:
+            high = value
+
+    if cast is not None:
+        low, high = cast(low), cast(high)
+
+    output = {
+        'MIN': low,
+        'MEAN': mean,
+        'MAX': high,
+        'STDDEV': math.sqrt(m2 / count)
+    }
+
+    if percentiles:
+        ordered = sorted(data)
+        for p in percentiles:
+            output['P{}'.format(p)] = percentile(ordered, p)
+
+    return output
+
+
+def percentile(ordered, p):
+    """Linearly interpolated percentile p (0-100) of a sorted sequence."""
+    position = (len(ordered) - 1) * p / 100.0
+    below = int(math.floor(position))
+    above = min(below + 1, len(ordered) - 1)
+
+    return float(ordered[below] + (ordered[above] - ordered[below]) * (position - below))
+
+
+def mode(values, cast=None):
+    """The most common value and how often it occurs, 'None' if it is not unique."""
+    try:
+        results = Counter(values).most_common(2)
+    except TypeError:
+        return {'MODE': 'None', 'MODE_OCCURRENCES': 'None'}
+
+    return mode_of(results, cast)
+
+
+def mode_of(results, cast=None):
+    """MODE and MODE_OCCURRENCES from the two most common (value, count) pairs."""
+    if not results:
+        return {
+            'MODE': 'Could not calculate',
+            'MODE_OCCURENCES': 'Could not calculate'
+        }
+
+    if len(results) > 1 and results[0][1] == results[1][1]:
+        return {'MODE': 'None', 'MODE_OCCURRENCES': 'None'}
+
+    value = results[0][0]
+    if cast is not None:
+        value = cast(value)
+
+    return {'MODE': value, 'MODE_OCCURRENCES': results[0][1]}
+
+
+class RunningStats(object):
+    """MIN, MEAN, MAX, STDDEV and MODE of a stream of measured values.
+
+    The mean and variance are updated with Welford's algorithm, so pushing a value
+    and reading the summary are both independent of how many values came before.
+    """
+    __slots__ = ('count', 'mean', 'm2', 'low', 'high', 'counts')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.low = None
+        self.high = None
+        self.counts = Counter()
+
+    def push(self, value):
+        """Add one value, sentinels only count for the MODE."""
+        if self.counts is not None:
+            try:
+                self.counts[value] += 1
+            except TypeError:
+                # Same as mode() of a list holding an unhashable value
+                self.counts = None
+
+        if type(value) not in NUMERIC_TYPES:
+            return
+
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if self.count == 1:
+            self.low = self.high = value
+        elif value < self.low:
+            self.low = value
+        elif value > self.high:
+            self.high = value
+
+    def extend(self, values):
+        """Add several values."""
+        for value in values:
+            self.push(value)
+
+    def summary(self):
+        """Return the statistics of the values pushed so far, see summarize()."""
+        output = {}
+        if self.count:
+            output = {
+                'MIN': self.low,
+                'MEAN': self.mean,
+                'MAX': self.high,
+                'STDDEV': math.sqrt(self.m2 / self.count)
+            }
+
+        if self.counts is None:
+            output.update({'MODE': 'None', 'MODE_OCCURRENCES': 'None'})
+        else:
+            output.update(mode_of(self.counts.most_common(2)))
+
+        return output
+
+
+class Histogram(object):
+    """Counts of a stream of values per bucket.
+
+    Attributes:
+        counts (list): Number of values in each bucket.
+        total (int): Number of values pushed, including those in no bucket.
+    """
+    __slots__ = ('classify', 'counts', 'total')
+
+    def __init__(self, size, classify):
+        """
+        Args:
+            size (int): Number of buckets.
+            classify (callable): Returns the bucket index of a value, None to
+                only count it in total.
+        """
+        self.classify = classify
+        self.counts = [0] * size
+        self.total = 0
+
+    def push(self, value):
+        """Add one value."""
+        self.total += 1
+        index = self.classify(value)
+        if index is not None:
+            self.counts[index] += 1
+
+    def extend(self, values):
+        """Add several values."""
+        for value in values:
+            self.push(value)
+
+    def percentages(self):
+        """Return the share of every bucket in percent of total."""
+        if not self.total:
+            return [0] * len(self.counts)
+
+        return [100 * (count * 1.0 / self.total) for count in self.counts]
+
+
+class StreamingStatistics(object):
+    """Keeps a RunningStats for every column of a MeasurementStore up to date.
+
+    update() only looks at the rows appended since the previous call. A column that
+    was replaced in the store is started over.
+
+    Attributes:
+        histograms (dict): Histogram of a column path, fed by update() too.
+    """
+
+    def __init__(self, store):
+        """
+        Args:
+            store (MeasurementStore): The store whose columns are followed.
+        """
+        self.store = store
+        self.histograms = {}
+        self._running = {}
+
+    def update(self):
+        """Feed the rows appended to the store since the last update."""
+        columns = dict(self.store.columns())
+        for path in [p for p in self._running if p not in columns]:
+            del self._running[path]
+            self.histograms.pop(path, None)
+
+        for path, column in columns.items():
+            followed, running, seen = self._running.get(path, (None, None, 0))
+            if followed is not column:
+                running, seen = RunningStats(), 0
+                histogram = self.histograms.get(path)
+                if histogram is not None:
+                    self.histograms[path] = Histogram(len(histogram.counts), histogram.classify)
+
+            if len(column) > seen:
+                values = column.values(seen)
+                running.extend(values)
+                histogram = self.histograms.get(path)
+                if histogram is not None:
+                    histogram.extend(values)
+
+            self._running[path] = (column, running, len(column))
+
+    def add_histogram(self, path, histogram):
+        """Follow the distribution of the column at path, including its values so far."""
+        self.histograms[path] = histogram
+        entry = self._running.get(path)
+        if entry is not None:
+            histogram.extend(entry[0].values()[:entry[2]])
+
+    def summary(self, path):
+        """Return the current statistics of the column at path.
+
+        Raises:
+            KeyError: if the column was not seen by update() yet.
+        """
+        return self._running[path][1].summary()
+
+    def results(self):
+        """Return the current statistics of all columns, nested like RESULTS."""
+        output = {}
+        for path, (_, running, _) in self._running.items():
+            node = output
+            for key in path[:-1]:
+                node = node.setdefault(key, {})
+            node[path[-1]] = running.summary()
+
+        return output
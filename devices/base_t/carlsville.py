@@ -26,6 +26,7 @@ import time
 
 # Local package imports
 import devices.common.ethspy_commands
+from devices.common.legacy_commands import not_supported
 
 
 class Carlsville(devices.common.ethspy_commands.EthSpyCommands):
@@ -46,6 +47,7 @@ class Carlsville(devices.common.ethspy_commands.EthSpyCommands):
 
         self.lanes = 4
 
+    @not_supported
     def ethspy_lane_get_status(self, lane):
         """Lane status is unavailable for Carlsville.
 
@@ -127,6 +129,7 @@ class Carlsville(devices.common.ethspy_commands.EthSpyCommands):
 
         return output
 
+    @not_supported
     def ethspy_tx_get_status(self, lane):
         """The Tx status is unavailable for Carlsville.
 
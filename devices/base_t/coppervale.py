@@ -21,6 +21,7 @@
 ##############################################################################
 from __future__ import absolute_import
 import devices.common.ethspy_commands
+from devices.common.legacy_commands import not_supported
 import json
 
 
@@ -44,6 +45,7 @@ class Coppervale(devices.common.ethspy_commands.EthSpyCommands):
         self.nvm_version = self.get_nvm_version()
         self.firmware_revision = self.get_firmware_revision()
 
+    @not_supported
     def ethspy_lane_get_status(self, lane):
         return {'OUTPUT': 'N/A'}
 
@@ -74,6 +76,7 @@ class Coppervale(devices.common.ethspy_commands.EthSpyCommands):
 
         return output
 
+    @not_supported
     def ethspy_tx_get_status(self, lane):
         return {'OUTPUT': 'N/A'}
 
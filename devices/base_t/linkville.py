@@ -22,16 +22,24 @@
 # Standard Python library imports
 from __future__ import absolute_import
 import json
-import time
 import datetime
 
 # Local package imports
 import devices.common.ethspy_commands
+from devices.common.legacy_commands import not_supported
+import ethspylib
 
 
 class Linkville(devices.common.ethspy_commands.EthSpyCommands):
     """This class overrides and provides methods to control Linkville."""
 
+    # The dropped packet check used to give Linkville 200 extra seconds, its
+    # counters are only trusted after 10 seconds without a change
+    wait_limits = dict(
+        devices.common.ethspy_commands.EthSpyCommands.wait_limits, rx_drained=220
+    )
+    settle_time = 10
+
     def __init__(self, port):
         """Initialize a Linkville object."""
         self.phy_type = 'LKV'
@@ -47,6 +55,7 @@ class Linkville(devices.common.ethspy_commands.EthSpyCommands):
 
         self.lanes = 4
 
+    @not_supported
     def ethspy_lane_get_status(self, lane):
         """Lane status is unavailable for Linkville.
 
@@ -128,6 +137,7 @@ class Linkville(devices.common.ethspy_commands.EthSpyCommands):
 
         return output
 
+    @not_supported
     def ethspy_tx_get_status(self, lane):
         """The Tx status is unavailable for Linkville.
 
@@ -172,27 +182,27 @@ class Linkville(devices.common.ethspy_commands.EthSpyCommands):
         for new_spd in speeds:
             if new_spd == '2.5GBASET':
                 self.port.execute(f'hostCommand T1 SPEED:2500')
-                time.sleep(10)
+                ethspylib.clock.sleep(10)
                 self.port.execute(f'hostCommand T1 SPEED:2500')
 
             elif new_spd == '5GBASET':
                 self.port.execute(f'hostCommand T1 SPEED:5000')
-                time.sleep(10)
+                ethspylib.clock.sleep(10)
                 self.port.execute(f'hostCommand T1 SPEED:5000')
                 
             elif new_spd == '1GBASET':
                 self.port.execute(f'hostCommand T1 SPEED:1000')
-                time.sleep(10)
+                ethspylib.clock.sleep(10)
                 self.port.execute(f'hostCommand T1 SPEED:1000')
                 
             elif new_spd == '10GBASET':
                 self.port.execute(f'hostCommand T1 SPEED:10000')
-                time.sleep(10)
+                ethspylib.clock.sleep(10)
                 self.port.execute(f'hostCommand T1 SPEED:10000')
                 '''
             else:
                 self.port.execute(f'hostCommand ETHSPY LINK SET-CAPABILITY PHY:LKV SIDE:LINE SPD:{new_spd[0:-5]}IG_FD')
-                time.sleep(10)
+                ethspylib.clock.sleep(10)
                 self.port.execute(f'hostCommand ETHSPY LINK SET-CAPABILITY PHY:LKV SIDE:LINE SPD:{new_spd[0:-5]}IG_FD')
                 '''
     def enable_link_management(self):
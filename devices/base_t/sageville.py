@@ -21,6 +21,7 @@
 ##############################################################################
 from __future__ import absolute_import
 import devices.common.ethspy_commands
+from devices.common.legacy_commands import not_supported
 import json
 
 
@@ -42,6 +43,7 @@ class Sageville(devices.common.ethspy_commands.EthSpyCommands):
 
         self.lanes = 4
 
+    @not_supported
     def ethspy_lane_get_status(self, lane):
         """Lane status is unavailable for Sageville.
         
@@ -87,6 +89,7 @@ class Sageville(devices.common.ethspy_commands.EthSpyCommands):
 
         return output
 
+    @not_supported
     def ethspy_tx_get_status(self, lane):
         """The Tx status is unavailable for Sageville.
         
@@ -29,11 +29,15 @@ class DeviceInit:
     Attributes:
         dispatch (:obj:`dict`): Holds the functions to initialize each device.
         e_phys_dispatch (:obj:`dict`): Holds the functions to initialize external PHY.
+        device_cache (:obj:`dict`): The resolved init function and static device information
+            per 'host:slot', so a device is only identified once per run, or again
+            after a reset or firmware change invalidated the static information of its port.
     """
 
     def __init__(self,logger):
         """Constructor for DeviceInit"""
         self.logger = logger
+        self.device_cache = {}
         self.dispatch = {
             'BROADWELL': self.broadwell,
             'CARLSVILLE': self.carlsville,
@@ -64,6 +68,10 @@ class DeviceInit:
     def create(self, port, manual_mode='AUTOMATIC'):
         """Examine the device at the port passed and return an object of that type.
 
+        The device is probed once (INFOLIST, SHOW, VER and LISTPHY) and the parsed
+        results are handed to the device object through Port.identity. Creating a
+        device for the same host and slot again reuses the cached result.
+
         Args:
             port (str): The port to create a control object for.
 
@@ -74,42 +82,75 @@ class DeviceInit:
             from .manual import ManualOverride
             return ManualOverride(port)
 
+        key = '{}:{}'.format(port.host_name, port.slot_number)
+        init_func, identity, epoch = self.device_cache.get(key, (None, None, None))
+        if epoch is not None and epoch == port.static_epoch:
+            self.logger.info('Device identified from cache.')
+        else:
+            # Not seen yet, or reset/reflashed since it was identified
+            init_func, identity = self.identify(port)
+            self.device_cache[key] = (init_func, identity, port.static_epoch)
+
+        port.identity = identity
+        if init_func is None:
+            return None
+
+        return init_func(port)
+
+    def forget(self, port=None):
+        """Drop the cached identification of one port, or of all ports if none is passed."""
+        if port is None:
+            self.device_cache.clear()
+        else:
+            self.device_cache.pop('{}:{}'.format(port.host_name, port.slot_number), None)
+            port.identity = None
+
+    def identify(self, port):
+        """Probe the device at the port and find the function that creates its object.
+
+        Args:
+            port (obj): The port to probe.
+
+        Return:
+            tuple: The init function and the static device information (see
+                LegacyCommands.identify).
+        """
+        port.identity = None
         device = legacy_commands.LegacyCommands(port)
-        
+        raw_phy = device.list_phy(True)
+
         if device.device_id.upper() in device_id_map:
             # Look up by Device ID
-            dut = self.dispatch[device_id_map.get(device.device_id.upper(), None)](port)
+            init_func = self.dispatch[device_id_map.get(device.device_id.upper(), None)]
             self.logger.info('Device identified using Device ID.')
         else:
             # Look up by codename
             self.logger.info('Device ID lookup failed, attempting codename lookup...')
             if device.codename == 'MAGNOLIA PARK':
-                dut = self.magnolia_park(port, device)
+                init_func = self.magnolia_park(device.dictify(raw_phy))
             else:
-                dut = self.dispatch[device.codename](port)
-
-            self.logger.info('Device ID lookup failed, attempting codename lookup...')
+                init_func = self.dispatch[device.codename]
 
-        dut = self.check_external_phy(device.list_phy(True), dut, port)
+        init_func = self.check_external_phy(raw_phy, init_func)
 
-        return dut
+        return init_func, device.identity
 
-    def check_external_phy(self, e_phy, dev, prt):
-        """Check for an external phy and return an object to control it."""
+    def check_external_phy(self, e_phy, init_func):
+        """Check for an external phy and return the function to create an object for it."""
         for phy in self.e_phys_dispatch:
             if phy in e_phy:
-                dev = self.e_phys_dispatch[phy](prt)
+                init_func = self.e_phys_dispatch[phy]
 
-        return dev
+        return init_func
 
-    def magnolia_park(self, port_num, dev):
-        """Check the Magnolia Park phy type and return either a Denverton or Broadwell object."""
-        primary_phy = dev.list_phy()['PRIMARY']
+    def magnolia_park(self, list_phy):
+        """Check the Magnolia Park phy type and return the Denverton or Broadwell init function."""
+        primary_phy = list_phy['PRIMARY']
 
         if primary_phy == 'KEREM73':
-            res = self.broadwell(port_num)
+            res = self.broadwell
         elif primary_phy == 'KEREM73_DNV':
-            res = self.denverton(port_num)
+            res = self.denverton
         else:
             res = None
 
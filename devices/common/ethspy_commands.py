@@ -21,8 +21,10 @@
 ##############################################################################
 import json
 from . import legacy_commands
+from . import legacy_parser
+from .module_info_cache import module_info_cache
 import string
-import time
+import ethspylib
 
 
 class EthSpyCommands(legacy_commands.LegacyCommands):
@@ -137,14 +139,17 @@ class EthSpyCommands(legacy_commands.LegacyCommands):
     def ethspy_link_get_stats(self):
         """Run the ETHSPY LINK GET-STATS command, convert it to Python dictionary, and return it.
 
+        The QR counters are read in the same burst and added to the output.
+
         :return: Output of the command
         :rtype: dict
         """
+        stats, qr = self.port.execute_many(
+            ['hostCommand ETHSPY LINK GET-STATS', 'hostCommand QR']
+        )
         try:
-            stats_output = json.loads(
-                self.port.execute('hostCommand ETHSPY LINK GET-STATS')
-            )
-            good_rx, rx_errors = self.get_qr_counter()
+            stats_output = json.loads(stats)
+            good_rx, rx_errors = legacy_parser.counters(qr)
             stats_output['QR-GOOD-RECEIVES'] = good_rx
             stats_output['QR-RECEIVE-ERRORS'] = rx_errors
         except ValueError:
@@ -194,12 +199,29 @@ class EthSpyCommands(legacy_commands.LegacyCommands):
         The output will have all characters that are not ASCII numbers,
         letters or ._-() removed for compatibility.
 
+        A newly plugged module is read again until its information stops
+        changing, for up to wait_limits['module_ready'] seconds. A module seen
+        before (same serial number, this run or an earlier one) is ready.
+
         Returns:
             dict: The SFP+ EEPROM contents.
         """
-        raw_data = self.port.execute('hostCommand ETHSPY MODULE-INFO GET-ALL')
+        j_data = self._read_module_info()
+        if not module_info_cache.known(j_data):
+            settled = ethspylib.Settled(self._read_module_info, self.settle_time)
+            settled.observe(j_data)
+            ready, waited = ethspylib.wait_until(settled, self.wait_limits['module_ready'])
+            j_data = settled.value
+            self.port.logger.info('Module info {} after {:.1f} seconds'.format(
+                'settled' if ready else 'still changing', waited
+            ))
+            module_info_cache.add(j_data)
+
+        return j_data
 
-        time.sleep(10)
+    def _read_module_info(self):
+        """The cleaned up output of ETHSPY MODULE-INFO GET-ALL."""
+        raw_data = self.port.execute('hostCommand ETHSPY MODULE-INFO GET-ALL')
 
         # filter now returns an iterator so we need to break it down
         data = ''.join([i for i in filter(string.printable.__contains__, raw_data)])
@@ -268,7 +290,7 @@ class EthSpyCommands(legacy_commands.LegacyCommands):
         """
         try:
             output = json.loads(
-                self.port.execute('hostCommand ETHSPY SUMMARY GET-STATUS')
+                self.port.execute_static('hostCommand ETHSPY SUMMARY GET-STATUS')
             )
         except ValueError:
             output = {}
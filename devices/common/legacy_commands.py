@@ -24,16 +24,49 @@ import ast
 
 # Local project imports
 import ethspylib
+from . import legacy_parser
+
+
+def not_supported(method):
+    """Marks a query method that only returns a placeholder like {'OUTPUT': 'N/A'}
+    for compatibility, see LegacyCommands.supports()."""
+    method.supported = False
+    return method
 
 
 class LegacyCommands(object):
     """This class provides access to the legacy EthAgent commands."""
 
+    # True if the lanes can be queried from several threads at once
+    concurrent_lanes = False
+
+    # Inherited query methods that do not work on the device, see supports()
+    unsupported_queries = frozenset()
+
+    # Longest waits in seconds for the device to reach a state, see LHC.wait_state()
+    wait_limits = {
+        'link_up': 10,  # Link up at the start of an iteration
+        'ber_start': 5,  # Link up before the BER test
+        'counters_cleared': 1,
+        'tx_started': 1,
+        'tx_stopped': 10,  # QT counter settled after STOP
+        'rx_drained': 10,  # QR counter settled after the link partner stopped
+        'module_ready': 10,  # MODULE-INFO of a newly plugged module settled
+    }
+
+    # Seconds a counter must keep its value to count as settled
+    settle_time = 1
+    # Seconds the link must stay up to count as up
+    link_settle_time = 1
+
     def __init__(self, port):
         """Constructor for LegacyCommands"""
         self.port = port
 
-        infolist = self.infolist()
+        # Reuse what DeviceInit already found out about this slot
+        self.identity = getattr(self.port, 'identity', None) or self.identify()
+
+        infolist = self.identity['INFOLIST']
         self.branding_string = infolist['BRANDING_STRING']
         self.device_id = infolist['DEVICE_ID']
         self.codename = infolist['CODENAME']
@@ -45,9 +78,8 @@ class LegacyCommands(object):
 
         self.speed = self.get_speed()
 
-        show = self.show()
-        self.mac_addr = self.get_mac_addr(show)
-        version = self.version()
+        self.mac_addr = self.identity['MAC_ADDR']
+        version = self.identity['VERSION']
 
         self.ea_version = version['ETHAGENT-VERSION']
         self.qv_version = version['QV-VERSION']
@@ -59,6 +91,7 @@ class LegacyCommands(object):
 
     def add_adapter(self):
         self.port.execute("hostCommand ADD %s" % self.slot_number)
+        self.port.invalidate_static_info()
         return
 
     def adminq_control(self, state):
@@ -109,6 +142,7 @@ class LegacyCommands(object):
             return_string = self.port.execute(
                 'hostCommand ADMINQ MANAGE {}'.format(state)
             )
+            self.port.invalidate_static_info()
         else:
             raise ethspylib.EthSpyError(
                 'Incorrect value passed to '
@@ -155,16 +189,7 @@ class LegacyCommands(object):
         Returns:
             tuple: Good receives, receive errors
         """
-        qr_tokens = self.qr().split()
-
-        if decimal:
-            good_receives = int(qr_tokens[1].strip('d'))
-            receive_errors = int(qr_tokens[3].strip('d'))
-        else:
-            good_receives = int(qr_tokens[0].strip('X'))
-            receive_errors = int(qr_tokens[2].strip('X'))
-
-        return good_receives, receive_errors
+        return legacy_parser.counters(self.qr(), decimal)
 
     def get_qt_counter(self, decimal=True):
         """Get the transmit counters and return the desired type of values.
@@ -175,16 +200,7 @@ class LegacyCommands(object):
         Returns:
             tuple: Good transmits, transmit errors
         """
-        qt_tokens = self.qt().split()
-
-        if decimal:
-            good_transmits = int(qt_tokens[1].strip('d'))
-            transmit_errors = int(qt_tokens[3].strip('d'))
-        else:
-            good_transmits = int(qt_tokens[0].strip('X'))
-            transmit_errors = int(qt_tokens[2].strip('X'))
-
-        return good_transmits, transmit_errors
+        return legacy_parser.counters(self.qt(), decimal)
 
     def get_slot(self, ea_input=-1):
         """Extract the slot number from the INFOLIST command and return it.
@@ -270,7 +286,7 @@ class LegacyCommands(object):
         """Run the GETSTATS command and return the raw output.
         
         If <raw> is False, the output is converted to a dictionary
-            before being returned.
+            with the counters as ints before being returned.
         
         Returns:
             str: The raw output of the GETSTATS command.
@@ -278,7 +294,7 @@ class LegacyCommands(object):
         output = self.port.execute('hostCommand GETSTATS')
 
         if not raw:
-            output = self.dictify(output)
+            output = legacy_parser.dictify_typed(output)
 
         return output
 
@@ -295,6 +311,21 @@ class LegacyCommands(object):
 
         return output
 
+    def identify(self):
+        """Query the static device information and return it.
+
+        Runs INFOLIST, SHOW and VER once. The result can be stored in Port.identity so
+        device objects created later for the same slot skip these commands.
+
+        Returns:
+            dict: 'INFOLIST' (dict), 'MAC_ADDR' (str) and 'VERSION' (dict).
+        """
+        return {
+            'INFOLIST': self.infolist(),
+            'MAC_ADDR': self.get_mac_addr(self.show()),
+            'VERSION': self.version()
+        }
+
     def infolist(self, raw=False):
         """Run the INFOLIST command and return the raw output.
         
@@ -304,7 +335,7 @@ class LegacyCommands(object):
         Returns:
             dict: The output of the INFOLIST command.
         """
-        output = self.port.execute('hostCommand INFOLIST')
+        output = self.port.execute_static('hostCommand INFOLIST')
 
         if not raw:
             output = self.dictify(output)
@@ -320,7 +351,7 @@ class LegacyCommands(object):
         Returns:
             str: The output of the LISTPHY command.
         """
-        output = self.port.execute('hostCommand LISTPHY')
+        output = self.port.execute_static('hostCommand LISTPHY')
 
         if not raw:
             output = self.dictify(output)
@@ -390,13 +421,25 @@ class LegacyCommands(object):
         """
         return self.port.execute('hostCommand QT')
 
-    def reep(self, start='0', stop='FF'):
-        """Read the contents of the the EEPROM. Return the data as a raw string."""
-        return self.port.execute('hostCommand REEP {} E:{}'.format(start, stop))
+    def reep(self, start='0', stop='FF', outputs=None):
+        """Read the contents of the the EEPROM. Return the data as a raw string.
+
+        If outputs (files) are given, the data is written to them as it arrives and
+        the number of characters written is returned instead.
+        """
+        command = 'hostCommand REEP {} E:{}'.format(start, stop)
+        if outputs is not None:
+            return self.port.execute_to(command, outputs)
+        return self.port.execute(command)
 
     def reset(self):
-        """Reset the adapter."""
+        """Reset the adapter.
+
+        The static information of the device (INFOLIST, VER, SUMMARY, ...) is queried
+        again the next time it is needed.
+        """
         self.port.execute('hostCommand RESET')
+        self.port.invalidate_static_info()
 
     def riosf(self, page, word):
         """Run the RIOSF command and return the raw output.
@@ -453,7 +496,7 @@ class LegacyCommands(object):
         Returns:
             str: The raw output of the SHOW command.
         """
-        return self.port.execute('hostCommand SHOW')
+        return self.port.execute_static('hostCommand SHOW')
 
     def status(self, raw=False):
         """Query the status.
@@ -544,7 +587,7 @@ class LegacyCommands(object):
         Returns:
             str: The raw version output.
         """
-        output = self.port.execute('hostCommand VER')
+        output = self.port.execute_static('hostCommand VER')
 
         if not raw:
             nl_split = output.split('\r\n')
@@ -621,23 +664,23 @@ class LegacyCommands(object):
         Returns:
             dict: The EthAgent output processed into a dictionary, all upper case
         """
-        raw = raw.upper()
-        output = {}
+        return legacy_parser.dictify(raw)
 
-        input_lines = raw.split('\n')
+    def supports(self, query):
+        """Return True if the device really runs the query method.
 
-        for line in input_lines:
-            line_sep = line.split(':')
-            if len(line_sep) > 1:
-                output[line_sep[0].strip()] = line_sep[1].strip()
-            else:
-                line_sep = line.split('=')
-                if len(line_sep) > 1:
-                    output[line_sep[0].strip()] = line_sep[1].strip()
-                else:
-                    output[line_sep[0].strip()] = None
+        Missing methods, methods in unsupported_queries and placeholders marked
+        with @not_supported are not supported.
 
-        return output
+        Args:
+            query (str): Name of the method, e.g. 'ethspy_rx_get_status'
+        """
+        method = getattr(self, query, None)
+        return (
+            method is not None
+            and query not in self.unsupported_queries
+            and getattr(method, 'supported', True)
+        )
 
     @staticmethod
     def infer_lanes(speed):
@@ -679,6 +722,7 @@ class LegacyCommands(object):
     def delete_adapter(self):
         print('LegacyCommands.delete_adapter() is deprecated!')
         self.port.execute("hostCommand DEL %s" % self.slot_number)
+        self.port.invalidate_static_info()
         return
 
     def get_branding_string(self, ea_input=-1):
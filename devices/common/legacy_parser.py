@@ -0,0 +1,98 @@
+"""This module parses the text output of the legacy EthAgent commands.
+
+INFOLIST, STATUS, SHOW, VER, HSS, GETSTATS and TTL print one 'KEY: VALUE' (or
+'KEY = VALUE') pair per line. The static ones (INFOLIST, SHOW, VER, HSS) print the
+same text every time, so the parsed pairs are kept per response text and a repeated
+response only costs a dictionary copy.
+
+QR and QT print the good and error counters in hex and decimal:
+'0000BEEFX 48879d 00000000X 0d'.
+"""
+# Standard library imports
+from functools import lru_cache
+import re
+
+CACHE_SIZE = 512
+
+_INT = re.compile(r'[+-]?\d+$')
+_FLOAT = re.compile(r'[+-]?(\d+\.\d*|\.\d+)([eE][+-]?\d+)?$')
+
+
+def dictify(raw):
+    """Create a dictionary from the EthAgent key-value pair output and return it.
+
+    The key is the text before the first ':' of a line and the value the text up to
+    the next ':'. Lines without a colon are split at '=' the same way, lines with
+    neither get the value None. Keys and values are upper case and stripped.
+
+    Args:
+        raw (str): Raw EthAgent output
+
+    Returns:
+        dict: The EthAgent output processed into a dictionary, all upper case
+    """
+    return _parse(raw).copy()
+
+
+def dictify_typed(raw):
+    """Like dictify(), but decimal numbers are returned as int or float.
+
+    Hex values (e.g. the device ID '0X1592') stay strings.
+    """
+    return _parse_typed(raw).copy()
+
+
+def typed_value(value):
+    """Return value as an int or float if it is a decimal number, else unchanged."""
+    if value is None:
+        return None
+    if _INT.match(value):
+        return int(value)
+    if _FLOAT.match(value):
+        return float(value)
+    return value
+
+
+def counters(raw, decimal=True):
+    """Return the good and error counters of the QR or QT output.
+
+    Args:
+        raw (str): Raw output of the QR or QT command
+        decimal (bool): Read the decimal counters, otherwise the hex ones
+
+    Returns:
+        tuple: Good packets, errors
+
+    Raises:
+        ValueError: if raw is not a counter line
+    """
+    tokens = raw.split()
+    try:
+        if decimal:
+            return int(tokens[1].rstrip('dD')), int(tokens[3].rstrip('dD'))
+        return int(tokens[0].rstrip('xX'), 16), int(tokens[2].rstrip('xX'), 16)
+    except (IndexError, ValueError):
+        raise ValueError('Unexpected QR/QT counter output: {!r}'.format(raw[:200]))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse(raw):
+    """The dictify() result of raw, shared between calls, so never modify it."""
+    output = {}
+    for line in raw.upper().split('\n'):
+        line_sep = line.split(':')
+        if len(line_sep) > 1:
+            output[line_sep[0].strip()] = line_sep[1].strip()
+        else:
+            line_sep = line.split('=')
+            if len(line_sep) > 1:
+                output[line_sep[0].strip()] = line_sep[1].strip()
+            else:
+                output[line_sep[0].strip()] = None
+
+    return output
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_typed(raw):
+    return {key: typed_value(value) for key, value in _parse(raw).items()}
@@ -22,6 +22,8 @@
 from __future__ import print_function
 from __future__ import absolute_import
 from . import legacy_commands
+from . import legacy_parser
+from .legacy_commands import not_supported
 
 
 class LegacyToEthspyConverter(legacy_commands.LegacyCommands):
@@ -39,7 +41,8 @@ class LegacyToEthspyConverter(legacy_commands.LegacyCommands):
     def ethspy_link_get_stats(self):
         """Get the Tx/Rx stats and return them.
 
-        The output of the QR and QT counters are added to the output.
+        The output of the QR and QT counters, read in the same burst, are added to
+            the output.
 
         This method does NOT use the ETHSPY LINK GET-STATS command as it
             doesn't exist in the legacy command set. It uses the legacy
@@ -48,10 +51,13 @@ class LegacyToEthspyConverter(legacy_commands.LegacyCommands):
         Returns:
             dict: The Tx/Rx stats.
         """
+        stats, qr, qt = self.port.execute_many(
+            ['hostCommand GETSTATS', 'hostCommand QR', 'hostCommand QT']
+        )
         try:
-            stats_output = self.getstats()
-            good_rx, rx_errors = self.get_qr_counter()
-            good_tx, tx_errors = self.get_qt_counter()
+            stats_output = legacy_parser.dictify_typed(stats)
+            good_rx, rx_errors = legacy_parser.counters(qr)
+            good_tx, tx_errors = legacy_parser.counters(qt)
             stats_output['QR-GOOD-RECEIVES'] = good_rx
             stats_output['QR-RECEIVE-ERRORS'] = rx_errors
             stats_output['QT-GOOD-TRANSMITS'] = good_tx
@@ -113,17 +119,21 @@ class LegacyToEthspyConverter(legacy_commands.LegacyCommands):
         return self.infolist()
 
     @staticmethod
+    @not_supported
     def ethspy_lane_get_status(lane):
         return {'OUTPUT': 'N/A'}
 
     @staticmethod
+    @not_supported
     def ethspy_rx_get_snr(abort, lane):
         return {'SNR': 'N/A'}
 
     @staticmethod
+    @not_supported
     def ethspy_rx_get_status(lane):
         return {'OUTPUT': 'N/A'}
 
     @staticmethod
+    @not_supported
     def ethspy_tx_get_status(lane):
         return {'OUTPUT': 'N/A'}
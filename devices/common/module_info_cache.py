@@ -0,0 +1,93 @@
+"""This module remembers the connector modules (cables, transceivers) seen before.
+
+The module info of a device is keyed by the module serial number ('VENDOR SN') and
+can be kept in a JSON file, so later runs know a module as soon as they read its
+serial number. A swapped cable has a new serial number and is treated as new.
+"""
+# Standard library imports
+import json
+import os
+import threading
+
+SERIAL_KEY = 'VENDOR SN'
+
+
+class ModuleInfoCache(object):
+    """Module info by serial number, optionally stored in a JSON file.
+
+    Attributes:
+        path (str): The JSON file, None to keep the modules for this run only.
+    """
+
+    def __init__(self, path=None):
+        self.path = None
+        self._modules = {}
+        self._lock = threading.Lock()
+        if path:
+            self.load(path)
+
+    def load(self, path):
+        """Use the JSON file at path, reading the modules already stored in it."""
+        with self._lock:
+            self.path = path
+            try:
+                with open(path, 'r') as file_handle:
+                    self._modules.update(json.load(file_handle))
+            except (OSError, ValueError):
+                pass
+
+    def known(self, info):
+        """Return True if a module with the serial number of info was seen before."""
+        serial = self.serial(info)
+        with self._lock:
+            return serial is not None and serial in self._modules
+
+    def get(self, serial):
+        """Return a copy of the info of the module with serial, None if unknown."""
+        with self._lock:
+            info = self._modules.get(serial)
+            return dict(info) if info is not None else None
+
+    def add(self, info):
+        """Remember info under its serial number and save the file. Modules without a
+        serial number are not stored."""
+        serial = self.serial(info)
+        if serial is None:
+            return
+
+        with self._lock:
+            self._modules[serial] = dict(info)
+            if self.path:
+                self._save()
+
+    def forget(self, serial=None):
+        """Drop the module with serial, or all modules if serial is None."""
+        with self._lock:
+            if serial is None:
+                self._modules.clear()
+            else:
+                self._modules.pop(serial, None)
+            if self.path:
+                self._save()
+
+    @staticmethod
+    def serial(info):
+        """Return the serial number in info, None if it has none."""
+        serial = info.get(SERIAL_KEY) if isinstance(info, dict) else None
+        if not serial or serial in ('Unspecified', 'N/A'):
+            return None
+
+        return serial
+
+    def _save(self):
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w') as file_handle:
+                json.dump(self._modules, file_handle, indent=4, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except OSError:
+            # Not being able to store the cache only costs time in the next run
+            pass
+
+
+module_info_cache = ModuleInfoCache()
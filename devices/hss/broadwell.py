@@ -69,19 +69,23 @@ class Broadwell(devices.common.ethspy_commands.EthSpyCommands):
 
         return output
 
-    def ethspy_rx_get_training_coeff_logs(self, lane=0):
+    def ethspy_rx_get_training_coeff_logs(self, lane=0, outputs=None):
         """Run the ETHSPY RX GET-TRAINING-COEFF-LOGS and return the output.
 
         Args:
             lane (int): The lane to get the training coeff log from.
+            outputs (list): Files to write the logs to as they arrive, the number
+                of characters written is returned then.
 
         Returns:
             str: Training coeff logs
         """
+        command = 'hostCommand ETHSPY RX GET-TRAINING-COEFF-LOGS {}'.format(lane)
+        if outputs is not None:
+            return self.port.execute_to(command, outputs)
+
         try:
-            output = self.port.execute(
-                'hostCommand ETHSPY RX GET-TRAINING-COEFF-LOGS {}'.format(lane)
-            )
+            output = self.port.execute(command)
         except ValueError:
             output = {}
 
@@ -32,12 +32,16 @@ import json
 # import devices.common.ethspy_commands
 import ethspylib
 from ..common.ethspy_commands import EthSpyCommands
+from ..common.legacy_commands import not_supported
 # import devices.common.ethspy_commands
 
 
 class Connorsville(EthSpyCommands):
     """This class overrides and provides methods specific to Connorsville."""
 
+    # The lane queries only read the RX/TX status of the lane
+    concurrent_lanes = True
+
     def __init__(self, port):
         self.phy_type = 'CNV'
 
@@ -57,6 +61,7 @@ class Connorsville(EthSpyCommands):
         self.snr_unit_of_measure = ' (mV)'
 
 
+    @not_supported
     def ethspy_lane_get_status(self, lane):
         """This method returns {'OUTPUT': 'N/A'} for compatibility.
 
@@ -80,17 +85,22 @@ class Connorsville(EthSpyCommands):
         return output
 
     @staticmethod
-    def ethspy_rx_get_training_coeff_logs(lane=0):
+    @not_supported
+    def ethspy_rx_get_training_coeff_logs(lane=0, outputs=None):
         """This method returns {'OUTPUT': 'N/A'} for compatibility.
 
         Args:
             lane (int): Unused. For compatibility only.
+            outputs (list): Unused, nothing is written to them.
 
         Returns:
-            dict: {'OUTPUT': 'N/A'}
+            dict: {'OUTPUT': 'N/A'}, 0 characters written if outputs are given
         """
+        if outputs is not None:
+            return 0
         return {}
 
+    @not_supported
     def ethspy_tx_get_status(self, lane):
         """This method returns {'OUTPUT': 'N/A'} for compatibility.
 
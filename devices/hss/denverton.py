@@ -20,6 +20,7 @@
 # rights must be express and approved by Intel in writing.
 ##############################################################################
 import devices.common.ethspy_commands
+from devices.common.legacy_commands import not_supported
 import ethspylib
 import json
 
@@ -27,6 +28,12 @@ import json
 class Denverton(devices.common.ethspy_commands.EthSpyCommands):
     """This class overrides and provides methods specific to Denverton."""
 
+    # ethspy_rx_get_ehm(abort, lane) polls the EHM12 of the port for about 40 seconds,
+    # it is not one of the per lane queries
+    unsupported_queries = frozenset([
+        'ethspy_rx_get_ehm',
+    ])
+
     def __init__(self, port):
         """Initialize a Denverton with device specific variables for testing.
         
@@ -47,6 +54,7 @@ class Denverton(devices.common.ethspy_commands.EthSpyCommands):
         self.firmware_revision = self.get_firmware_revision()
 
     @staticmethod
+    @not_supported
     def ethspy_rx_get_snr(abort, lane):
         """No longer valid... returns {'SNR': 'WinPython not available'}"""
         return {'SNR': 'WinPython not available'}
@@ -100,19 +108,23 @@ class Denverton(devices.common.ethspy_commands.EthSpyCommands):
 
         return output
 
-    def ethspy_rx_get_training_coeff_logs(self, lane=0):
+    def ethspy_rx_get_training_coeff_logs(self, lane=0, outputs=None):
         """Run the ETHSPY RX GET-TRAINING-COEFF-LOGS and return the output.
 
         Args:
             lane (int): The lane to get the training coeff log from.
+            outputs (list): Files to write the logs to as they arrive, the number
+                of characters written is returned then.
 
         Returns:
             str: Training coeff logs
         """
+        command = 'hostCommand ETHSPY RX GET-TRAINING-COEFF-LOGS {}'.format(lane)
+        if outputs is not None:
+            return self.port.execute_to(command, outputs)
+
         try:
-            output = self.port.execute(
-                'hostCommand ETHSPY RX GET-TRAINING-COEFF-LOGS {}'.format(lane)
-            )
+            output = self.port.execute(command)
         except ValueError:
             output = {}
 
@@ -152,13 +164,24 @@ class Denverton(devices.common.ethspy_commands.EthSpyCommands):
 
         return output_dict
 
-    def ethspy_rx_get_vbcm(self):
+    def ethspy_rx_get_vbcm(self, outputs=None):
+        """Get the VBCM data for EHM post-processing.
+
+        Args:
+            outputs (list): Files to write the data to as it arrives, the number of
+                characters written is returned then.
+
+        Returns:
+            str: The VBCM data, None if the EHM could not be read.
+        """
         ehm = self.ethspy_rx_get_ehm(3, 0)
 
         if ehm is not None:
-            output = self.port.execute(
-                'hostCommand ETHSPY RX GET-EHM PHY:KEREM73_DNV SIDE:LINE VBCM-TOOLS'
-            )
+            command = 'hostCommand ETHSPY RX GET-EHM PHY:KEREM73_DNV SIDE:LINE VBCM-TOOLS'
+            if outputs is not None:
+                output = self.port.execute_to(command, outputs)
+            else:
+                output = self.port.execute(command)
         else:
             output = None
 
@@ -20,6 +20,7 @@
 # rights must be express and approved by Intel in writing.
 ##############################################################################
 import devices.common.ethspy_commands
+from devices.common.legacy_commands import not_supported
 import ethspylib
 import json
 import time
@@ -55,6 +56,7 @@ class Fortville25(devices.common.ethspy_commands.EthSpyCommands):
 
         self.caui_coeffs = [[0, 0, 0]]
 
+    @not_supported
     def ethspy_lane_get_status(self, lane):
         """This method returns {'OUTPUT': 'N/A'} for compatibility.
         
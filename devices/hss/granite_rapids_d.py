@@ -25,6 +25,7 @@ import json
 import string
 import time
 import devices.common.ethspy_commands
+from devices.common.legacy_commands import not_supported
 
 
 class Granite_Rapids_D(devices.common.ethspy_commands.EthSpyCommands):
@@ -67,6 +68,7 @@ class Granite_Rapids_D(devices.common.ethspy_commands.EthSpyCommands):
 
         return output
 
+    @not_supported
     def ethspy_lane_get_status(self, lane):
         """This method returns {'OUTPUT': 'N/A'} for compatibility.
 
@@ -92,15 +94,19 @@ class Granite_Rapids_D(devices.common.ethspy_commands.EthSpyCommands):
 
         return output
 
-    def ethspy_rx_get_training_coeff_logs(self, lane):
+    @not_supported
+    def ethspy_rx_get_training_coeff_logs(self, lane, outputs=None):
         """This method returns {'OUTPUT': 'N/A'} for compatibility.
 
         Args:
             lane (int): (Unused, for compatibility only.)
+            outputs (list): (Unused, nothing is written to them.)
 
         Returns:
-            dict: {'OUTPUT': 'N/A'}
+            dict: {'OUTPUT': 'N/A'}, 0 characters written if outputs are given
         """
+        if outputs is not None:
+            return 0
         return {}
 
     def ethspy_tx_get_status(self, lane):
@@ -20,6 +20,7 @@
 # rights must be express and approved by Intel in writing.
 ##############################################################################
 import devices.common.ethspy_commands
+from devices.common.legacy_commands import not_supported
 import ethspylib
 import json
 import string
@@ -29,6 +30,16 @@ import time
 class Lewisberg(devices.common.ethspy_commands.EthSpyCommands):
     """This class overrides and provides methods specific to Lewisberg."""
 
+    # LHC only collects the TTL, the EHM (as the SNR) and the BER of Lewisberg
+    unsupported_queries = frozenset([
+        'ethspy_link_get_status',
+        'ethspy_rx_get_training_coeff_logs',
+        'ethspy_rx_get_status',
+        'ethspy_tx_get_status',
+        'ethspy_lane_get_status',
+        'ethspy_rx_get_ehm',
+    ])
+
     def __init__(self, port):
         """Constructor for Lewisberg"""
         self.phy_type = 'KEREM73'
@@ -42,6 +53,7 @@ class Lewisberg(devices.common.ethspy_commands.EthSpyCommands):
         self.tap = 1
 
     @staticmethod
+    @not_supported
     def ethspy_rx_get_snr(abort, lane):
         """No longer valid... returns {'SNR': 'WinPython not available'}"""
         return {'SNR': 'WinPython not available'}
@@ -101,15 +113,26 @@ class Lewisberg(devices.common.ethspy_commands.EthSpyCommands):
 
         return output
 
-    def ethspy_rx_get_vbcm(self):
+    def ethspy_rx_get_vbcm(self, outputs=None):
+        """Get the VBCM data for EHM post-processing.
+
+        Args:
+            outputs (list): Files to write the data to as it arrives, the number of
+                characters written is returned then.
+
+        Returns:
+            str: The VBCM data, None if the EHM could not be read.
+        """
         ehm = self.ethspy_rx_get_ehm(3, 0)
 
         if ehm is not None:
-            output = self.port.execute(
-                'hostCommand ETHSPY RX GET-EHM PHY:{} SIDE:LINE VBCM-TOOLS'.format(
-                    self.phy_type
-                )
+            command = 'hostCommand ETHSPY RX GET-EHM PHY:{} SIDE:LINE VBCM-TOOLS'.format(
+                self.phy_type
             )
+            if outputs is not None:
+                output = self.port.execute_to(command, outputs)
+            else:
+                output = self.port.execute(command)
         else:
             output = None
 
@@ -129,19 +152,23 @@ class Lewisberg(devices.common.ethspy_commands.EthSpyCommands):
 
         return output
 
-    def ethspy_rx_get_training_coeff_logs(self, lane=0):
+    def ethspy_rx_get_training_coeff_logs(self, lane=0, outputs=None):
         """Run the ETHSPY RX GET-TRAINING-COEFF-LOGS and return the output.
 
         Args:
             lane (int): The lane to get the training coeff log from.
+            outputs (list): Files to write the logs to as they arrive, the number
+                of characters written is returned then.
 
         Returns:
             str: Training coeff logs
         """
+        command = 'hostCommand ETHSPY RX GET-TRAINING-COEFF-LOGS {}'.format(lane)
+        if outputs is not None:
+            return self.port.execute_to(command, outputs)
+
         try:
-            output = self.port.execute(
-                'hostCommand ETHSPY RX GET-TRAINING-COEFF-LOGS {}'.format(lane)
-            )
+            output = self.port.execute(command)
         except ValueError:
             output = {}
 
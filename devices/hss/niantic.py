@@ -20,6 +20,7 @@
 # rights must be express and approved by Intel in writing.
 ##############################################################################
 import devices.common.legacy_commands
+from devices.common.legacy_commands import not_supported
 
 
 class Niantic(devices.common.legacy_commands.LegacyCommands):
@@ -37,6 +38,7 @@ class Niantic(devices.common.legacy_commands.LegacyCommands):
         self.snr_unit_of_measure = ''
         self.tap = 1
 
+    @not_supported
     def ethspy_lane_get_status(self, lane):
         """Get the lane status and return it.
         
@@ -25,6 +25,8 @@ import json
 # Local package imports
 import ethspylib
 from ..common.ethspy_commands import EthSpyCommands
+from ..common import legacy_parser
+from ..common.legacy_commands import not_supported
 
 
 class Parkvale(EthSpyCommands):
@@ -44,6 +46,7 @@ class Parkvale(EthSpyCommands):
 
         # self.set_mode()
 
+    @not_supported
     def ethspy_lane_get_status(self, lane):
         """This method returns {'OUTPUT': 'N/A'} for compatibility.
 
@@ -56,14 +59,15 @@ class Parkvale(EthSpyCommands):
         return {'OUTPUT': 'N/A'}
 
     def ethspy_link_get_stats(self):
-        """Gets the link stats and adds the QR counters to the output.
+        """Gets the link stats and adds the QR counters, read in the same burst, to the output.
 
         Returns:
             dict: The link stats with QR counters added.
         """
+        stats, qr = self.port.execute_many(['hostCommand ETHSPY LINK GET-STATS', 'hostCommand QR'])
         try:
-            stats_output = json.loads(self.port.execute('hostCommand ETHSPY LINK GET-STATS'))
-            good_rx, rx_errors = self.get_qr_counter()
+            stats_output = json.loads(stats)
+            good_rx, rx_errors = legacy_parser.counters(qr)
             stats_output['QR-GOOD-RECEIVES'] = good_rx
             stats_output['QR-RECEIVE-ERRORS'] = rx_errors
         except ValueError:
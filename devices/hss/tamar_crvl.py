@@ -20,6 +20,7 @@
 # rights must be express and approved by Intel in writing.
 ##############################################################################
 import devices.common.ethspy_commands
+from devices.common.legacy_commands import not_supported
 import ethspylib
 import json
 import time
@@ -43,6 +44,7 @@ class Tamar_CRVL(devices.common.ethspy_commands.EthSpyCommands):
         
         self.lanes = 1
 
+    @not_supported
     def ethspy_lane_get_status(self, lane):
         """This method returns {'OUTPUT': 'N/A'} for compatibility.
 
@@ -68,15 +70,19 @@ class Tamar_CRVL(devices.common.ethspy_commands.EthSpyCommands):
 
         return output
 
-    def ethspy_rx_get_training_coeff_logs(self, lane):
+    @not_supported
+    def ethspy_rx_get_training_coeff_logs(self, lane, outputs=None):
         """This method returns {'OUTPUT': 'N/A'} for compatibility.
 
         Args:
             lane (int): (Unused, for compatibility only.)
+            outputs (list): (Unused, nothing is written to them.)
 
         Returns:
-            dict: {'OUTPUT': 'N/A'}
+            dict: {'OUTPUT': 'N/A'}, 0 characters written if outputs are given
         """
+        if outputs is not None:
+            return 0
         return {}
 
     def ethspy_tx_get_status(self, lane):
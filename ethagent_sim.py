@@ -0,0 +1,494 @@
+"""
+Local EthAgent simulator.
+
+Speaks the EthAgent line protocol (ADD/DEL, '<COMMAND>:<slot> ...' lines, responses
+ending in an 'OK\\r\\n' line) with scripted device personas, so the EthAgent clients
+and the LHC test can run without lab hardware, e.g. in the tests.
+
+Every slot is one simulated device. It answers the legacy commands (INFOLIST, VER,
+SHOW, STATUS, LISTPHY, QR, QT, HC, TX, XX, T1, TTL, GETSTATS, ...) and the ETHSPY
+LINK/RX/TX/LANE/MODULE-INFO/SUMMARY commands of its persona. Received packets are
+counted while the device transmits, so a BER test sees its counters grow.
+
+Latency, jitter and error injection are set per command, e.g.:
+
+    simulator = EthAgentSimulator(
+        {'1': 'Columbiaville', '2': 'Columbiaville'},
+        latency={'*': 0.001, 'ETHSPY LINK GET-TTL': 0.5}, jitter=0.0005,
+        error_rate={'QR': 0.01}
+    )
+    with simulator:
+        port = ethspylib.Port(simulator.host_name, '1', logger, logger)
+
+To run it standalone and point ANIL_Robot_LHC_Auto_Config at it:
+
+    python ethagent_sim.py --port 8080 3=Columbiaville 1=Columbiaville
+"""
+import argparse
+import json
+import random
+import socket
+import socketserver
+import threading
+import time
+
+
+class Persona(object):
+    """
+    The static description of a simulated device.
+
+    Attributes:
+        name (string): Persona name, e.g. 'Columbiaville'
+        device_id (string): PCI device ID reported by INFOLIST
+        codename (string): Codename reported by INFOLIST
+        branding_string (string): Branding string reported by INFOLIST
+        phy (string): PHY reported by LISTPHY and LINK GET-STATUS
+        speed (int): Link speed in Mbps
+        fec_mode (string): FEC mode reported by LINK GET-STATUS
+        ethspy (bool): Whether the device answers ETHSPY commands
+        rx_status (dict): Mean of the numeric RX GET-STATUS values per lane
+        ttl_ms (float): Mean time to link in ms
+        ber (float): Bit error rate of the received traffic
+    """
+
+    def __init__(self, name, device_id, codename, branding_string, phy, speed,
+                 fec_mode='NONE', ethspy=True, rx_status=None, ttl_ms=1500.0, ber=0.0):
+        self.name = name
+        self.device_id = device_id
+        self.codename = codename
+        self.branding_string = branding_string
+        self.phy = phy
+        self.speed = speed
+        self.fec_mode = fec_mode
+        self.ethspy = ethspy
+        self.rx_status = rx_status or {}
+        self.ttl_ms = ttl_ms
+        self.ber = ber
+
+
+PERSONAS = {
+    'Columbiaville': Persona(
+        'Columbiaville', '0x1592', 'Columbiaville',
+        'Intel(R) Ethernet Controller E810-C for QSFP', 'CVL', 25000, 'RS-528',
+        rx_status={'EYE-HEIGHT-THLE': 42.0, 'EYE-HEIGHT-THLO': 38.0}, ttl_ms=1800.0
+    ),
+    'Linkville': Persona(
+        'Linkville', '0x57B0', 'Linkville',
+        'Intel(R) Ethernet Controller E610-XT2', 'LKV', 10000,
+        rx_status={'SNR-OP-MARGIN': 6.5, 'SNR-MIN-OP-MARGIN': 4.0}, ttl_ms=3200.0
+    ),
+    'Foxville': Persona(
+        'Foxville', '0x15F2', 'Foxville',
+        'Intel(R) Ethernet Controller I225-LM', 'P31G', 2500, ethspy=False, ttl_ms=2900.0
+    ),
+    'Granite Rapids-D': Persona(
+        'Granite Rapids-D', '0x579D', 'Granite_Rapids-D',
+        'Intel(R) Ethernet Connection E830-XXV-4 for backplane', 'UX4', 25000, 'RS-528',
+        rx_status={'EYE-HEIGHT': 35.0, 'EYE-WIDTH': 0.42}, ttl_ms=1200.0
+    )
+}
+
+
+class SimulatedDevice(object):
+    """
+    One device on a simulator slot, with its link and traffic counters.
+
+    Attributes:
+        persona (Persona): What the device reports
+        slot (string): The slot number
+        packet_size (int): Size of the transmitted packets in bytes
+    """
+
+    def __init__(self, persona, slot, rng):
+        self.persona = persona
+        self.slot = str(slot)
+        self.packet_size = 1518
+        self.rng = rng
+        self.lock = threading.Lock()
+        self.packets = 0.0
+        self.tx_started = None
+        self.mac_addr = '001B21{:04X}{:02}'.format(0x1000 + int(self.slot), int(self.slot) % 100)
+
+    def packet_rate(self):
+        """Packets per second at line rate, including preamble and inter-frame gap."""
+        return self.persona.speed * 1e6 / ((self.packet_size + 20) * 8)
+
+    def received(self):
+        """Return the good packets and errors counted since the last HC."""
+        packets = self.packets
+        if self.tx_started is not None:
+            packets += (time.monotonic() - self.tx_started) * self.packet_rate()
+
+        errors = int(packets * self.packet_size * 8 * self.persona.ber)
+
+        return int(packets) - errors, errors
+
+    def handle(self, words):
+        """Return the response payload of a command, split into words, without 'OK'."""
+        with self.lock:
+            handler = getattr(self, 'cmd_' + words[0].upper().replace('-', '_'), None)
+            if handler is None:
+                return 'Error: Unknown command {}'.format(words[0])
+            return handler(words[1:])
+
+    # Legacy commands
+    def cmd_INFOLIST(self, args):
+        p = self.persona
+        return '\r\n'.join([
+            'Slot: {}'.format(self.slot),
+            'Branding_String: {}'.format(p.branding_string),
+            'Device_ID: {}'.format(p.device_id),
+            'Codename: {}'.format(p.codename),
+            'Bus: {:02X}'.format(0x17 + int(self.slot)),
+            'Device: 00',
+            'Function: 0'
+        ])
+
+    def cmd_VER(self, args):
+        return 'EthAgent version 4.12.0\r\nQV version 5.2.1'
+
+    def cmd_SHOW(self, args):
+        return 'Ethernet Address: {}\r\nPCI Slot: {}'.format(self.mac_addr, self.slot)
+
+    def cmd_STATUS(self, args):
+        return 'Link: UP\r\nSpeed: {}\r\nDuplex: FULL'.format(self.persona.speed)
+
+    def cmd_LISTPHY(self, args):
+        return 'Primary: {}'.format(self.persona.phy)
+
+    def cmd_QR(self, args):
+        good, errors = self.received()
+        return '{:08X}X {}d {:08X}X {}d'.format(good, good, errors, errors)
+
+    def cmd_QT(self, args):
+        good, _ = self.received()
+        return '{:08X}X {}d {:08X}X {}d'.format(good, good, 0, 0)
+
+    def cmd_HC(self, args):
+        self.packets = 0.0
+        if self.tx_started is not None:
+            self.tx_started = time.monotonic()
+        return ''
+
+    def cmd_TX(self, args):
+        if self.tx_started is None:
+            self.tx_started = time.monotonic()
+        return ''
+
+    def cmd_XX(self, args):
+        if self.tx_started is not None:
+            self.packets += (time.monotonic() - self.tx_started) * self.packet_rate()
+            self.tx_started = None
+        return ''
+
+    def cmd_T1(self, args):
+        for arg in args:
+            key, _, value = arg.partition(':')
+            if key.upper() == 'SIZE' and value.isdigit():
+                if self.tx_started is not None:
+                    # Count what was sent with the previous size first
+                    self.cmd_XX(())
+                    self.cmd_TX(())
+                self.packet_size = int(value)
+        return ''
+
+    def cmd_TTL(self, args):
+        ttl = self.ttl()
+        return 'Link TTL(ms): {:.1f}\r\nAN Count: 1\r\nResolution(ms): 1'.format(ttl)
+
+    def cmd_GETSTATS(self, args):
+        good, errors = self.received()
+        return '\r\n'.join([
+            'Good Packets Received: {}'.format(good),
+            'CRC Errors: {}'.format(errors),
+            'Good Packets Transmitted: {}'.format(good)
+        ])
+
+    def cmd_HOSTINFO(self, args):
+        return repr({'HOSTNAME': socket.gethostname(), 'OS': 'simulated'})
+
+    def cmd_GETHOSTNAME(self, args):
+        return socket.gethostname()
+
+    def cmd_REEP(self, args):
+        return '\r\n'.join('{:04X}: FFFF'.format(word) for word in range(0, 0x40))
+
+    def _no_output(self, args):
+        return ''
+
+    cmd_BLINK = cmd_RESET = cmd_WMII = cmd_OVERRIDETCPTIMEOUT = _no_output
+    cmd_RESETTCPTIMEOUTTODEFAULT = cmd_ADMINQ = _no_output
+
+    # ETHSPY commands
+    def cmd_ETHSPY(self, args):
+        if not self.persona.ethspy:
+            return 'Error: ETHSPY is not supported on this device'
+        if len(args) < 2:
+            return 'Error: ETHSPY needs a block and an action'
+
+        params = {}
+        positional = []
+        for arg in args[2:]:
+            key, sep, value = arg.partition(':')
+            if sep:
+                params[key.upper()] = value
+            else:
+                positional.append(arg)
+        lane = params.get('L', positional[0] if positional else '0')
+
+        handler = getattr(
+            self, 'ethspy_{}_{}'.format(args[0], args[1]).upper().replace('-', '_'), None
+        )
+        if handler is None:
+            return json.dumps({'ERROR': 'Unsupported command {} {}'.format(args[0], args[1])})
+
+        return json.dumps(handler(lane))
+
+    def ETHSPY_LINK_GET_STATUS(self, lane):
+        p = self.persona
+        return {
+            'LINK-UP': True, 'SPEED': '{}G'.format(p.speed // 1000) if p.speed >= 1000 else '100M',
+            'FEC-MODE': p.fec_mode, 'PHY': p.phy, 'CURRENT-LINK-SPEED': p.speed
+        }
+
+    def ETHSPY_LINK_GET_STATS(self, lane):
+        good, errors = self.received()
+        return {
+            'RX-GOOD-PACKETS': good, 'RX-CRC-ERRORS': errors, 'TX-GOOD-PACKETS': good,
+            'ERROR-SYMBOL-RECEIVED': False
+        }
+
+    def ETHSPY_LINK_GET_BANDWIDTH(self, lane):
+        rate = self.persona.speed if self.tx_started is not None else 0
+        return {'TX-MBPS': rate, 'RX-MBPS': rate}
+
+    def ETHSPY_LINK_GET_TTL(self, lane):
+        return {'MAC-TTL(ms)': round(self.ttl(), 1), 'ERROR': 'None'}
+
+    def ETHSPY_LINK_GET_MODULE_INFO(self, lane):
+        return {
+            'VENDOR NAME': 'SIMULATED', 'VENDOR PN': 'SIM-{}-1M'.format(self.persona.phy),
+            'VENDOR SN': 'SIM{:06}'.format(int(self.slot))
+        }
+
+    ETHSPY_MODULE_INFO_GET_ALL = ETHSPY_LINK_GET_MODULE_INFO
+
+    def ETHSPY_LINK_ENABLE_LINK_MANAGEMENT(self, lane):
+        return {}
+
+    ETHSPY_LINK_SET_CAPABILITY = ETHSPY_LINK_ENABLE_LINK_MANAGEMENT
+
+    def ETHSPY_SUMMARY_GET_STATUS(self, lane):
+        p = self.persona
+        return {
+            'DEVICE-NAME': p.branding_string, 'MAC-ADDRESS': self.mac_addr,
+            'BUS': '{:02X}'.format(0x17 + int(self.slot)), 'DEVICE': '00', 'FUNCTION': '0',
+            'ETHAGENT-VERSION': '4.12.0'
+        }
+
+    def ETHSPY_RX_GET_STATUS(self, lane):
+        output = {'LANE': int(lane), 'CDR-LOCK': True, 'PPM': round(self.rng.gauss(0, 2), 2)}
+        for key, mean in self.persona.rx_status.items():
+            output[key] = round(self.rng.gauss(mean, abs(mean) * 0.03), 3)
+        return output
+
+    def ETHSPY_RX_GET_EHM(self, lane):
+        return {'LANE': int(lane), 'EHM': round(self.rng.gauss(30.0, 1.0), 2)}
+
+    def ETHSPY_TX_GET_STATUS(self, lane):
+        return {'LANE': int(lane), 'PRE': 4, 'MAIN': 52, 'POST': 8}
+
+    def ETHSPY_TX_SET_PATTERN(self, lane):
+        return {}
+
+    ETHSPY_TX_SET_TXFFE_FORCE = ETHSPY_TX_SET_PATTERN
+
+    def ETHSPY_LANE_GET_STATUS(self, lane):
+        return {'LANE': int(lane), 'SIGNAL-DETECT': True, 'ALIGNED': True}
+
+    def ttl(self):
+        return max(1.0, self.rng.gauss(self.persona.ttl_ms, self.persona.ttl_ms * 0.1))
+
+
+def lookup(setting, command):
+    """
+    Return the value of a per-command setting for command.
+
+    Args:
+        setting: A number used for every command, or a dictionary keyed by command
+            prefix (e.g. 'QR', 'ETHSPY LINK', 'ETHSPY LINK GET-TTL') with '*' as the
+            default. The longest matching prefix wins.
+        command (string): The command words, without the slot.
+    """
+    if not isinstance(setting, dict):
+        return setting or 0
+
+    words = command.upper().split()
+    for size in range(len(words), 0, -1):
+        value = setting.get(' '.join(words[:size]))
+        if value is not None:
+            return value
+
+    return setting.get('*', 0)
+
+
+class SimulatorHandler(socketserver.StreamRequestHandler):
+    """Serves one client connection, one response per command line."""
+
+    def setup(self):
+        socketserver.StreamRequestHandler.setup(self)
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        server = self.server
+        for line in self.rfile:
+            line = line.decode('utf-8', 'replace').strip()
+            if not line:
+                continue
+
+            response, disconnect = server.respond(line)
+            if disconnect:
+                # Leave half a response behind, like an agent that crashed while answering
+                self.wfile.write(response[:len(response) // 2].encode())
+                return
+            self.wfile.write(response.encode())
+
+
+class EthAgentSimulator(socketserver.ThreadingTCPServer):
+    """
+    TCP server that simulates an EthAgent with one device persona per slot.
+
+    Can be used as a context manager, which serves on a background thread.
+
+    Attributes:
+        host_name (string): The 'ip:port' to connect to
+        devices (dict): SimulatedDevice per slot number
+        commands (int): Number of commands answered so far
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, slots, host='127.0.0.1', port=0, latency=0, jitter=0,
+                 error_rate=0, disconnect_rate=0, seed=None, handler=SimulatorHandler):
+        """
+        Constructor for EthAgentSimulator instance.
+
+        Args:
+            slots (dict): Persona name (see PERSONAS) or Persona per slot number
+            host (string): Address to listen on
+            port (int): TCP port to listen on, 0 picks a free one
+            latency: Seconds before a response is sent, see lookup()
+            jitter: Up to this many seconds are added to the latency, see lookup()
+            error_rate: Probability of answering with an EthAgent error instead,
+                see lookup()
+            disconnect_rate: Probability of closing the connection in the middle of
+                a response, see lookup()
+            seed (int): Seed for the simulated measurements and the injected faults
+        """
+        socketserver.ThreadingTCPServer.__init__(self, (host, port), handler)
+        self.host_name = '{}:{}'.format(host, self.server_address[1])
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.disconnect_rate = disconnect_rate
+        self.rng = random.Random(seed)
+        self.commands = 0
+        self.devices = {}
+        for slot, persona in slots.items():
+            if not isinstance(persona, Persona):
+                persona = PERSONAS[persona]
+            self.devices[str(slot)] = SimulatedDevice(persona, slot, random.Random(self.rng.random()))
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+    def respond(self, line):
+        """
+        Return the full response to one command line and whether to drop the connection.
+        """
+        words = line.split()
+        command, _, slot = words[0].partition(':')
+        if command.upper() in ('ADD', 'DEL'):
+            slot = words[1] if len(words) > 1 else ''
+            command_words = [command]
+        else:
+            command_words = [command] + words[1:]
+        name = ' '.join(command_words)
+
+        with self._lock:
+            self.commands += 1
+            delay = lookup(self.latency, name) + self.rng.uniform(0, lookup(self.jitter, name))
+            fail = self.rng.random() < lookup(self.error_rate, name)
+            disconnect = self.rng.random() < lookup(self.disconnect_rate, name)
+        if delay > 0:
+            time.sleep(delay)
+
+        device = self.devices.get(slot)
+        if device is None:
+            payload = 'Error: No device in slot {}'.format(slot)
+        elif fail:
+            payload = 'Error: Simulated failure of {}'.format(name)
+        elif command.upper() == 'ADD':
+            payload = 'Slot {} added'.format(slot)
+        elif command.upper() == 'DEL':
+            payload = 'Slot {} deleted'.format(slot)
+        else:
+            payload = device.handle(command_words)
+
+        if payload:
+            return '{}\r\nOK\r\n'.format(payload), disconnect
+
+        return 'OK\r\n', disconnect
+
+
+def parse_setting(text):
+    """Parse '0.001' or 'QR=0.01,ETHSPY LINK GET-TTL=0.5,*=0.001' into a lookup() setting."""
+    if '=' not in text:
+        return float(text)
+
+    setting = {}
+    for item in text.split(','):
+        key, _, value = item.partition('=')
+        setting[key.strip().upper() if key.strip() != '*' else '*'] = float(value)
+
+    return setting
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local EthAgent simulator.')
+    parser.add_argument('slots', nargs='+', metavar='SLOT=PERSONA',
+                        help='e.g. 1=Columbiaville, personas: {}'.format(', '.join(sorted(PERSONAS))))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=parse_setting, default=0)
+    parser.add_argument('--jitter', type=parse_setting, default=0)
+    parser.add_argument('--error-rate', type=parse_setting, default=0)
+    parser.add_argument('--disconnect-rate', type=parse_setting, default=0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    slots = dict(slot.split('=', 1) for slot in args.slots)
+    server = EthAgentSimulator(
+        slots, args.host, args.port, args.latency, args.jitter, args.error_rate,
+        args.disconnect_rate, args.seed
+    )
+    print('Simulating EthAgent on {} ({})'.format(
+        server.host_name, ', '.join('{}={}'.format(s, d.persona.name) for s, d in sorted(server.devices.items()))
+    ))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
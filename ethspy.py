@@ -1,62 +1,261 @@
+import codecs
 import socket
 import select
 import time
 import ANIL_Robot_LHC_Auto_Config as test_cofig
 
+END_MSG = b'OK\r\n'
+
 def check_end_msg(msg):
     if msg[-len('OK\r\n'):] == 'OK\r\n':
         return True
     else:
         return False
- 
-def open_port(conn, slot,logger,logger2):
-    conn.sendall('ADD {}\n'.format(slot).encode())
-    if test_cofig.EthAgent_command == 'Enable':
-        #logger.info("EthAgent command = ADD {}".format(slot))
-        logger2.info("EthAgent command = ADD {}".format(slot))
-    logger.info("Initialize Slot {} ...\n".format(slot))
-    msg = ''
-    while check_end_msg(msg) == False:
-        msg += conn.recv(65536).decode()
-    
-    
+
+def find_end_msg(buffer, scan_from=0, more=False):
+    """Find the end of the first complete response in buffer.
+
+    EthAgent ends every response with 'OK\r\n', on its own line or right after the
+    output (e.g. 'valueOK\r\n'), and answers the commands in order. An 'OK\r\n'
+    may also be part of the output, so:
+
+    - the last response expected on the connection ends when everything received
+      so far ends with 'OK\r\n', like check_end_msg();
+    - a response followed by others (more, e.g. in a pipelined burst) ends at the
+      first 'OK\r\n', the bytes after it belong to the next response.
+
+    Returns:
+        tuple: Offset just past the terminator (-1 if incomplete) and the offset to
+            resume scanning from once more bytes arrived.
+    """
+    if more:
+        pos = buffer.find(END_MSG, scan_from)
+        if pos >= 0:
+            return pos + len(END_MSG), 0
+    elif buffer.endswith(END_MSG):
+        return len(buffer), 0
+    return -1, max(0, len(buffer) - len(END_MSG) + 1)
+
+class OutputError(Exception):
+    """Raised by ResponseReader.stream_response() when write() failed.
+
+    The exception of write() (e.g. an OSError of a full disk) is the __cause__, so
+    a local failure is not taken for a broken connection.
+    """
+
+class ResponseTimeout(TimeoutError):
+    """Raised when EthAgent does not finish a response within the recv timeout.
+
+    Attributes:
+        partial (str): The text received before the timeout
+        received (int): Number of bytes received before the timeout
+        elapsed (float): Seconds spent waiting for the response
+    """
+    def __init__(self, timeout, partial, received, elapsed):
+        tail = partial[-200:]
+        super(ResponseTimeout, self).__init__(
+            'No complete EthAgent response after {:.1f}s ({} bytes received, last: {!r})'.format(
+                elapsed, received, tail
+            )
+        )
+        self.timeout = timeout
+        self.partial = partial
+        self.received = received
+        self.elapsed = elapsed
+
+class ResponseReader(object):
+    """Reads 'OK\\r\\n'-terminated EthAgent responses from a socket.
+
+    Received bytes are accumulated in a bytearray and only the newly received bytes
+    (plus the last few of the previous chunk) are scanned for the terminator, so the
+    cost per response stays linear in its size. A response is decoded once it is
+    complete, so multi-byte characters split across recv() calls decode correctly.
+    A response that is not complete timeout seconds after read_response() was called
+    raises ResponseTimeout, however slowly its bytes trickle in.
+
+    The responses are framed by find_end_msg(). more tells whether other responses
+    are expected after the one read, it is a bool or a callable returning one that
+    is called whenever bytes arrived (e.g. when requests are queued meanwhile).
+
+    If a timing dictionary is given, the perf_counter() time of the first received
+    byte is stored under 'first_byte', and the time every response completed and its
+    size in bytes are appended to 'done' and 'sizes'.
+    """
+    def __init__(self, conn, timeout=None, bufsize=65536, timing=None):
+        self.conn = conn
+        self.timeout = timeout
+        self.bufsize = bufsize
+        self.buffer = bytearray()
+        self.scan_from = 0
+        self.timing = timing
+
+    def read_response(self, more=False):
+        """Return the next complete response including its terminator."""
+        start = time.monotonic()
+        try:
+            while True:
+                end, self.scan_from = find_end_msg(self.buffer, self.scan_from, self._more(more))
+                if end >= 0:
+                    frame = bytes(memoryview(self.buffer)[:end])
+                    del self.buffer[:end]
+                    self._done(end)
+                    return frame.decode('utf-8', 'replace')
+                self._receive(start)
+        finally:
+            if self.timeout is not None:
+                self.conn.settimeout(None)
+
+    def stream_response(self, write, more=False):
+        """Pass the next response to write() piece by piece as it arrives.
+
+        Like exec_port(), the terminator and the character before it are left out,
+        so the last few bytes are held back until the terminator was seen. The text
+        is decoded incrementally, so only one received chunk is held in memory.
+
+        Returns:
+            int: Size of the whole response in bytes
+
+        Raises:
+            OutputError: if write() raised, the rest of the response is not read
+        """
+        def output(text):
+            try:
+                write(text)
+            except Exception as err:
+                raise OutputError('writing the response failed: {}'.format(err)) from err
+
+        start = time.monotonic()
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        hold = len(END_MSG) + 1
+        streamed = 0
+        try:
+            while True:
+                end, self.scan_from = find_end_msg(self.buffer, self.scan_from, self._more(more))
+                if end >= 0:
+                    text = decoder.decode(bytes(memoryview(self.buffer)[:max(0, end - hold)]), True)
+                    if text:
+                        output(text)
+                    del self.buffer[:end]
+                    self._done(streamed + end)
+                    return streamed + end
+
+                # The bytes before the tail can not be part of the terminator
+                cut = len(self.buffer) - hold
+                if cut > 0:
+                    text = decoder.decode(bytes(memoryview(self.buffer)[:cut]))
+                    if text:
+                        output(text)
+                    del self.buffer[:cut]
+                    self.scan_from = max(0, self.scan_from - cut)
+                    streamed += cut
+                self._receive(start, streamed)
+        finally:
+            if self.timeout is not None:
+                self.conn.settimeout(None)
+
+    @staticmethod
+    def _more(more):
+        return more() if callable(more) else more
+
+    def _receive(self, start, streamed=0):
+        """Add the next chunk from the socket to the buffer."""
+        try:
+            if self.timeout is not None:
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    raise socket.timeout()
+                self.conn.settimeout(remaining)
+            data = self.conn.recv(self.bufsize)
+        except socket.timeout:
+            raise ResponseTimeout(
+                self.timeout, self.buffer.decode('utf-8', 'replace'),
+                streamed + len(self.buffer), time.monotonic() - start
+            )
+        if not data:
+            raise ConnectionResetError(
+                'EthAgent closed the connection ({} bytes of an unfinished response '
+                'received)'.format(streamed + len(self.buffer))
+            )
+        if self.timing is not None and 'first_byte' not in self.timing:
+            self.timing['first_byte'] = time.perf_counter()
+        self.buffer += data
+
+    def _done(self, size):
+        if self.timing is not None:
+            self.timing.setdefault('done', []).append(time.perf_counter())
+            self.timing.setdefault('sizes', []).append(size)
+
+def _send(conn, data, timing):
+    """Send data, noting the start and end of the send and its size in timing."""
+    if timing is not None:
+        timing['start'] = time.perf_counter()
+        conn.sendall(data)
+        timing['sent'] = time.perf_counter()
+        timing['sent_bytes'] = len(data)
+    else:
+        conn.sendall(data)
+
+def check_slot_response(msg, logger2):
+    """Log the warning or raise the error in the response to an ADD or DEL command."""
     if "warning" in msg.lower():
         #logger.info(msg)
         logger2.info(msg)
     elif 'error' in msg.lower():
         raise Exception(msg)
+
+def _slot_command(conn, command, logger, logger2, timeout=None, timing=None):
+    _send(conn, command.encode(), timing)
+    msg = ResponseReader(conn, timeout, timing=timing).read_response()
+    check_slot_response(msg, logger2)
     return conn
 
-def del_port(conn, slot,logger,logger2):
-    conn.sendall('DEL {}\n'.format(slot).encode())
+def open_port(conn, slot,logger,logger2, timing=None, timeout=None):
+    if test_cofig.EthAgent_command == 'Enable':
+        #logger.info("EthAgent command = ADD {}".format(slot))
+        logger2.info("EthAgent command = ADD {}".format(slot))
+    logger.info("Initialize Slot {} ...\n".format(slot))
+    return _slot_command(conn, 'ADD {}\n'.format(slot), logger, logger2, timeout, timing)
+
+def del_port(conn, slot,logger,logger2, timing=None, timeout=None):
     if test_cofig.EthAgent_command == 'Enable':
         #logger.info("EthAgent command = DEL {}".format(slot))
         logger2.info("EthAgent command = DEL {}".format(slot))
     logger.info("Release Slot {} ...\n".format(slot))
-    msg = ''
-    while check_end_msg(msg) == False:
-        msg += conn.recv(65536).decode()
-    
-    
-    if "warning" in msg.lower():
-        #logger.info(msg)
-        logger2.info(msg)
-    elif 'error' in msg.lower():
-        raise Exception(msg)
-    return conn
-    
+    return _slot_command(conn, 'DEL {}\n'.format(slot), logger, logger2, timeout, timing)
+
 def close_port(conn):
     pass
-    
-def exec_port(conn, cmd):
-    conn.sendall(cmd.encode())
-    msg = ''
-    while check_end_msg(msg) == False:
-        msg += conn.recv(65536).decode()
-        #logger.info('msg:', msg)
-        #logger2.info('msg:', msg)
+
+def send_commands(conn, cmds, timing=None):
+    """Send the command lines cmds as one write."""
+    _send(conn, ''.join(cmds).encode(), timing)
+
+def exec_port_many(conn, cmds, timeout=None, timing=None):
+    """Send cmds as one burst and return their responses.
+
+    timeout is the number of seconds every response may take, or a list with the
+    seconds of each command.
+    """
+    send_commands(conn, cmds, timing)
+    timeouts = timeout if isinstance(timeout, (list, tuple)) else [timeout] * len(cmds)
+    reader = ResponseReader(conn, timing=timing)
+    responses = []
+    for i, cmd_timeout in enumerate(timeouts):
+        reader.timeout = cmd_timeout
+        responses.append(reader.read_response(more=i < len(timeouts) - 1)[:-5])
+    return responses
+
+def exec_port_stream(conn, cmd, write, timeout=None, timing=None):
+    """Send cmd and pass its response to write() as it arrives, see
+    ResponseReader.stream_response(). Returns the size of the response in bytes."""
+    _send(conn, cmd.encode(), timing)
+    return ResponseReader(conn, timeout, timing=timing).stream_response(write)
+
+def exec_port(conn, cmd, timeout=None, timing=None):
+    _send(conn, cmd.encode(), timing)
+    msg = ResponseReader(conn, timeout, timing=timing).read_response()
     msg = msg[:-5]
     return msg
-  
+
 def get_version():
     return "standalone"
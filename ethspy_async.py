@@ -0,0 +1,252 @@
+"""
+asyncio client for EthAgent.
+
+AsyncPort speaks the same line protocol as ethspylib.Port, but its execute(), open()
+and close() are coroutines, so many ports can be driven from a single event loop
+instead of one thread per DUT/LP pair.
+"""
+import asyncio
+
+import ANIL_Robot_LHC_Auto_Config as test_cofig
+import ethspy
+import ethspylib
+
+
+class AsyncPort(object):
+    """
+    asyncio counterpart of ethspylib.Port.
+
+    Each AsyncPort keeps one connection to its EthAgent and serialises the commands
+    sent over it, so it can be shared by several tasks.
+
+    Attributes:
+        host_name (string): EthAgent address as 'ip:port'
+        slot_number (string): slot number on that EthAgent
+    """
+
+    def __init__(self, host_name, slot_number, logger=None, logger2=None, timeout=None):
+        """
+        Constructor for AsyncPort instance.
+
+        Args:
+            host_name (string): EthAgent address as 'ip:port'
+            slot_number (string): slot number on that EthAgent
+            timeout (float): Seconds to wait for a complete response, None uses the
+                ethspylib.command_deadline() of each command
+        """
+        if False == str(slot_number).isdigit():
+            raise ethspylib.EthSpyError('slot_number must be a digit')
+
+        self.host_name = str(host_name)
+        self.slot_number = str(slot_number)
+        self.logger = logger
+        self.logger2 = logger2
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+        self._buffer = bytearray()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_port(cls, port, timeout=None):
+        """
+        Creates an AsyncPort for the same host and slot as an ethspylib.Port.
+        """
+        return cls(port.host_name, port.slot_number, port.logger, port.logger2, timeout)
+
+    async def connect(self):
+        """
+        Opens the connection to EthAgent if it is not open yet.
+        """
+        if self._writer is None or self._writer.is_closing():
+            ip, ip_port = self.host_name.split(':')
+            self._reader, self._writer = await asyncio.open_connection(ip, int(ip_port))
+            self._buffer = bytearray()
+
+    async def open(self):
+        """
+        Adds the slot on EthAgent (async counterpart of Port.open_auto).
+        """
+        response = await self._request(['ADD {}\n'.format(self.slot_number)])
+        self._check_slot_response(response[0])
+
+    async def close(self):
+        """
+        Releases the slot on EthAgent and closes the connection.
+        """
+        try:
+            response = await self._request(['DEL {}\n'.format(self.slot_number)])
+            self._check_slot_response(response[0])
+        finally:
+            await self.disconnect()
+
+    async def disconnect(self):
+        """
+        Closes the connection without releasing the slot.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+            self._writer = None
+            self._reader = None
+
+    async def execute(self, command):
+        """
+        Executes one command. The command must start with the 'hostCommand' word.
+        """
+        responses = await self.execute_many([command])
+        return responses[0]
+
+    async def execute_many(self, commands):
+        """
+        Executes several commands back-to-back and returns their responses in order.
+        """
+        if not commands:
+            return []
+        lines = [ethspylib.command_line(command, self.slot_number) for command in commands]
+        if test_cofig.EthAgent_command == 'Enable' and self.logger2 is not None:
+            for line in lines:
+                self.logger2.info("IP:Port = {}, EthAgent command = {}".format(self.host_name, line))
+        responses = await self._request(lines, commands)
+        return [response[:-5] for response in responses]
+
+    async def _request(self, lines, commands=None):
+        """
+        Sends the lines and returns their responses. The deadlines are looked up by
+        the commands the lines were made of, the lines themselves for ADD/DEL.
+        """
+        deadlines = [
+            self.timeout if self.timeout is not None else ethspylib.command_deadline(command)
+            for command in (commands or lines)
+        ]
+        async with self._lock:
+            await self.connect()
+            responses = []
+            try:
+                self._writer.write(''.join(lines).encode())
+                await self._writer.drain()
+                for i, deadline in enumerate(deadlines):
+                    responses.append(
+                        await self._read_response(deadline, more=i < len(deadlines) - 1)
+                    )
+                return responses
+            except ethspy.ResponseTimeout as err:
+                await self.disconnect()
+                i = len(responses)
+                raise ethspylib.CommandTimeout(
+                    self.host_name, self.slot_number, (commands or lines)[i], deadlines[i],
+                    err.partial
+                ) from err
+            except BaseException:
+                # The stream position is unknown now, start over on the next request
+                await self.disconnect()
+                raise
+
+    async def _read_response(self, timeout, more=False):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        scan_from = 0
+        while True:
+            end, scan_from = ethspy.find_end_msg(self._buffer, scan_from, more)
+            if end >= 0:
+                frame = bytes(self._buffer[:end])
+                del self._buffer[:end]
+                return frame.decode('utf-8', 'replace')
+
+            try:
+                data = await asyncio.wait_for(
+                    self._reader.read(65536), max(0, timeout - (loop.time() - start))
+                )
+            except asyncio.TimeoutError:
+                raise ethspy.ResponseTimeout(
+                    timeout, self._buffer.decode('utf-8', 'replace'),
+                    len(self._buffer), loop.time() - start
+                )
+            if not data:
+                raise ConnectionResetError(
+                    'EthAgent closed the connection ({} bytes of an unfinished response '
+                    'received)'.format(len(self._buffer))
+                )
+            self._buffer += data
+
+    def _check_slot_response(self, msg):
+        if 'warning' in msg.lower():
+            if self.logger2 is not None:
+                self.logger2.info(msg)
+        elif 'error' in msg.lower():
+            raise ethspylib.EthSpyError(msg)
+
+
+async def fetch_responses(device, aport, calls):
+    """
+    Executes the commands sent by a set of device queries as one burst on aport.
+
+    The queries are first run against the device's Port in recording mode to learn
+    which commands they send. The result can be passed to Port.serve_responses() so
+    the same queries then run without blocking on the network, keeping all response
+    parsing in the device classes. A query that fails on the empty responses of the
+    recording before it issued all its commands fails again when it is served.
+
+    Args:
+        device (obj): A device object (LegacyCommands subclass).
+        aport (AsyncPort): The asyncio port for the same slot.
+        calls (list): (method, args) tuples of bound device query methods.
+
+    Returns:
+        tuple: The list of commands and the list of their responses.
+    """
+    with device.port.record_commands() as commands:
+        for method, args in calls:
+            try:
+                method(*args)
+            except (ValueError, KeyError, IndexError, TypeError) as err:
+                # Parsing the empty responses of the recording may fail, the
+                # commands sent after that are then not fetched
+                device.port.logger.debug(
+                    'Recording the commands of %s%s stopped: %r', method.__name__, args, err
+                )
+
+    commands = list(dict.fromkeys(commands))
+    return commands, await aport.execute_many(commands)
+
+
+async def call_device(device, aport, method, *args):
+    """
+    Runs one device query method with its EthAgent traffic going over aport.
+
+    Args:
+        device (obj): A device object (LegacyCommands subclass).
+        aport (AsyncPort): The asyncio port for the same slot.
+        method (callable): A bound query method of device, e.g. device.ethspy_link_get_stats.
+
+    Returns:
+        The return value of method.
+    """
+    commands, responses = await fetch_responses(device, aport, [(method, args)])
+    with device.port.serve_responses(commands, responses):
+        return method(*args)
+
+
+async def wait_until(condition, timeout, interval=0.1, backoff=2.0, max_interval=2.0):
+    """
+    asyncio variant of ethspylib.wait_until(), condition is a coroutine function.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    result = None
+    pause = interval
+    while True:
+        if condition is not None:
+            result = await condition()
+            if result:
+                break
+        remaining = timeout - (loop.time() - start)
+        if remaining <= 0:
+            break
+        await asyncio.sleep(remaining if condition is None else min(pause, remaining))
+        pause = min(pause * backoff, max_interval)
+
+    return result, loop.time() - start
@@ -3,10 +3,20 @@ This module is an object-oriented wrapper around ethspy module, provided by EthP
 It provides the same functionality whether it uses the ethspy.py or the ethpy.cpp module 
 """
 import sys
+import gzip
+import json
+import re
+import select
 import socket
+import threading
+import time
 import ANIL_Robot_LHC_Auto_Config as test_cofig
 import ethspy
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
 from time import sleep
+from common.stats import Histogram
 default_conn_obj = None
 using_python_lib = False
 MESSAGE_BOX_CRITICAL = "CRITICAL"
@@ -38,6 +48,875 @@ class EthSpyError(Exception):
         """
         return self.message
 
+class CommandTimeout(EthSpyError):
+    """
+    Raised when EthAgent does not complete the response to a command within its
+    deadline, see command_deadline(). The connection is dropped, so the port can be
+    given up while the other ports carry on.
+
+    Attributes:
+        host_name (string): 'ip:port' of the EthAgent
+        slot_number (string): Slot the command was sent to
+        command (string): The command that timed out
+        deadline (float): Seconds the response was allowed to take
+        partial (string): The text received before the deadline
+    """
+    def __init__(self, host_name, slot_number, command, deadline, partial=''):
+        super(CommandTimeout, self).__init__(
+            '{} timed out after {:g}s on {} slot {} (last received: {!r})'.format(
+                command_type(command), deadline, host_name, slot_number, partial[-200:]
+            )
+        )
+        self.host_name = host_name
+        self.slot_number = slot_number
+        self.command = command
+        self.deadline = deadline
+        self.partial = partial
+
+class CommandCancelled(EthSpyError):
+    """
+    Raised by the commands of a Port after Port.cancel() was called.
+    """
+
+class ConnectionPool(object):
+    """
+    Keeps EthAgent sockets open across commands, keyed by the 'ip:port' host name.
+
+    A connection is leased to one caller at a time, so parallel DUT/LP threads never
+    interleave commands on the same socket. Idle sockets are checked before they are
+    handed out again and are replaced transparently if the agent closed them.
+
+    Attributes:
+        max_idle (int): Number of idle sockets kept per host, extra sockets are closed
+        connect_timeout (float): Timeout in seconds for establishing a new connection
+    """
+
+    def __init__(self, max_idle=4, connect_timeout=10.0):
+        """
+        Constructor for ConnectionPool instance.
+
+        Args:
+            max_idle (int): Number of idle sockets kept per host
+            connect_timeout (float): Timeout in seconds for establishing a new connection
+        """
+        self.max_idle = max_idle
+        self.connect_timeout = connect_timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def connect(host_name, timeout=None):
+        """
+        Opens a new socket to the EthAgent listening on host_name ('ip:port').
+        """
+        remote_ip_port = host_name.split(":")
+        conn = socket.create_connection((remote_ip_port[0], int(remote_ip_port[1])), timeout)
+        conn.settimeout(None)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return conn
+
+    @staticmethod
+    def is_alive(conn):
+        """
+        Returns False if the peer closed the socket or left unread bytes on it.
+
+        An idle EthAgent connection must never be readable: either the agent closed it
+        (recv returns b'') or a previous response was not fully consumed, in which case
+        the stream is out of sync and the socket cannot be reused.
+        """
+        try:
+            readable, _, _ = select.select([conn], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def acquire(self, host_name, timing=None):
+        """
+        Leases a live connection to host_name, opening a new one if none is idle.
+
+        If a new connection is opened and timing is given, the seconds it took are
+        stored in timing['connect'].
+        """
+        while True:
+            with self._lock:
+                idle = self._idle.get(host_name)
+                conn = idle.pop() if idle else None
+            if conn is None:
+                started = time.perf_counter()
+                conn = self.connect(host_name, self.connect_timeout)
+                if timing is not None:
+                    timing['connect'] = time.perf_counter() - started
+                return conn
+            if self.is_alive(conn):
+                return conn
+            self._close(conn)
+
+    def release(self, host_name, conn, discard=False):
+        """
+        Returns a leased connection to the pool, or closes it if discard is True.
+        """
+        if not discard:
+            with self._lock:
+                idle = self._idle.setdefault(host_name, [])
+                if len(idle) < self.max_idle:
+                    idle.append(conn)
+                    return
+        self._close(conn)
+
+    @contextmanager
+    def lease(self, host_name, timing=None):
+        """
+        Context manager around acquire/release. The connection is discarded if the
+        body raises, since the stream position is then unknown.
+        """
+        conn = self.acquire(host_name, timing)
+        try:
+            yield conn
+        except BaseException:
+            self.release(host_name, conn, discard=True)
+            raise
+        self.release(host_name, conn)
+
+    def close_all(self, host_name=None):
+        """
+        Closes every idle connection, or only those of host_name if given.
+        """
+        with self._lock:
+            if host_name is None:
+                conns = [c for idle in self._idle.values() for c in idle]
+                self._idle.clear()
+            else:
+                conns = self._idle.pop(host_name, [])
+        for conn in conns:
+            self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+
+connection_pool = ConnectionPool()
+
+
+class _PendingRequest(object):
+    """Command lines sent on a SlotMultiplexer connection, waiting for their responses."""
+
+    def __init__(self, count, timing, timeouts):
+        self.count = count
+        self.timing = timing
+        self.timeouts = timeouts
+        self.responses = []
+        self.error = None
+        # True if the request can be sent again, see SlotMultiplexer._drop()
+        self.retryable = False
+        self.done = threading.Event()
+
+    def fail(self, error, retryable=False):
+        """Wakes the waiting caller with error, unless it was answered already."""
+        if not self.done.is_set():
+            self.error = error
+            self.retryable = retryable
+            self.done.set()
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.responses
+
+
+class SlotMultiplexer(object):
+    """
+    Drives every slot of one EthAgent over a single connection.
+
+    Each slot is ADDed once on the connection. The requests of all slots are written
+    to the socket in the order they are submitted and queued; one reader thread reads
+    the 'OK\\r\\n'-terminated responses, which EthAgent returns in request order, and
+    hands each to the request at the head of the queue. The command lines already
+    carry the slot ('ETHSPY:<slot> ...'), so no other routing is needed.
+
+    If the connection breaks, the queued requests fail with a ConnectionResetError and
+    the next request opens a new connection and ADDs the slots on it again. A response
+    that misses its timeout stalls every slot behind it, so the connection is dropped
+    too: the late request fails with ethspy.ResponseTimeout, the others are reset.
+    The slow command types of EthAgent_multiplex_exclude (TTL, EHM, ...) are
+    therefore sent over pooled connections by Port, see multiplexed().
+
+    Attributes:
+        host_name (str): 'ip:port' of the EthAgent
+        connect_timeout (float): Timeout in seconds for establishing the connection
+    """
+
+    def __init__(self, host_name, connect_timeout=10.0):
+        self.host_name = host_name
+        self.connect_timeout = connect_timeout
+        self._slots = {}
+        self._conn = None
+        self._pending = deque()
+        self._send_lock = threading.RLock()
+        self._ready = threading.Condition()
+
+    @property
+    def slots(self):
+        """The slots ADDed on this EthAgent."""
+        return list(self._slots)
+
+    def add(self, slot_number, logger, logger2, timing=None):
+        """
+        Sends ADD for slot_number unless it was added before. Returns True if sent.
+        """
+        slot_number = str(slot_number)
+        with self._send_lock:
+            if slot_number in self._slots:
+                return False
+            if test_cofig.EthAgent_command == 'Enable':
+                logger2.info("EthAgent command = ADD {}".format(slot_number))
+            logger.info("Initialize Slot {} ...\n".format(slot_number))
+            line = 'ADD {}\n'.format(slot_number)
+            request = self._submit([line], timing, [command_deadline(line)])
+            self._slots[slot_number] = (logger, logger2)
+        try:
+            ethspy.check_slot_response(request.wait()[0], logger2)
+        except Exception:
+            with self._send_lock:
+                self._slots.pop(slot_number, None)
+            raise
+        return True
+
+    def remove(self, slot_number, logger, logger2, timing=None):
+        """
+        Sends DEL for slot_number if it was added. The connection is closed once no
+        slot is left. Returns True if sent.
+        """
+        slot_number = str(slot_number)
+        with self._send_lock:
+            if self._slots.pop(slot_number, None) is None or self._conn is None:
+                # A slot is only added on a connection by its next request
+                return False
+            if test_cofig.EthAgent_command == 'Enable':
+                logger2.info("EthAgent command = DEL {}".format(slot_number))
+            logger.info("Release Slot {} ...\n".format(slot_number))
+            line = 'DEL {}\n'.format(slot_number)
+            request = self._submit([line], timing, [command_deadline(line)])
+        ethspy.check_slot_response(request.wait()[0], logger2)
+        with self._send_lock:
+            if not self._slots:
+                self.close()
+        return True
+
+    def request(self, lines, timing=None, timeouts=None):
+        """
+        Sends the command lines and returns their responses, including the
+        terminators. Blocks until every response was read.
+
+        With a timing dictionary, the send, first byte and response times are stored
+        in it like by the ethspy functions, and the connect time if it was opened.
+        timeouts are the seconds each response may take once the reader got to it.
+        """
+        return self.submit(lines, timing, timeouts).wait()
+
+    def submit(self, lines, timing=None, timeouts=None):
+        """
+        Like request(), but returns the queued request at once. Its wait() returns
+        the responses, fail() gives up waiting for them.
+        """
+        with self._send_lock:
+            return self._submit(lines, timing, timeouts)
+
+    def close(self):
+        """
+        Closes the connection after the queued requests are answered. The slots are
+        ADDed again by the next request.
+        """
+        with self._ready:
+            conn = self._conn
+            pending = list(self._pending)
+        for request in pending:
+            request.done.wait()
+        if conn is not None:
+            self._drop(conn, 'connection to EthAgent {} closed'.format(self.host_name))
+
+    def _submit(self, lines, timing, timeouts=None):
+        """
+        Queues and sends a request, the caller holds the send lock. The reader thread
+        only takes the queue lock, so it keeps reading while a long request is sent.
+        """
+        with self._ready:
+            conn = self._conn
+        if conn is None:
+            conn = self._connect(timing)
+        request = _PendingRequest(len(lines), timing, timeouts or [None] * len(lines))
+        with self._ready:
+            if self._conn is not conn:
+                # Dropped since, the request was not sent on it
+                request.fail(ConnectionResetError(
+                    'lost connection to EthAgent {}'.format(self.host_name)
+                ), True)
+                return request
+            self._pending.append(request)
+            self._ready.notify_all()
+        try:
+            ethspy.send_commands(conn, lines, timing)
+        except OSError as err:
+            self._drop(conn, err, received=True, unsent=request)
+        return request
+
+    def _connect(self, timing):
+        """
+        Opens the connection, ADDs the known slots and starts the reader. The caller
+        holds the send lock, but not the queue lock: the ADDs may take a while.
+        """
+        started = time.perf_counter()
+        conn = ConnectionPool.connect(self.host_name, self.connect_timeout)
+        if timing is not None:
+            timing['connect'] = time.perf_counter() - started
+        try:
+            for slot_number, (logger, logger2) in self._slots.items():
+                ethspy.open_port(
+                    conn, slot_number, logger, logger2,
+                    timeout=command_deadline('ADD {}'.format(slot_number))
+                )
+        except BaseException:
+            ConnectionPool._close(conn)
+            raise
+        with self._ready:
+            self._conn = conn
+        threading.Thread(
+            target=self._read, args=(conn,), daemon=True,
+            name='ethagent-{}'.format(self.host_name)
+        ).start()
+        return conn
+
+    def _read(self, conn):
+        reader = ethspy.ResponseReader(conn)
+        received = False
+        try:
+            while True:
+                with self._ready:
+                    while self._conn is conn and not self._pending:
+                        self._ready.wait()
+                    if self._conn is not conn:
+                        return
+                    request = self._pending[0]
+                reader.timing = request.timing
+                reader.timeout = request.timeouts[len(request.responses)]
+                # Other responses follow if the request has more commands or more
+                # requests were queued, also while this response is read
+                response = reader.read_response(
+                    more=lambda: len(request.responses) + 1 < request.count or len(self._pending) > 1
+                )
+                received = True
+                with self._ready:
+                    if self._conn is not conn:
+                        return
+                    request.responses.append(response)
+                    if len(request.responses) == request.count:
+                        self._pending.popleft()
+                        request.done.set()
+        except Exception as err:
+            self._drop(conn, err, received=received or bool(reader.buffer))
+
+    def _drop(self, conn, err, received=True, unsent=None):
+        """Closes conn and fails the requests waiting on it.
+
+        The request whose send failed (unsent) may be sent again on a new
+        connection, the other requests only if conn was stale, i.e. nothing was
+        received on it. Otherwise the agent may have run them already.
+        """
+        with self._ready:
+            if self._conn is not conn:
+                return
+            self._conn = None
+            pending, self._pending = self._pending, deque()
+            self._ready.notify_all()
+        ConnectionPool._close(conn)
+        message = 'lost connection to EthAgent {}: {}'.format(self.host_name, err)
+        for i, request in enumerate(pending):
+            if i == 0 and isinstance(err, ethspy.ResponseTimeout):
+                request.fail(err)
+            else:
+                request.fail(
+                    ConnectionResetError(message), not received or request is unsent
+                )
+
+
+_multiplexers = {}
+_multiplexers_lock = threading.Lock()
+
+
+def agent_host(host_name):
+    """
+    Returns the 'ip:port' of the EthAgent that serves host_name. In the 'Multiplex'
+    transport, EthAgent_multiplex_agents may route all hosts of an IP to one agent.
+    """
+    ip = host_name.split(':')[0]
+    return test_cofig.EthAgent_multiplex_agents.get(ip, host_name)
+
+
+def multiplexer(host_name):
+    """Returns the SlotMultiplexer shared by every Port of the agent of host_name."""
+    agent = agent_host(host_name)
+    with _multiplexers_lock:
+        mux = _multiplexers.get(agent)
+        if mux is None:
+            mux = _multiplexers[agent] = SlotMultiplexer(agent, connection_pool.connect_timeout)
+        return mux
+
+
+def close_multiplexers():
+    """Closes the connections of every SlotMultiplexer."""
+    with _multiplexers_lock:
+        muxes = list(_multiplexers.values())
+    for mux in muxes:
+        mux.close()
+
+
+class Clock(object):
+    """
+    Time source for the waits between EthAgent commands.
+
+    Code that waits for a device (LHC, the device classes) uses clock.time() and
+    clock.sleep() instead of the time module, so a replayed run can skip the waits.
+    """
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        sleep(seconds)
+
+
+class ReplayClock(Clock):
+    """
+    Virtual clock of a fast replay. sleep() returns at once and time() advances by
+    the time slept and to the recorded time of every replayed response.
+    """
+
+    def __init__(self):
+        self.start = time.time()
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def time(self):
+        return self.start + self.elapsed
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.elapsed += max(seconds, 0)
+
+    def advance_to(self, offset):
+        """Moves the clock to offset seconds after the start, if it is not past it."""
+        with self._lock:
+            self.elapsed = max(self.elapsed, offset)
+
+
+class Settled(object):
+    """
+    wait_until() condition that holds once a polled value kept the same value for
+    window seconds, e.g. a packet counter after its transmitter was stopped.
+
+    Attributes:
+        value: The last value read
+    """
+
+    def __init__(self, read=None, window=1.0):
+        """
+        Args:
+            read (callable): Returns the value to watch, for calling the Settled
+            window (float): Seconds the value must not change
+        """
+        self.read = read
+        self.window = window
+        self.value = None
+        self._since = None
+
+    def __call__(self):
+        return self.observe(self.read())
+
+    def observe(self, value):
+        """
+        Takes the next value and returns True if it did not change for window seconds.
+        """
+        now = clock.time()
+        if self._since is None or value != self.value:
+            self.value = value
+            self._since = now
+        return now - self._since >= self.window
+
+
+def wait_until(condition, timeout, interval=0.1, backoff=2.0, max_interval=2.0):
+    """
+    Polls condition() until it returns a true value or timeout seconds passed.
+
+    The pause between two polls starts at interval and grows by backoff up to
+    max_interval, so a state that is reached at once costs one poll and a slow
+    one costs few. Without a condition (None) the whole timeout is waited.
+    Waits on clock, so a replayed run skips them.
+
+    Returns:
+        tuple: The last result of condition() (None without one) and the seconds
+            waited
+    """
+    start = clock.time()
+    result = None
+    pause = interval
+    while True:
+        if condition is not None:
+            result = condition()
+            if result:
+                break
+        remaining = timeout - (clock.time() - start)
+        if remaining <= 0:
+            break
+        clock.sleep(remaining if condition is None else min(pause, remaining))
+        pause = min(pause * backoff, max_interval)
+
+    return result, clock.time() - start
+
+
+class CommandLog(object):
+    """
+    Records the commands sent by every Port and their responses.
+
+    The log is a gzip compressed file with one JSON array per line. The first line
+    holds the log version, the start time and the meta information passed in, every
+    other line one command:
+    [seconds since start, seconds until the response, host name, slot, command, response]
+
+    Attributes:
+        path (string): The log file
+    """
+
+    VERSION = 1
+
+    def __init__(self, path, meta=None):
+        self.path = path
+        self.start = time.time()
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._write(['ETHAGENT-LOG', self.VERSION, self.start, meta or {}])
+
+    def record(self, host_name, slot_number, commands, responses, started, elapsed):
+        """
+        Adds commands sent together at started (epoch seconds) and answered after
+        elapsed seconds.
+        """
+        offset = round(started - self.start, 6)
+        elapsed = round(elapsed, 6)
+        with self._lock:
+            for command, response in zip(commands, responses):
+                self._write([offset, elapsed, host_name, slot_number, command, response])
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+
+class CommandReplay(object):
+    """
+    Serves the responses of a CommandLog to Ports instead of sending the commands.
+
+    The responses to each command of each slot are served in the recorded order.
+
+    Attributes:
+        meta (dict): The meta information of the log
+        realtime (bool): Serve every response no earlier than it was received in the
+            recorded run, instead of at full speed
+        clock (Clock): The clock to use while replaying
+    """
+
+    def __init__(self, path, realtime=False):
+        self.realtime = realtime
+        self.clock = Clock() if realtime else ReplayClock()
+        self.start = time.time()
+        self._responses = {}
+        self._lock = threading.Lock()
+
+        with gzip.open(path, 'rt', encoding='utf-8') as log:
+            header = json.loads(log.readline())
+            if header[0] != 'ETHAGENT-LOG' or header[1] > CommandLog.VERSION:
+                raise EthSpyError('{} is not a supported EthAgent command log'.format(path))
+            self.meta = header[3]
+            for line in log:
+                offset, elapsed, host_name, slot_number, command, response = json.loads(line)
+                self._responses.setdefault(
+                    (host_name, slot_number, command), deque()
+                ).append((offset + elapsed, response))
+
+    def response(self, host_name, slot_number, command):
+        """
+        Returns the next recorded response of command on host_name/slot_number.
+
+        Raises:
+            EthSpyError: if the recorded run did not send the command (again)
+        """
+        with self._lock:
+            responses = self._responses.get((host_name, slot_number, command))
+            if not responses:
+                raise EthSpyError(
+                    'no recorded response left for {!r} on {} slot {}'.format(
+                        command, host_name, slot_number
+                    )
+                )
+            received, response = responses.popleft()
+
+        if self.realtime:
+            wait = self.start + received - time.time()
+            if wait > 0:
+                sleep(wait)
+        else:
+            self.clock.advance_to(received)
+
+        return response
+
+    def remaining(self):
+        """Returns the number of recorded responses that were not served."""
+        with self._lock:
+            return sum(len(responses) for responses in self._responses.values())
+
+
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+COMMAND_PHASES = ('CONNECT', 'SEND', 'FIRST-BYTE', 'COMPLETE')
+_COMMAND_WORD = re.compile(r'[A-Z][A-Z_-]*$')
+_TIME_ARGUMENT = re.compile(r'\sT:(\d+)\b')
+
+
+def command_type(command):
+    """
+    Returns the command without its arguments, e.g. 'ETHSPY RX GET-STATUS' for
+    'hostCommand ETHSPY RX GET-STATUS PHY:CVL SIDE:LINE L:0' or 'ADD' for 'ADD 1'.
+    """
+    words = command.split()
+    if words and words[0].lower() == 'hostcommand':
+        words = words[1:]
+    if not words:
+        return command.strip()
+
+    kind = [words[0]]
+    for word in words[1:3]:
+        if not _COMMAND_WORD.match(word):
+            break
+        kind.append(word)
+    return ' '.join(kind)
+
+
+def multiplexed(command):
+    """
+    Returns False if command is sent over a pooled connection of its own in the
+    'Multiplex' transport, i.e. its command_type() or a prefix of it is in
+    EthAgent_multiplex_exclude.
+    """
+    words = command_type(command).split()
+    excluded = test_cofig.EthAgent_multiplex_exclude
+    return not any(' '.join(words[:size]) in excluded for size in range(1, len(words) + 1))
+
+
+def command_deadline(command):
+    """
+    Returns the seconds EthAgent may take to complete the response to command.
+
+    The deadline is the EthAgent_deadlines entry of the command_type() of command, of
+    the longest shorter prefix of it ('ETHSPY RX' for 'ETHSPY RX GET-EHM') or else
+    'DEFAULT'. The time the command itself is told to wait, its T:<ms> argument
+    (e.g. GET-TTL T:60000), is added.
+    """
+    deadlines = test_cofig.EthAgent_deadlines
+    words = command_type(command).split()
+    while words and ' '.join(words) not in deadlines:
+        words.pop()
+    deadline = deadlines[' '.join(words)] if words else deadlines['DEFAULT']
+    wait = _TIME_ARGUMENT.search(command)
+    if wait:
+        deadline += int(wait.group(1)) / 1000.0
+    return deadline
+
+
+class LatencyHistogram(Histogram):
+    """
+    Histogram of durations in seconds over the LATENCY_BUCKETS_MS buckets. The last
+    bucket counts the durations above the largest bound.
+    """
+    __slots__ = ('seconds', 'high')
+
+    def __init__(self):
+        super(LatencyHistogram, self).__init__(
+            len(LATENCY_BUCKETS_MS) + 1, lambda ms: bisect_left(LATENCY_BUCKETS_MS, ms)
+        )
+        self.seconds = 0.0
+        self.high = 0.0
+
+    def push(self, seconds):
+        self.seconds += seconds
+        self.high = max(self.high, seconds)
+        super(LatencyHistogram, self).push(seconds * 1000)
+
+    def percentile(self, p):
+        """Returns the upper bound in ms of the bucket holding percentile p."""
+        rank = max(1, p * self.total / 100.0)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                break
+        if index == len(LATENCY_BUCKETS_MS):
+            return round(self.high * 1000, 3)
+        return min(LATENCY_BUCKETS_MS[index], round(self.high * 1000, 3))
+
+    def summary(self):
+        if not self.total:
+            return {'COUNT': 0}
+        return {
+            'COUNT': self.total,
+            'MEAN(ms)': round(self.seconds * 1000 / self.total, 3),
+            'MAX(ms)': round(self.high * 1000, 3),
+            'P50(ms)': self.percentile(50),
+            'P95(ms)': self.percentile(95),
+            'P99(ms)': self.percentile(99),
+            'HISTOGRAM': list(self.counts)
+        }
+
+
+class CommandMetrics(object):
+    """
+    Latency, payload size, retry and failure counts of the commands sent by every
+    Port, per host name, slot and command_type().
+
+    The latency of a command is split in the phases of COMMAND_PHASES: opening a new
+    connection, sending the request, waiting for the first byte of the response and
+    the whole round trip from the start of the send to the end of the response.
+    Commands sent as one pipelined burst share the send and first byte of the burst,
+    their COMPLETE time is the time since the previous response of the burst.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def record(self, host_name, slot_number, commands, lines, timing):
+        """
+        Adds commands sent as the lines, with the perf_counter() times collected in
+        timing by ConnectionPool.acquire() and the ethspy send/receive functions.
+        """
+        done = timing.get('done', [])
+        sizes = timing.get('sizes', [])
+        with self._lock:
+            previous = timing['start']
+            for i, (command, line, end, size) in enumerate(zip(commands, lines, done, sizes)):
+                entry = self._entry(host_name, slot_number, command)
+                entry['COUNT'] += 1
+                entry['BYTES-SENT'] += len(line)
+                entry['BYTES-RECEIVED'] += size
+                if i == 0:
+                    if 'connect' in timing:
+                        entry['CONNECT'].push(timing['connect'])
+                    entry['SEND'].push(timing['sent'] - timing['start'])
+                    if 'first_byte' in timing:
+                        entry['FIRST-BYTE'].push(timing['first_byte'] - timing['sent'])
+                entry['COMPLETE'].push(end - previous)
+                previous = end
+
+    def retried(self, host_name, slot_number, commands):
+        """Counts a burst that is sent again after its connection broke."""
+        with self._lock:
+            for command in commands:
+                self._entry(host_name, slot_number, command)['RETRIES'] += 1
+
+    def failed(self, host_name, slot_number, commands):
+        """Counts a burst that timed out or could not be sent."""
+        with self._lock:
+            for command in commands:
+                self._entry(host_name, slot_number, command)['FAILURES'] += 1
+
+    def reset(self, host_name=None, slot_number=None):
+        """Forgets the metrics of host_name/slot_number, or all of them."""
+        with self._lock:
+            if host_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop((str(host_name), str(slot_number)), None)
+
+    def summary(self, host_name, slot_number):
+        """
+        Returns the metrics of every command type sent to host_name/slot_number, the
+        types with the largest total time first. TIME(s) is the time spent connecting
+        and waiting for the responses.
+        """
+        with self._lock:
+            entries = dict(self._entries.get((str(host_name), str(slot_number)), {}))
+            output = {}
+            for kind, entry in entries.items():
+                output[kind] = {
+                    'COUNT': entry['COUNT'],
+                    'RETRIES': entry['RETRIES'],
+                    'FAILURES': entry['FAILURES'],
+                    'BYTES-SENT': entry['BYTES-SENT'],
+                    'BYTES-RECEIVED': entry['BYTES-RECEIVED'],
+                    'TIME(s)': round(entry['CONNECT'].seconds + entry['COMPLETE'].seconds, 6)
+                }
+                for phase in COMMAND_PHASES:
+                    output[kind][phase] = entry[phase].summary()
+
+        return dict(sorted(output.items(), key=lambda item: -item[1]['TIME(s)']))
+
+    def _entry(self, host_name, slot_number, command):
+        slot = self._entries.setdefault((str(host_name), str(slot_number)), {})
+        kind = command_type(command)
+        entry = slot.get(kind)
+        if entry is None:
+            entry = slot[kind] = {
+                'COUNT': 0, 'RETRIES': 0, 'FAILURES': 0, 'BYTES-SENT': 0, 'BYTES-RECEIVED': 0
+            }
+            for phase in COMMAND_PHASES:
+                entry[phase] = LatencyHistogram()
+        return entry
+
+
+clock = Clock()
+recorder = None
+replay = None
+metrics = CommandMetrics()
+
+
+def start_recording(path, meta=None):
+    """
+    Records every command sent by a Port from now on to path, see CommandLog.
+    """
+    global recorder
+    stop_recording()
+    recorder = CommandLog(path, meta)
+    return recorder
+
+
+def stop_recording():
+    global recorder
+    if recorder is not None:
+        recorder.close()
+        recorder = None
+
+
+def start_replay(path, realtime=False):
+    """
+    Answers every command sent by a Port from now on from the log at path instead of
+    EthAgent, see CommandReplay. At full speed the waits on clock are skipped.
+    """
+    global replay, clock
+    replay = CommandReplay(path, realtime)
+    clock = replay.clock
+    return replay
+
+
+def stop_replay():
+    global replay, clock
+    replay = None
+    clock = Clock()
+
+
 class Port(object):
     """
     This class implements Port as a device type.
@@ -45,6 +924,12 @@ class Port(object):
     Attributes:
         host_name (string): host name as specified in Intel Ethernet Inspector's device tree
         slot_number (string): slot number for the selected host name in Intel Ethernet Inspector's device tree
+        identity (dict): Static device information (INFOLIST, MAC address, versions) found
+            when the device was identified, None until then
+        static_info (dict): Responses of the static commands sent with execute_static()
+        static_epoch (int): Number of times the static information was invalidated
+        multiplexer (SlotMultiplexer): The connection shared with the other slots of the
+            agent in the 'Multiplex' EthAgent_transport, None for pooled connections
     """
 
     def __init__(self, host_name, slot_number, logger,logger2):
@@ -64,6 +949,17 @@ class Port(object):
         self.host_name = str(host_name)
         self.slot_number = str(slot_number)
         self.port_id = None
+        self.identity = None
+        self.static_info = {}
+        self.static_epoch = 0
+        self._prefetched = {}
+        self._serving = False
+        self._recorded = None
+        self._cancelled = threading.Event()
+        self._aborts = set()
+        self.multiplexer = None
+        if test_cofig.EthAgent_transport == 'Multiplex':
+            self.multiplexer = multiplexer(self.host_name)
         
         if using_python_lib:
             self.conn = None
@@ -71,26 +967,53 @@ class Port(object):
             self.conn = default_conn_obj[host_name]
 
     def open_auto(self):
-        remote_ip_port =self.host_name.split(":")
-        ip = remote_ip_port[0]
-        ip_port = int(remote_ip_port[1])
-        self.conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        addr= (ip,ip_port)
-        self.conn.connect(addr)
-        self.logger.info("Successfully connected to EthAgent, IP:Port = {}".format(self.host_name))
-        self.port_id = ethspy.open_port(self.conn, self.slot_number,self.logger,self.logger2)
-        self.conn.close()
+        if replay is not None:
+            self.port_id = self.slot_number
+            return
+        line = 'ADD {}\n'.format(self.slot_number)
+        timing = {}
+        if self.multiplexer is not None:
+            self._slot_multiplexed(self.multiplexer.add, line, timing)
+            self.port_id = self.slot_number
+            return
+        try:
+            with connection_pool.lease(self.host_name, timing) as conn:
+                self.logger.info("Successfully connected to EthAgent, IP:Port = {}".format(self.host_name))
+                self.port_id = ethspy.open_port(
+                    conn, self.slot_number,self.logger,self.logger2, timing=timing,
+                    timeout=command_deadline(line)
+                )
+        except ethspy.ResponseTimeout as err:
+            metrics.failed(self.host_name, self.slot_number, [line])
+            raise self._command_timeout([line], [command_deadline(line)], {}, err) from err
+        except Exception:
+            metrics.failed(self.host_name, self.slot_number, [line])
+            raise
+        metrics.record(self.host_name, self.slot_number, [line], [line], timing)
 
     def close_auto(self):
-        remote_ip_port =self.host_name.split(":")
-        ip = remote_ip_port[0]
-        ip_port = int(remote_ip_port[1])
-        self.conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        addr= (ip,ip_port)
-        self.conn.connect(addr)
-        self.logger.info("Successfully connected to EthAgent, IP:Port = {}".format(self.host_name))
-        self.port_id = ethspy.del_port(self.conn, self.slot_number,self.logger,self.logger2)
-        self.conn.close()
+        if replay is not None:
+            return
+        line = 'DEL {}\n'.format(self.slot_number)
+        timing = {}
+        if self.multiplexer is not None:
+            self._slot_multiplexed(self.multiplexer.remove, line, timing)
+            self.port_id = None
+            return
+        try:
+            with connection_pool.lease(self.host_name, timing) as conn:
+                self.logger.info("Successfully connected to EthAgent, IP:Port = {}".format(self.host_name))
+                self.port_id = ethspy.del_port(
+                    conn, self.slot_number,self.logger,self.logger2, timing=timing,
+                    timeout=command_deadline(line)
+                )
+        except ethspy.ResponseTimeout as err:
+            metrics.failed(self.host_name, self.slot_number, [line])
+            raise self._command_timeout([line], [command_deadline(line)], {}, err) from err
+        except Exception:
+            metrics.failed(self.host_name, self.slot_number, [line])
+            raise
+        metrics.record(self.host_name, self.slot_number, [line], [line], timing)
 
     def open(self):
         """
@@ -112,12 +1035,6 @@ class Port(object):
         Args:
             command (string): command to be executed on the port, must start with hostCommand
         """
-        remote_ip_port =self.host_name.split(":")
-        ip = remote_ip_port[0]
-        ip_port = int(remote_ip_port[1])
-        self.conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        addr= (ip,ip_port)
-        self.conn.connect(addr)
         if using_python_lib:
             if None == self.conn:
                 raise EthSpyError('port is not open, please open it again using Port.open()')
@@ -148,28 +1065,339 @@ class Port(object):
             if None == self.port_id:
                 raise EthSpyError('port is not open, please open it again using Port.open()')
 
-            cmds = command.split(" ")
-            if command[:len('hostCommand')].lower() == 'hostcommand':
-                if len(cmds) < 2:
-                    raise Exception("Error: hostCommand needs at least one parameter")
-                lstr_temp_list = ["hostCommand"]
-                cmds = cmds[1:]
-                cmds[0] = cmds[0] + ':' + str(self.slot_number)
-                lstr_temp_list.append(' '.join(cmds))
-                cmds = lstr_temp_list
-            else:
-                 if len(cmds) > 1:
-                     lstr_temp_list = [cmds[0]]
-                     cmds = cmds[1:]
-                     lstr_temp_list.append(' '.join(cmds))
-                     cmds = lstr_temp_list
-                 cmds.insert(1, str(self.slot_number))
-            
-            cmds[1] = cmds[1] + '\n'
+            if self._recorded is not None:
+                self._recorded.append(command)
+                return ''
+            if command in self._prefetched:
+                return self._prefetched[command]
+            if self._serving:
+                raise EthSpyError('no response was fetched for {}'.format(command))
+
+            line = self._command_line(command)
             if test_cofig.EthAgent_command == 'Enable':
-                #self.logger.info("IP:Port = {}:{}, EthAgent command = {}".format(ip,ip_port,cmds[1]))
-                self.logger2.info("IP:Port = {}:{}, EthAgent command = {}".format(ip,ip_port,cmds[1]))
-            return ethspy.exec_port(self.conn, cmds[1])
+                #self.logger.info("IP:Port = {}, EthAgent command = {}".format(self.host_name,line))
+                self.logger2.info("IP:Port = %s, EthAgent command = %s", self.host_name, line)
+            return self._transact([command], [line])[0]
+
+    def execute_many(self, commands):
+        """
+        Executes several commands back-to-back on one connection and returns their
+        responses in order. Each command must start with the 'hostCommand' word.
+        While recording or serving prefetched responses, the commands go through
+        execute() one by one.
+
+        Args:
+            commands (list): commands to be executed on the port
+        """
+        if None == self.port_id:
+            raise EthSpyError('port is not open, please open it again using Port.open()')
+        if not commands:
+            return []
+        if self._recorded is not None or self._serving \
+                or all(c in self._prefetched for c in commands):
+            return [self.execute(command) for command in commands]
+
+        lines = [self._command_line(command) for command in commands]
+        if test_cofig.EthAgent_command == 'Enable':
+            for line in lines:
+                self.logger2.info("IP:Port = %s, EthAgent command = %s", self.host_name, line)
+        return self._transact(commands, lines)
+
+    def execute_to(self, command, outputs):
+        """
+        Executes the command and writes its response piece by piece, as it arrives,
+        to every object in outputs (files, common.capture.LineFilter, ...) instead of
+        returning it. Meant for large responses like VBCM data, EEPROM dumps and
+        training logs, which are then never held in memory as a whole.
+
+        A streamed command is not sent again when its connection breaks after part of
+        the response was written. With the 'Multiplex' transport, and for replayed or
+        prefetched responses, the whole response is written at once.
+
+        Args:
+            command (string): command to be executed on the port, must start with hostCommand
+            outputs (list): objects with a write() method
+
+        Returns:
+            int: Number of characters written
+        """
+        if replay is not None or command in self._prefetched or self._recorded is not None \
+                or self._serving or (self.multiplexer is not None and multiplexed(command)):
+            response = self.execute(command)
+            for output in outputs:
+                output.write(response)
+            return len(response)
+
+        if None == self.port_id:
+            raise EthSpyError('port is not open, please open it again using Port.open()')
+        self._check_cancelled()
+
+        line = self._command_line(command)
+        if test_cofig.EthAgent_command == 'Enable':
+            self.logger2.info("IP:Port = %s, EthAgent command = %s", self.host_name, line)
+
+        written = [0]
+        chunks = [] if recorder is not None else None
+
+        def write(text):
+            for output in outputs:
+                output.write(text)
+            written[0] += len(text)
+            if chunks is not None:
+                chunks.append(text)
+
+        def exec_stream(conn, request, timeout, timing):
+            return ethspy.exec_port_stream(conn, request, write, timeout, timing)
+
+        started = time.time()
+        self._exec_pooled(exec_stream, line, [command], command_deadline(command))
+        if recorder is not None:
+            recorder.record(
+                self.host_name, self.slot_number, [command], [''.join(chunks)], started,
+                time.time() - started
+            )
+        return written[0]
+
+    def execute_static(self, command):
+        """
+        Executes a command whose response only changes when the device is reset or its
+        firmware changes (INFOLIST, VER, SUMMARY, ...). The command is sent once, later
+        calls return the same response until invalidate_static_info() is called.
+
+        Args:
+            command (string): command to be executed on the port, must start with hostCommand
+        """
+        if self._recorded is not None:
+            return self.execute(command)
+        try:
+            return self.static_info[command]
+        except KeyError:
+            response = self.static_info[command] = self.execute(command)
+            return response
+
+    def invalidate_static_info(self):
+        """
+        Forgets the static responses and the identity of the device, after it was reset
+        or its firmware changed.
+        """
+        self.static_info = {}
+        self.identity = None
+        self.static_epoch += 1
+
+    def prefetch(self, commands):
+        """
+        Runs commands as one pipelined burst and serves their responses to subsequent
+        execute() calls until drop_prefetched() is called. The responses are added to
+        those prefetched before, so threads may prefetch different commands.
+        """
+        commands = list(dict.fromkeys(commands))
+        self._prefetched.update(zip(commands, self.execute_many(commands)))
+
+    def drop_prefetched(self, commands=None):
+        """
+        Forgets the responses of commands stored by prefetch(), all of them if None.
+        """
+        if commands is None:
+            self._prefetched = {}
+            return
+        for command in commands:
+            self._prefetched.pop(command, None)
+
+    @contextmanager
+    def serve_responses(self, commands, responses):
+        """
+        Context manager that answers execute() calls for commands with responses that
+        were fetched elsewhere (e.g. by the asyncio client). Nothing is sent while the
+        responses are served, execute() raises EthSpyError for any other command.
+        """
+        self._prefetched = dict(zip(commands, responses))
+        self._serving = True
+        try:
+            yield
+        finally:
+            self._serving = False
+            self._prefetched = {}
+
+    @contextmanager
+    def record_commands(self):
+        """
+        Context manager that records the commands passed to execute() instead of
+        sending them. execute() returns an empty response while recording.
+        """
+        self._recorded = []
+        try:
+            yield self._recorded
+        finally:
+            self._recorded = None
+
+    def _command_line(self, command):
+        """
+        Converts a 'hostCommand ...' string into the line sent to EthAgent.
+        """
+        return command_line(command, self.slot_number)
+
+    def _transact(self, commands, lines):
+        """
+        Sends the command lines and returns the responses, or serves them from the
+        replayed log. The responses are added to the command log when recording.
+        """
+        self._check_cancelled()
+        if replay is not None:
+            return [replay.response(self.host_name, self.slot_number, c) for c in commands]
+
+        started = time.time()
+        deadlines = [command_deadline(command) for command in commands]
+        if self.multiplexer is not None and all(multiplexed(c) for c in commands):
+            responses = self._exec_multiplexed(lines, commands, deadlines)
+        elif len(lines) == 1:
+            responses = [self._exec_pooled(ethspy.exec_port, lines[0], commands, deadlines[0])]
+        else:
+            responses = self._exec_pooled(ethspy.exec_port_many, lines, commands, deadlines)
+        if recorder is not None:
+            recorder.record(
+                self.host_name, self.slot_number, commands, responses, started,
+                time.time() - started
+            )
+        return responses
+
+    def _exec_pooled(self, exec_func, request, commands, timeout):
+        """
+        Sends a request over a pooled connection and returns the response(s).
+
+        Only a stale connection is retried: if sending fails, or the connection breaks
+        before any byte of the response arrived, the request is sent once more on a
+        fresh socket. Once the agent answered anything it has received the request and
+        may have run it, so it is never sent again: HC, resets and TX start/stop are
+        not idempotent.
+        A request that misses its deadline (timeout, a list for a burst) raises
+        CommandTimeout and is not repeated, its connection is dropped since the
+        stream is out of sync. The latency of every attempt is added to metrics.
+        The exception of a failed output of a streamed response (ethspy.OutputError)
+        is raised as it is, it is not a failure of the agent. The connection is
+        dropped whenever the response was not read completely.
+        """
+        lines = request if isinstance(request, list) else [request]
+        # The agent the slot was ADDed on
+        host_name = self.multiplexer.host_name if self.multiplexer is not None else self.host_name
+        for attempt in range(2):
+            timing = {}
+            conn = connection_pool.acquire(host_name, timing)
+            abort = lambda: _shutdown(conn)
+            self._aborts.add(abort)
+            try:
+                if self._cancelled.is_set():
+                    _shutdown(conn)
+                response = exec_func(conn, request, timeout=timeout, timing=timing)
+            except ethspy.ResponseTimeout as err:
+                connection_pool.release(host_name, conn, discard=True)
+                metrics.failed(self.host_name, self.slot_number, commands)
+                deadlines = timeout if isinstance(timeout, list) else [timeout]
+                raise self._command_timeout(commands, deadlines, timing, err) from err
+            except OSError as err:
+                connection_pool.release(host_name, conn, discard=True)
+                if self._cancelled.is_set():
+                    metrics.failed(self.host_name, self.slot_number, commands)
+                    raise CommandCancelled('{} to {} slot {} was cancelled'.format(
+                        command_type(commands[0]), self.host_name, self.slot_number
+                    ))
+                if attempt or 'first_byte' in timing:
+                    metrics.failed(self.host_name, self.slot_number, commands)
+                    raise EthSpyError('lost connection to EthAgent {}: {}'.format(self.host_name, err))
+                metrics.retried(self.host_name, self.slot_number, commands)
+                continue
+            except ethspy.OutputError as err:
+                connection_pool.release(host_name, conn, discard=True)
+                raise err.__cause__ from None
+            except BaseException:
+                connection_pool.release(host_name, conn, discard=True)
+                raise
+            finally:
+                self._aborts.discard(abort)
+            connection_pool.release(host_name, conn)
+            metrics.record(self.host_name, self.slot_number, commands, lines, timing)
+            return response
+
+    def _exec_multiplexed(self, lines, commands, deadlines):
+        """
+        Sends the command lines over the connection shared with the other slots of the
+        agent and returns the responses. Like _exec_pooled(), a request lost with a
+        stale connection is sent once more on a new one, see
+        SlotMultiplexer._drop().
+        """
+        for attempt in range(2):
+            timing = {}
+            request = self.multiplexer.submit(lines, timing, deadlines)
+            abort = lambda: request.fail(CommandCancelled(
+                '{} to {} slot {} was cancelled'.format(
+                    command_type(commands[0]), self.host_name, self.slot_number
+                )
+            ))
+            self._aborts.add(abort)
+            try:
+                if self._cancelled.is_set():
+                    abort()
+                responses = request.wait()
+            except ethspy.ResponseTimeout as err:
+                metrics.failed(self.host_name, self.slot_number, commands)
+                raise self._command_timeout(commands, deadlines, timing, err) from err
+            except CommandCancelled:
+                metrics.failed(self.host_name, self.slot_number, commands)
+                raise
+            except OSError as err:
+                if attempt or not request.retryable:
+                    metrics.failed(self.host_name, self.slot_number, commands)
+                    raise EthSpyError(str(err))
+                metrics.retried(self.host_name, self.slot_number, commands)
+                continue
+            finally:
+                self._aborts.discard(abort)
+            metrics.record(self.host_name, self.slot_number, commands, lines, timing)
+            return [response[:-5] for response in responses]
+
+    def _slot_multiplexed(self, slot_func, line, timing):
+        """
+        ADDs or DELs the slot through the multiplexer with slot_func, the command is
+        only sent if the slot state of the shared connection changes.
+        """
+        try:
+            sent = slot_func(self.slot_number, self.logger, self.logger2, timing)
+        except ethspy.ResponseTimeout as err:
+            metrics.failed(self.host_name, self.slot_number, [line])
+            raise self._command_timeout([line], [command_deadline(line)], {}, err) from err
+        except Exception:
+            metrics.failed(self.host_name, self.slot_number, [line])
+            raise
+        if sent:
+            metrics.record(self.host_name, self.slot_number, [line], [line], timing)
+
+    def _check_cancelled(self):
+        if self._cancelled.is_set():
+            raise CommandCancelled('commands to {} slot {} were cancelled'.format(
+                self.host_name, self.slot_number
+            ))
+
+    def _command_timeout(self, commands, deadlines, timing, err):
+        """
+        Returns the CommandTimeout for the first command of a burst without a
+        complete response.
+        """
+        i = min(len(timing.get('done', [])), len(commands) - 1)
+        return CommandTimeout(self.host_name, self.slot_number, commands[i], deadlines[i], err.partial)
+
+    def cancel(self):
+        """
+        Abandons the commands in flight and makes every later command of this port
+        raise CommandCancelled, until resume() is called. Can be called from any thread.
+        """
+        self._cancelled.set()
+        for abort in list(self._aborts):
+            abort()
+
+    def resume(self):
+        """
+        Allows commands again after cancel().
+        """
+        self._cancelled.clear()
 
     def close(self):
         """
@@ -182,6 +1410,36 @@ class Port(object):
             if self.port_id is not None:
                 ethspy.close_port(self.port_id)
 
+def _shutdown(conn):
+    """Wakes a thread blocked on conn, its recv() returns as if the agent closed it."""
+    try:
+        conn.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+def command_line(command, slot_number):
+    """
+    Converts a 'hostCommand ...' string into the line sent to EthAgent for slot_number.
+    """
+    cmds = command.split(" ")
+    if command[:len('hostCommand')].lower() == 'hostcommand':
+        if len(cmds) < 2:
+            raise Exception("Error: hostCommand needs at least one parameter")
+        lstr_temp_list = ["hostCommand"]
+        cmds = cmds[1:]
+        cmds[0] = cmds[0] + ':' + str(slot_number)
+        lstr_temp_list.append(' '.join(cmds))
+        cmds = lstr_temp_list
+    else:
+         if len(cmds) > 1:
+             lstr_temp_list = [cmds[0]]
+             cmds = cmds[1:]
+             lstr_temp_list.append(' '.join(cmds))
+             cmds = lstr_temp_list
+         cmds.insert(1, str(slot_number))
+
+    return cmds[1] + '\n'
+
 def message_box(box_type, title, message):
     if box_type not in (MESSAGE_BOX_CRITICAL, MESSAGE_BOX_WARNING, MESSAGE_BOX_INFO):
         raise EthSpyError('Invalid message box type. valid types are - %s, %s, %s.' % 
@@ -0,0 +1,12 @@
+"""Shared setup of the tests: the repo on sys.path and the ETHSPY variables."""
+import builtins
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+builtins._ETHSPY_VARS = getattr(builtins, '_ETHSPY_VARS', {})
+
+import ethspylib  # noqa: E402
+
+ethspylib.test_cofig.EthAgent_command = 'Disable'
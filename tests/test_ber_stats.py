@@ -0,0 +1,47 @@
+"""Tests of the BER confidence computation of common.ber_stats."""
+import math
+
+import pytest
+
+from common import ber_stats
+
+BER_TARGET = 1e-12
+
+
+def poisson_confidence(errors, bits, ber_target):
+    """P(more than errors errors) in percent, summed in log space."""
+    mean = bits * ber_target
+    cdf = math.fsum(
+        math.exp(k * math.log(mean) - mean - math.lgamma(k + 1)) for k in range(errors + 1)
+    )
+    return (1 - cdf) * 100
+
+
+@pytest.mark.parametrize('errors', [0, 1, 2, 5, 20, 50, 100, 500])
+def test_confidence_level_matches_poisson_sum(errors):
+    for exponent in range(0, 81):
+        bits = 10 ** (9 + exponent / 20.0)
+        expected = poisson_confidence(errors, bits, BER_TARGET)
+        assert ber_stats.confidence_level(errors, bits, BER_TARGET) == pytest.approx(expected, abs=1e-7)
+
+
+def test_confidence_level_known_values():
+    # Without errors, 3 / BER bits give the usual 95% confidence
+    assert ber_stats.confidence_level(0, 3e12, BER_TARGET) == pytest.approx(95.0213, abs=1e-4)
+    assert ber_stats.confidence_level(0, 0, BER_TARGET) == 0
+    assert ber_stats.confidence_level(100000, 1e20, BER_TARGET) == pytest.approx(100)
+
+
+def test_confidence_levels_of_a_series():
+    errors = [k // 100 for k in range(2400)]
+    bits = [k * 1e10 for k in range(2400)]
+    assert ber_stats.confidence_levels(errors, bits, BER_TARGET) == [
+        ber_stats.confidence_level(n, b, BER_TARGET) for n, b in zip(errors, bits)
+    ]
+
+
+@pytest.mark.parametrize('errors', [0, 1, 5, 20, 1000, 100000])
+@pytest.mark.parametrize('confidence', [1, 50, 90, 95, 99, 99.99])
+def test_bits_for_confidence_inverts_confidence_level(errors, confidence):
+    bits = ber_stats.bits_for_confidence(errors, confidence, BER_TARGET)
+    assert ber_stats.confidence_level(errors, bits, BER_TARGET) == pytest.approx(confidence, abs=1e-6)
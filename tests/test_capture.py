@@ -0,0 +1,114 @@
+"""Tests of streaming a large EthAgent response to files with common.capture."""
+import io
+import logging
+import random
+import socketserver
+import threading
+
+import pytest
+
+import ethspylib
+from common.capture import CaptureFile, LineFilter
+
+COMMAND = 'hostCommand ETHSPY RX GET-EHM PHY:KEREM73_DNV SIDE:LINE VBCM-TOOLS'
+
+log = logging.getLogger(__name__)
+
+
+def vbcm_payload(size):
+    """CSV rows with the mixed line endings and blank lines of the VBCM output."""
+    rng = random.Random(1)
+    rows = []
+    total = 0
+    while total < size:
+        row = ','.join(str(rng.randint(-500, 500)) for _ in range(16))
+        row += rng.choice(['\r\n', '\n', '\r\n\r\n', ' \n'])
+        rows.append(row)
+        total += len(row)
+    return ''.join(rows)
+
+
+class PayloadHandler(socketserver.StreamRequestHandler):
+    """Answers ADD/DEL with OK and any other command line with the server payload."""
+
+    def handle(self):
+        for line in self.rfile:
+            if line.split()[0].upper() in (b'ADD', b'DEL'):
+                self.wfile.write(b'OK\r\n')
+            else:
+                self.wfile.write(self.server.response)
+
+
+@pytest.fixture
+def port():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), PayloadHandler)
+    server.daemon_threads = True
+    server.response = '{}\r\nOK\r\n'.format(vbcm_payload(2 ** 20)).encode()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = ethspylib.Port('127.0.0.1:{}'.format(server.server_address[1]), '1', log, log)
+    port.open_auto()
+    yield port
+    ethspylib.connection_pool.close_all()
+    server.shutdown()
+    server.server_close()
+
+
+def test_streamed_capture_matches_the_response(port, tmp_path):
+    raw_path = str(tmp_path / 'raw' / 'raw_vbcm.csv')
+    clean_path = tmp_path / 'vbcm.csv'
+    with open(str(clean_path), 'w', newline='') as final_file, \
+            LineFilter(final_file) as clean_file, CaptureFile(raw_path) as raw_file:
+        written = port.execute_to(COMMAND, [clean_file, raw_file])
+
+    response = port.execute(COMMAND)
+    with open(raw_path, newline='') as file_handle:
+        assert file_handle.read() == response
+    assert written == len(response)
+    expected = ''.join(
+        line.rstrip() + '\n' for line in io.StringIO(response, newline=None).readlines() if line.strip()
+    )
+    assert clean_path.read_text() == expected
+
+
+def test_line_filter_joins_lines_split_between_writes():
+    output = io.StringIO()
+    with LineFilter(output) as clean:
+        for piece in ('a,1\r', '\nb,', '2 \r\n\r', '\n', 'c,3'):
+            clean.write(piece)
+    assert output.getvalue() == 'a,1\nb,2\nc,3\n'
+
+
+def test_capture_file_is_only_created_when_written(tmp_path):
+    path = tmp_path / 'folder' / 'raw.csv'
+    with CaptureFile(str(path)):
+        pass
+    assert not path.parent.exists()
+
+
+class FailingOutput(object):
+    """Output whose write() raises error after the first call."""
+
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def write(self, text):
+        self.calls += 1
+        if self.calls > 1:
+            raise self.error
+
+
+@pytest.mark.parametrize('error', [OSError(28, 'No space left on device'), ValueError('bad text')])
+def test_failed_output_drops_the_connection(port, error):
+    ethspylib.metrics.reset()
+    output = FailingOutput(error)
+    with pytest.raises(type(error)) as raised:
+        port.execute_to(COMMAND, [output])
+    assert not isinstance(raised.value, ethspylib.EthSpyError)
+    assert not ethspylib.connection_pool._idle[port.host_name]
+    for entry in ethspylib.metrics.summary(port.host_name, port.slot_number).values():
+        assert entry['FAILURES'] == 0
+
+    # The half read response is not taken for the answer of the next command
+    response = port.execute(COMMAND)
+    assert response.rstrip() == vbcm_payload(2 ** 20).rstrip()
@@ -0,0 +1,96 @@
+"""Tests of the EthAgent response framing of ethspy."""
+import socket
+import threading
+
+import ethspy
+
+
+def deliver(data, chunk):
+    """Returns a socket that receives data in pieces of chunk bytes."""
+    server, client = socket.socketpair()
+
+    def send():
+        for start in range(0, len(data), chunk):
+            server.sendall(data[start:start + chunk])
+        server.close()
+
+    threading.Thread(target=send, daemon=True).start()
+    return client
+
+
+def test_large_response_in_small_chunks():
+    payload = '0.125,-0.5,17\r\n' * 20000 + '\r\nOK\r\n'
+    conn = deliver(payload.encode(), 1460)
+    assert ethspy.ResponseReader(conn, timeout=10).read_response() == payload
+    conn.close()
+
+
+def test_terminator_split_across_chunks():
+    for chunk in (1, 2, 3, 5):
+        conn = deliver(b'Link TTL(ms): 1.0\r\nOK\r\n', chunk)
+        assert ethspy.ResponseReader(conn, timeout=10).read_response().endswith('\r\nOK\r\n')
+        conn.close()
+
+
+def test_pipelined_responses():
+    conn = deliver(b'first\r\nOK\r\nOK\r\nsecond OK value\r\nOK\r\n', 4)
+    reader = ethspy.ResponseReader(conn, timeout=10)
+    assert reader.read_response(more=True) == 'first\r\nOK\r\n'
+    assert reader.read_response(more=True) == 'OK\r\n'
+    assert reader.read_response() == 'second OK value\r\nOK\r\n'
+    conn.close()
+
+
+def test_terminator_right_after_output_in_a_burst():
+    server, client = socket.socketpair()
+    server.sendall(b'valueOK\r\nnext\r\nOK\r\n')
+    reader = ethspy.ResponseReader(client, timeout=1)
+    assert reader.read_response(more=True) == 'valueOK\r\n'
+    assert reader.read_response() == 'next\r\nOK\r\n'
+    server.close()
+    client.close()
+
+
+def test_ok_line_inside_the_last_response():
+    conn = deliver(b'state\r\nOK\r\nmore\r\nOK\r\n', 64)
+    assert ethspy.ResponseReader(conn, timeout=10).read_response() == 'state\r\nOK\r\nmore\r\nOK\r\n'
+    conn.close()
+
+
+def test_more_is_asked_when_bytes_arrive():
+    server, client = socket.socketpair()
+    queued = []
+    server.sendall(b'valueOK\r\n')
+    reader = ethspy.ResponseReader(client, timeout=1)
+    assert reader.read_response(more=lambda: bool(queued)) == 'valueOK\r\n'
+    queued.append('next')
+    server.sendall(b'firstOK\r\nnext\r\nOK\r\n')
+    assert reader.read_response(more=lambda: bool(queued)) == 'firstOK\r\n'
+    server.close()
+    client.close()
+
+
+def test_multibyte_character_split_across_chunks():
+    conn = deliver('Temperatur 25 °C\r\nOK\r\n'.encode(), 1)
+    assert ethspy.ResponseReader(conn, timeout=10).read_response() == 'Temperatur 25 °C\r\nOK\r\n'
+    conn.close()
+
+
+def test_stream_response_matches_read_response():
+    payload = ('lane,eye\r\n' + '0,12.5 °C\r\n' * 5000 + '\r\nOK\r\n').encode()
+    conn = deliver(payload, 1460)
+    pieces = []
+    size = ethspy.ResponseReader(conn, timeout=10).stream_response(pieces.append)
+    conn.close()
+    assert size == len(payload)
+    assert ''.join(pieces) == payload.decode()[:-5]
+
+
+def test_terminator_right_after_output():
+    server, client = socket.socketpair()
+    server.sendall(b'valueOK\r\n')
+    assert ethspy.ResponseReader(client, timeout=1).read_response() == 'valueOK\r\n'
+    server.sendall(b'first OK\r\nsecond\r\nOK\r\n')
+    assert ethspy.ResponseReader(client, timeout=1).read_response() == 'first OK\r\nsecond\r\nOK\r\n'
+    server.close()
+    client.close()
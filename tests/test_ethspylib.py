@@ -0,0 +1,109 @@
+"""Tests of the EthAgent transports of ethspylib against the EthAgent simulator."""
+import logging
+import socket
+import threading
+import time
+
+import pytest
+
+import ethagent_sim
+import ethspylib
+
+log = logging.getLogger(__name__)
+
+
+@pytest.fixture(params=['Pooled', 'Multiplex'])
+def transport(request, monkeypatch):
+    monkeypatch.setattr(ethspylib.test_cofig, 'EthAgent_transport', request.param)
+    return request.param
+
+
+def record_lines(simulator):
+    """Returns the list the command lines answered by simulator are appended to."""
+    lines = []
+    respond = simulator.respond
+
+    def recording(line):
+        lines.append(line)
+        return respond(line)
+
+    simulator.respond = recording
+    return lines
+
+
+def test_pooled_connection_is_reused():
+    with ethagent_sim.EthAgentSimulator({'1': 'Columbiaville'}, seed=1) as simulator:
+        port = ethspylib.Port(simulator.host_name, '1', log, log)
+        port.open_auto()
+        for _ in range(5):
+            assert 'Link TTL(ms)' in port.execute('hostCommand TTL')
+        port.close_auto()
+        assert len(ethspylib.connection_pool._idle[simulator.host_name]) == 1
+        ethspylib.connection_pool.close_all()
+
+
+def test_no_resend_after_partial_response(transport):
+    slots = {'1': 'Columbiaville'}
+    with ethagent_sim.EthAgentSimulator(slots, seed=1, disconnect_rate={'HC': 1.0}) as simulator:
+        lines = record_lines(simulator)
+        port = ethspylib.Port(simulator.host_name, '1', log, log)
+        port.open_auto()
+        with pytest.raises(ethspylib.EthSpyError):
+            port.execute('hostCommand HC')
+        assert [line for line in lines if line.startswith('HC')] == ['HC:1']
+        ethspylib.connection_pool.close_all()
+        ethspylib.close_multiplexers()
+
+
+def test_stale_pooled_connection_is_retried(monkeypatch):
+    # A pooled socket the agent closed while it was idle
+    listener = socket.create_server(('127.0.0.1', 0))
+    stale = socket.create_connection(listener.getsockname())
+    listener.accept()[0].close()
+    listener.close()
+
+    with ethagent_sim.EthAgentSimulator({'1': 'Columbiaville'}, seed=1) as simulator:
+        lines = record_lines(simulator)
+        port = ethspylib.Port(simulator.host_name, '1', log, log)
+        port.open_auto()
+        ethspylib.connection_pool.close_all()
+        ethspylib.connection_pool._idle[simulator.host_name] = [stale]
+        monkeypatch.setattr(ethspylib.ConnectionPool, 'is_alive', staticmethod(lambda conn: True))
+        port.execute('hostCommand HC')
+        assert [line for line in lines if line.startswith('HC')] == ['HC:1']
+        ethspylib.connection_pool.close_all()
+
+
+def test_slow_slot_does_not_delay_other_slots(monkeypatch):
+    monkeypatch.setattr(ethspylib.test_cofig, 'EthAgent_transport', 'Multiplex')
+    slots = {'1': 'Columbiaville', '2': 'Columbiaville'}
+    with ethagent_sim.EthAgentSimulator(slots, seed=1, latency={'TTL': 1.0}) as simulator:
+        ports = [ethspylib.Port(simulator.host_name, slot, log, log) for slot in slots]
+        for port in ports:
+            port.open_auto()
+        slow = threading.Thread(target=ports[0].execute, args=('hostCommand TTL',))
+        slow.start()
+        try:
+            time.sleep(0.1)
+            started = time.monotonic()
+            ports[1].execute('hostCommand QR')
+            assert time.monotonic() - started < 0.5
+        finally:
+            slow.join()
+            ethspylib.close_multiplexers()
+            ethspylib.connection_pool.close_all()
+
+
+def test_serve_responses_does_not_send_other_commands():
+    with ethagent_sim.EthAgentSimulator({'1': 'Columbiaville'}, seed=1) as simulator:
+        lines = record_lines(simulator)
+        port = ethspylib.Port(simulator.host_name, '1', log, log)
+        port.open_auto()
+        with port.serve_responses(['hostCommand TTL'], ['served']):
+            assert port.execute('hostCommand TTL') == 'served'
+            with pytest.raises(ethspylib.EthSpyError):
+                port.execute('hostCommand QR')
+            with pytest.raises(ethspylib.EthSpyError):
+                port.execute_many(['hostCommand TTL', 'hostCommand QR'])
+        assert not [line for line in lines if line.startswith(('TTL', 'QR'))]
+        ethspylib.connection_pool.close_all()
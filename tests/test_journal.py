@@ -0,0 +1,75 @@
+"""Tests of the NDJSON journal of common.journal."""
+import json
+
+import pytest
+
+from common import journal
+from common.journal import Journal
+from common.measurements import MeasurementStore
+
+HEADER = {'DUT': 'dut', 'LP': 'lp', 'CHANNEL': '1m'}
+
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls = []
+    real_fsync = journal.os.fsync
+
+    def fsync(fd):
+        calls.append(fd)
+        real_fsync(fd)
+
+    monkeypatch.setattr(journal.os, 'fsync', fsync)
+    return calls
+
+
+def lines(path):
+    with open(str(path)) as file_handle:
+        return [json.loads(line) for line in file_handle]
+
+
+def test_samples_are_written_before_the_checkpoint(tmp_path):
+    path = tmp_path / 'run.ndjson'
+    run = Journal(str(path), HEADER)
+    run.record_static({'TestName': 'LHC'}, ())
+    run.record({'SNR': 30.5}, ('DUT', 'SNR'), 1)
+
+    assert [line.get('NEST') for line in lines(path)] == [None, [], ['DUT', 'SNR']]
+    # Not committed yet
+    assert [record for record, _ in journal.read(str(path))] == [run.header]
+
+    run.checkpoint(1, 'STATUS', BER_ITERATIONS=1)
+    assert len(list(journal.read(str(path)))) == 4
+    run.close()
+
+
+def test_fsync_is_batched(tmp_path, fsyncs):
+    run = Journal(str(tmp_path / 'run.ndjson'), HEADER, sync_records=10, sync_seconds=3600)
+    for sample in range(25):
+        run.record({'SNR': sample}, ('DUT', 'SNR'), 1)
+    # The header and 9 samples, then every 10 samples
+    assert len(fsyncs) == 2
+
+    run.checkpoint(1, 'STATUS')
+    assert len(fsyncs) == 3
+    run.close()
+
+
+def test_resume_cuts_the_uncommitted_stage(tmp_path):
+    path = str(tmp_path / 'run.ndjson')
+    run = Journal(path, HEADER)
+    run.record({'SNR': 30.5}, ('DUT', 'SNR'), 1)
+    run.checkpoint(1, 'STATUS', BER_ITERATIONS=1)
+    run.record({'ERRORS': 3}, ('DUT', 'BER'), 1)
+    run.close()
+
+    resumed = Journal(path, HEADER)
+    store = MeasurementStore()
+    assert resumed.resume(store)['STAGE'] == 'STATUS'
+    assert store.values(('DUT', 'SNR', 'SNR')) == [30.5]
+    assert not store.keys(('DUT', 'BER'))
+
+    resumed.record({'ERRORS': 0}, ('DUT', 'BER'), 1)
+    resumed.checkpoint(1, 'BER', BER_ITERATIONS=0)
+    resumed.close()
+    assert [line['DATA'] for line in lines(path) if line.get('NEST') == ['DUT', 'BER']] == [{'ERRORS': 0}]
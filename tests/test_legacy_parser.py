@@ -0,0 +1,52 @@
+"""Tests of devices.common.legacy_parser on recorded EthAgent responses."""
+import pytest
+
+from devices.common import legacy_parser
+
+# Responses as returned by Port.execute(), the terminator cut off
+INFOLIST = (
+    'Slot: 1\r\nBranding_String: Intel(R) Ethernet Controller E810-C for QSFP\r\n'
+    'Device_ID: 0x1592\r\nCodename: Columbiaville\r\nBus: 18\r\nDevice: 00\r\nFunction: 0\r'
+)
+TTL = 'Link TTL(ms): 1889.4\r\nAN Count: 1\r\nResolution(ms): 1\r'
+HSS = 'Lane = 0\r\nPRE: 1 (max: 15)\r\nTime: 12:30:05\r\nNo link partner\r'
+
+
+def test_dictify_key_value_lines():
+    assert legacy_parser.dictify(INFOLIST) == {
+        'SLOT': '1', 'BRANDING_STRING': 'INTEL(R) ETHERNET CONTROLLER E810-C FOR QSFP',
+        'DEVICE_ID': '0X1592', 'CODENAME': 'COLUMBIAVILLE', 'BUS': '18', 'DEVICE': '00',
+        'FUNCTION': '0',
+    }
+
+
+def test_dictify_separators():
+    # '=' without a colon, the value ends at the next colon, no separator gives None
+    assert legacy_parser.dictify(HSS) == {
+        'LANE': '0', 'PRE': '1 (MAX', 'TIME': '12', 'NO LINK PARTNER': None,
+    }
+    assert legacy_parser.dictify('') == {'': None}
+
+
+def test_dictify_typed():
+    assert legacy_parser.dictify_typed(TTL) == {
+        'LINK TTL(MS)': 1889.4, 'AN COUNT': 1, 'RESOLUTION(MS)': 1,
+    }
+    # Hex values stay strings, decimal ones are converted
+    typed = legacy_parser.dictify_typed(INFOLIST)
+    assert typed['DEVICE_ID'] == '0X1592' and typed['DEVICE'] == 0
+
+
+def test_cached_results_are_copies():
+    legacy_parser.dictify(TTL)['AN COUNT'] = 'changed'
+    legacy_parser.dictify_typed(TTL)['AN COUNT'] = 'changed'
+    assert legacy_parser.dictify(TTL)['AN COUNT'] == '1'
+    assert legacy_parser.dictify_typed(TTL)['AN COUNT'] == 1
+
+
+def test_counters():
+    response = '0001E240X 123456d 0000000AX 10d\r'
+    assert legacy_parser.counters(response) == (123456, 10)
+    assert legacy_parser.counters(response, decimal=False) == (0x1E240, 10)
+    with pytest.raises(ValueError):
+        legacy_parser.counters('Error: Unknown command QR\r')
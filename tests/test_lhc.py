@@ -0,0 +1,105 @@
+"""Tests of the BER sampling and the state waits of LHC."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import LHC
+
+
+@pytest.fixture
+def es_vars(monkeypatch):
+    values = {
+        'BER_CONFIDENCE': 95, 'BER_TIMEOUT': 600, 'BER_ERROR_THRESHOLD': 20,
+        'BER_POLL_MIN': 0.25, 'BER_POLL_MAX': 5,
+    }
+    for key, value in values.items():
+        monkeypatch.setitem(LHC.es_vars, key, value)
+    return values
+
+
+def ber_test():
+    return SimpleNamespace(ber_target=1e-12, ber_bits_to_confidence=lambda errors, confidence: 1e15)
+
+
+def test_poll_interval_far_from_confidence(es_vars):
+    assert LHC.LHC.ber_poll_interval(ber_test(), 0, 1e10, 1e10, 1.0) == 5
+
+
+def test_poll_interval_capped_by_error_threshold(es_vars):
+    # 2 errors in 10 s, the 21st is expected in 95 s
+    assert LHC.LHC.ber_poll_interval(ber_test(), 2, 1e11, 1e10, 10.0) == 5
+    # 18 errors in 10 s, the 21st is expected in 3 / 1.8 s
+    assert LHC.LHC.ber_poll_interval(ber_test(), 18, 1e11, 1e10, 10.0) == pytest.approx(3 / 1.8)
+
+
+def test_poll_interval_default_max(es_vars, monkeypatch):
+    monkeypatch.delitem(LHC.es_vars, 'BER_POLL_MAX')
+    assert LHC.LHC.ber_poll_interval(ber_test(), 0, 1e10, 1e10, 1.0) == 1
+
+
+def ber_sampler(confidence, errors=0):
+    return SimpleNamespace(
+        sum_rcv_errors=lambda stats, symbol_error: (errors, symbol_error),
+        ber_compute_confidence_level=lambda errors, bits: confidence,
+        display_ber=lambda *args: None,
+        logger=SimpleNamespace(info=lambda *args: None),
+        link_partner=SimpleNamespace(test_enabled='Enable'),
+    )
+
+
+@pytest.mark.parametrize('start, confidence, errors, dropped, end', [
+    (0, 50, 0, 'Disable', None),
+    (-700, 50, 0, 'Disable', 'STOP'),
+    (0, 50, 21, 'Disable', 'STOP'),
+    (0, 96, 0, 'Disable', 'DONE'),
+    (0, 96, 0, 'Enable', 'DROPPED'),
+])
+def test_ber_update(es_vars, monkeypatch, start, confidence, errors, dropped, end):
+    monkeypatch.setitem(LHC.es_vars, 'BER_PACKET_SIZE', 1518)
+    monkeypatch.setitem(LHC.es_vars, 'DROPPED_PACKETS', dropped)
+    ber = LHC.BerMeasurement(LHC.ethspylib.clock.time() + start)
+    stats = {'QR-GOOD-RECEIVES': 1000}
+    bandwidth = {'RX-MBPS': 25000, 'TX-MBPS': 25000}
+    assert LHC.LHC.ber_update(
+        ber_sampler(confidence, errors), ber, 1, stats, bandwidth, stats, bandwidth
+    ) == end
+    assert ber.bits_received == 1000 * 1518 * 8
+
+
+def garbled_once():
+    responses = [ValueError("Unexpected QR/QT counter output: 'QR: busy'"), (0, 0)]
+
+    def read():
+        response = responses.pop(0) if len(responses) > 1 else responses[0]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    return read
+
+
+def waiting_test(monkeypatch):
+    monkeypatch.setattr(LHC.ethspylib.clock, 'sleep', lambda seconds: None)
+    test = LHC.LHC.__new__(LHC.LHC)
+    test.logger = SimpleNamespace(info=lambda *args: None)
+    return test
+
+
+def test_wait_state_polls_again_after_a_garbled_read(monkeypatch):
+    test = waiting_test(monkeypatch)
+    read = garbled_once()
+    assert test.wait_state('Counters cleared', 10, [(None, read)], lambda counters: counters[0][0] == 0)
+
+
+def test_wait_state_async_polls_again_after_a_garbled_read(monkeypatch):
+    test = waiting_test(monkeypatch)
+    read = garbled_once()
+
+    async def acall(dev, method):
+        return method()
+
+    test.acall = acall
+    assert asyncio.run(test.wait_state_async(
+        'Counters cleared', 10, [(None, read)], lambda counters: counters[0][0] == 0
+    ))
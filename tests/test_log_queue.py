@@ -0,0 +1,89 @@
+"""Tests of the overflow policy and flush() of common.log_queue."""
+import logging
+import threading
+import time
+
+from common.log_queue import QueuedLogWriter
+
+
+class BlockedHandler(logging.Handler):
+    """Collects the messages, but only once unblock is set."""
+
+    def __init__(self):
+        super(BlockedHandler, self).__init__()
+        self.messages = []
+        self.busy = threading.Event()
+        self.unblock = threading.Event()
+
+    def emit(self, record):
+        self.busy.set()
+        self.unblock.wait()
+        self.messages.append(record.getMessage())
+
+
+def make_logger(name, handler, writer):
+    logger = logging.getLogger('test_log_queue.' + name)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.handlers = [writer.wrap(handler)]
+    return logger
+
+
+def test_full_queue_drops_info_but_keeps_errors():
+    handler = BlockedHandler()
+    writer = QueuedLogWriter(maxsize=3, put_timeout=0.05)
+    logger = make_logger('overflow', handler, writer)
+    logger.info('first')
+    handler.busy.wait(5)
+    for n in range(5):
+        logger.info('info %d', n)
+    logger.error('error 1')
+    logger.critical('critical')
+    handler.unblock.set()
+    writer.stop()
+
+    assert writer.dropped == 4
+    assert handler.messages == [
+        'first', '4 log records dropped, the log writer could not keep up',
+        'info 2', 'error 1', 'critical'
+    ]
+
+
+def test_warning_waits_for_room():
+    handler = BlockedHandler()
+    writer = QueuedLogWriter(maxsize=2, put_timeout=5)
+    logger = make_logger('wait', handler, writer)
+    logger.warning('first')
+    handler.busy.wait(5)
+    logger.warning('warning 1')
+    logger.warning('warning 2')
+    threading.Timer(0.1, handler.unblock.set).start()
+    logger.error('error')
+    writer.stop()
+
+    assert writer.dropped == 0
+    assert handler.messages[:4] == ['first', 'warning 1', 'warning 2', 'error']
+
+
+def test_flush_returns_while_other_threads_log():
+    handler = logging.NullHandler()
+    writer = QueuedLogWriter(maxsize=100)
+    logger = make_logger('flush', handler, writer)
+    stop = threading.Event()
+
+    def keep_logging():
+        while not stop.is_set():
+            logger.info('busy')
+
+    threads = [threading.Thread(target=keep_logging) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        start = time.monotonic()
+        assert writer.flush(timeout=10)
+        assert time.monotonic() - start < 5
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        writer.stop()
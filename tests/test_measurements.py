@@ -0,0 +1,89 @@
+"""Tests of the columnar MeasurementStore and its statistics."""
+from array import array
+import json
+import statistics
+
+import pytest
+
+from common.measurements import MeasurementStore
+from common.stats import numeric_summary, summarize, summarize_column
+
+
+def samples(iteration):
+    yield ('ITERATION',), {'DATE': '2024-01-01', 'ITERATION': iteration}
+    yield ('DUT', 'TTL'), {'TTL': 1.5 + iteration, 'ERROR': 'None'}
+    for lane in range(2):
+        yield ('DUT', 'RX', lane), {'CDR-LOCK': True, 'PPM': -3.25 * iteration, 'CTLE': [1, 2]}
+        yield ('DUT', 'LANE', lane), {'EHM': None if iteration % 2 else 12.5}
+
+
+def filled_store(iterations=2):
+    store = MeasurementStore()
+    store.update({'TestName': 'LHC'})
+    store.update({'CODENAME': 'Columbiaville', 'VER': {'EA': '1.0'}}, ('DUT', 'INFO'))
+    for iteration in range(1, iterations + 1):
+        store.iteration = iteration
+        for nest, data in samples(iteration):
+            store.append(data, nest)
+    return store
+
+
+def test_view_is_the_nested_dictionary():
+    lane = {'CDR-LOCK': [True, True], 'PPM': [-3.25, -6.5], 'CTLE': [1, 2, 1, 2]}
+    expected = {
+        'TestName': 'LHC',
+        'DUT': {
+            'INFO': {'CODENAME': 'Columbiaville', 'VER': {'EA': '1.0'}},
+            'TTL': {'TTL': [2.5, 3.5], 'ERROR': ['None', 'None']},
+            'RX': {0: lane, 1: lane},
+            'LANE': {0: {'EHM': [None, 12.5]}, 1: {'EHM': [None, 12.5]}},
+        },
+        'ITERATION': {'DATE': ['2024-01-01', '2024-01-01'], 'ITERATION': [1, 2]},
+    }
+    # Same content and the same key order in the JSON output
+    assert json.dumps(filled_store().view()) == json.dumps(expected)
+
+
+def test_update_replaces_and_append_continues_static_lists():
+    store = MeasurementStore()
+    store.update({'VALUES': [1, 2], 'NAME': 'a'}, ('DUT',))
+    store.append({'VALUES': 3}, ('DUT',))
+    store.update({'NAME': 'b'}, ('DUT',))
+    assert store.view() == {'DUT': {'VALUES': [1, 2, 3], 'NAME': 'b'}}
+
+
+def test_values_and_keys():
+    store = filled_store()
+    assert store.keys(('DUT', 'RX')) == [0, 1]
+    assert store.values(('DUT', 'TTL', 'TTL')) == [2.5, 3.5]
+    with pytest.raises(KeyError):
+        store.values(('LP', 'TTL'))
+
+
+@pytest.mark.parametrize('values', [
+    [1, 2, 2], [1.5, 'N/A', 2.5], [True, True], ['a', 'b'], [None, 12.5], [0, -1e300, 1e300],
+])
+def test_column_statistics_match_list_statistics(values):
+    store = MeasurementStore()
+    store.append({'VALUES': values})
+    column = dict(store.columns())[('VALUES',)]
+    assert json.dumps(summarize_column(column)) == json.dumps(summarize(values))
+
+
+def test_statistics():
+    assert summarize([1, 2, 2]) == {
+        'MIN': 1, 'MEAN': pytest.approx(5 / 3), 'MAX': 2, 'STDDEV': pytest.approx(0.4714045),
+        'MODE': 2, 'MODE_OCCURRENCES': 2,
+    }
+    # A tie has no mode
+    assert summarize(['a', 'b']) == {'MODE': 'None', 'MODE_OCCURRENCES': 'None'}
+
+
+def test_numeric_summary_of_an_array():
+    values = array('d', [20.0 + (i * 7919 % 101) / 10.0 for i in range(1000)])
+    output = numeric_summary(values, (50, 99), float)
+    assert output['MIN'] == min(values) and output['MAX'] == max(values)
+    assert output['MEAN'] == pytest.approx(statistics.fmean(values))
+    assert output['STDDEV'] == pytest.approx(statistics.pstdev(values))
+    assert output['P50'] == pytest.approx(statistics.median(values))
+    assert 'P50' not in numeric_summary(values)
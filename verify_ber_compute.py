@@ -1,24 +1,9 @@
-import math
+from common import ber_stats
 
 def ber_compute_confidence_level(errors, bits, ber_target,logger=None):
-
-    step1 = 0
-    for k in range(0, errors + 1):
-        try:
-            term = pow((bits * float(ber_target)), k) / math.factorial(k)
-            step1 += term
-        except OverflowError:
-            # Handle potential overflow for large numbers
-            message = 'Warning: OverflowError detected during BER confidence level calculation.'
-            if logger:
-                logger.warning(message)
-            else:
-                print(message)
-            break
-    # Final confidence level calculation
-    step2 = (1 - (step1 * math.exp(-bits * float(ber_target)))) * 100
-
-    return float('{0:.1f}'.format(step2))
+    # Poisson confidence via the regularized incomplete gamma function, no overflow
+    # for large error counts
+    return float('{0:.1f}'.format(ber_stats.confidence_level(errors, bits, ber_target)))
 
 if __name__ == '__main__':
     print("--- BER 信賴區間計算機 ---")